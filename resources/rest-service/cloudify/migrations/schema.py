@@ -23,6 +23,7 @@ import sys
 import flask_migrate
 
 from manager_rest.flask_utils import setup_flask_app
+from manager_rest.storage import partitions
 
 
 LOGGER = logging.getLogger(__name__)
@@ -55,6 +56,16 @@ def current(args):
     flask_migrate.current(DIRECTORY)
 
 
+def maintain_partitions(args):
+    """Pre-create and drop the daily partitions of the events and logs."""
+    result = partitions.maintain_partitions()
+    LOGGER.info(
+        'Partitions created: %s, dropped: %s, unpartitioned rows deleted: %d',
+        ', '.join(result['created']) or 'none',
+        ', '.join(result['dropped']) or 'none',
+        result['deleted'])
+
+
 def parse_arguments(argv):
     """Parse command line arguments.
 
@@ -85,6 +96,11 @@ def parse_arguments(argv):
         'current', help='Get current database schema revision')
     current_parser.set_defaults(func=current)
 
+    maintain_partitions_parser = subparsers.add_parser(
+        'maintain-partitions',
+        help='Pre-create and drop the events and logs daily partitions')
+    maintain_partitions_parser.set_defaults(func=maintain_partitions)
+
     log_levels = ['debug', 'info', 'warning', 'error', 'critical']
     parser.add_argument(
         '-l', '--log-level',
@@ -0,0 +1,76 @@
+"""Add trigram indexes on the message of events and logs
+
+Revision ID: 39b682dfbedc
+Revises: e08a98c5ede0
+Create Date: 2026-10-18 20:47:31.602158
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '39b682dfbedc'
+down_revision = 'e08a98c5ede0'
+branch_labels = None
+depends_on = None
+
+PARTITIONED_TABLES = ['events', 'logs']
+
+
+def upgrade():
+    # pg_trgm is shipped in the postgresql contrib package
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table_name in PARTITIONED_TABLES:
+        op.create_index(
+            op.f('{0}_message_idx'.format(table_name)),
+            table_name,
+            ['message'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'message': 'gin_trgm_ops'},
+        )
+        # Partitions created from now on copy the index of the parent table,
+        # but the ones that already exist need it as well
+        op.execute("""
+            DO $$
+            DECLARE
+                partition_name name;
+            BEGIN
+                FOR partition_name IN
+                    SELECT child.relname FROM pg_inherits
+                    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                    WHERE pg_inherits.inhparent = '{0}'::regclass
+                LOOP
+                    EXECUTE format(
+                        'CREATE INDEX %I ON %I USING gin '
+                        '(message gin_trgm_ops)',
+                        partition_name || '_message_idx', partition_name);
+                END LOOP;
+            END
+            $$
+        """.format(table_name))
+
+
+def downgrade():
+    for table_name in PARTITIONED_TABLES:
+        op.execute("""
+            DO $$
+            DECLARE
+                partition_name name;
+            BEGIN
+                FOR partition_name IN
+                    SELECT child.relname FROM pg_inherits
+                    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                    WHERE pg_inherits.inhparent = '{0}'::regclass
+                LOOP
+                    EXECUTE format('DROP INDEX IF EXISTS %I',
+                                   partition_name || '_message_idx');
+                END LOOP;
+            END
+            $$
+        """.format(table_name))
+        op.drop_index(
+            op.f('{0}_message_idx'.format(table_name)),
+            table_name=table_name,
+        )
+    op.execute('DROP EXTENSION IF EXISTS pg_trgm')
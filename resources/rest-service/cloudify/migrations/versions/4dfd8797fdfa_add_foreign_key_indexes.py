@@ -0,0 +1,33 @@
+"""Add indexes to foreign keys used in joins
+
+Revision ID: 4dfd8797fdfa
+Revises: 3496c876cd1a
+Create Date: 2026-10-18 10:12:31.554728
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4dfd8797fdfa'
+down_revision = '3496c876cd1a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('deployments__blueprint_fk_idx'), 'deployments', ['_blueprint_fk'], unique=False)
+    op.create_index(op.f('executions__deployment_fk_idx'), 'executions', ['_deployment_fk'], unique=False)
+    op.create_index(op.f('nodes__deployment_fk_idx'), 'nodes', ['_deployment_fk'], unique=False)
+    op.create_index(op.f('node_instances__node_fk_idx'), 'node_instances', ['_node_fk'], unique=False)
+    op.create_index('events__execution_fk_timestamp_idx', 'events', ['_execution_fk', 'timestamp'], unique=False)
+    op.create_index('logs__execution_fk_timestamp_idx', 'logs', ['_execution_fk', 'timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('logs__execution_fk_timestamp_idx', table_name='logs')
+    op.drop_index('events__execution_fk_timestamp_idx', table_name='events')
+    op.drop_index(op.f('node_instances__node_fk_idx'), table_name='node_instances')
+    op.drop_index(op.f('nodes__deployment_fk_idx'), table_name='nodes')
+    op.drop_index(op.f('executions__deployment_fk_idx'), table_name='executions')
+    op.drop_index(op.f('deployments__blueprint_fk_idx'), table_name='deployments')
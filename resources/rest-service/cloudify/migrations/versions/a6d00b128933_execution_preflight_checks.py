@@ -0,0 +1,47 @@
+"""Store workflow plugins in deployments and index execution status
+
+Revision ID: a6d00b128933
+Revises: f1dab814a4a0
+Create Date: 2026-10-18 14:02:47.381920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d00b128933'
+down_revision = 'f1dab814a4a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'deployments',
+        sa.Column(
+            '_workflow_plugins_to_install',
+            postgresql.JSONB(),
+            nullable=True,
+        ),
+    )
+    # Copy the workflow plugins from the plan of the deployments' blueprints
+    op.execute("""
+        UPDATE deployments
+        SET _workflow_plugins_to_install =
+            blueprints.plan -> 'workflow_plugins_to_install'
+        FROM blueprints
+        WHERE deployments._blueprint_fk = blueprints._storage_id
+    """)
+    op.create_index(
+        op.f('executions_status_idx'),
+        'executions',
+        ['status'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('executions_status_idx'), table_name='executions')
+    op.drop_column('deployments', '_workflow_plugins_to_install')
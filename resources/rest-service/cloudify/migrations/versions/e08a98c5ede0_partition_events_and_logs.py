@@ -0,0 +1,70 @@
+"""Route events and logs to daily partitions
+
+Revision ID: e08a98c5ede0
+Revises: a6d00b128933
+Create Date: 2026-10-18 18:21:05.114872
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e08a98c5ede0'
+down_revision = 'a6d00b128933'
+branch_labels = None
+depends_on = None
+
+PARTITIONED_TABLES = ['events', 'logs']
+
+
+def upgrade():
+    # Partitions (e.g. events_20171225) are created ahead of time by the
+    # partitions maintenance in the REST service, which is run every hour
+    # by `schema.py maintain-partitions`. Rows whose partition doesn't
+    # exist (yet) are kept in the parent table.
+    op.execute("""
+        CREATE FUNCTION route_to_partition() RETURNS trigger AS $$
+        DECLARE
+            partition_name text :=
+                TG_TABLE_NAME || '_' || to_char(NEW.timestamp, 'YYYYMMDD');
+        BEGIN
+            IF to_regclass(CAST(partition_name AS cstring)) IS NULL THEN
+                RETURN NEW;
+            END IF;
+            EXECUTE format('INSERT INTO %I SELECT ($1).*', partition_name)
+                USING NEW;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name in PARTITIONED_TABLES:
+        op.execute("""
+            CREATE TRIGGER {0}_route_to_partition
+            BEFORE INSERT ON {0}
+            FOR EACH ROW EXECUTE PROCEDURE route_to_partition()
+        """.format(table_name))
+
+
+def downgrade():
+    for table_name in PARTITIONED_TABLES:
+        op.execute(
+            'DROP TRIGGER {0}_route_to_partition ON {0}'.format(table_name))
+        # Move the rows of every partition back to the parent table
+        op.execute("""
+            DO $$
+            DECLARE
+                partition regclass;
+            BEGIN
+                FOR partition IN
+                    SELECT inhrelid::regclass FROM pg_inherits
+                    WHERE inhparent = '{0}'::regclass
+                LOOP
+                    EXECUTE format('ALTER TABLE %s NO INHERIT {0}', partition);
+                    EXECUTE format('INSERT INTO {0} SELECT * FROM %s',
+                                   partition);
+                    EXECUTE format('DROP TABLE %s', partition);
+                END LOOP;
+            END
+            $$
+        """.format(table_name))
+    op.execute('DROP FUNCTION route_to_partition()')
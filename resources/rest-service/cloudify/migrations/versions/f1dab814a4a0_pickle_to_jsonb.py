@@ -0,0 +1,100 @@
+"""Store plans, properties and runtime properties as JSONB
+
+Revision ID: f1dab814a4a0
+Revises: 4dfd8797fdfa
+Create Date: 2026-10-18 11:47:05.218311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1dab814a4a0'
+down_revision = '4dfd8797fdfa'
+branch_labels = None
+depends_on = None
+
+# (table name, column name, nullable)
+COLUMNS = [
+    ('blueprints', 'plan', False),
+    ('deployments', 'inputs', True),
+    ('deployments', 'outputs', True),
+    ('deployments', 'workflows', True),
+    ('nodes', 'properties', True),
+    ('nodes', 'relationships', True),
+    ('nodes', 'operations', True),
+    ('node_instances', 'runtime_properties', True),
+]
+
+# Number of rows converted in a single statement
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    for table_name, column_name, nullable in COLUMNS:
+        _convert_column(
+            table_name,
+            column_name,
+            nullable,
+            sa.PickleType(),
+            postgresql.JSONB(),
+        )
+
+
+def downgrade():
+    for table_name, column_name, nullable in COLUMNS:
+        _convert_column(
+            table_name,
+            column_name,
+            nullable,
+            postgresql.JSONB(),
+            sa.PickleType(),
+        )
+
+
+def _convert_column(table_name, column_name, nullable, old_type, new_type):
+    """Change the type of a column converting its values in python.
+
+    Values can't be converted between pickle and JSON in SQL, so they are
+    copied to a temporary column in batches, which then replaces the
+    original one.
+
+    """
+    new_column_name = '{0}_new'.format(column_name)
+    op.add_column(
+        table_name, sa.Column(new_column_name, new_type, nullable=True))
+
+    table = sa.table(
+        table_name,
+        sa.column('_storage_id', sa.Integer),
+        sa.column(column_name, old_type),
+        sa.column(new_column_name, new_type),
+    )
+    update = (
+        table.update()
+        .where(table.c._storage_id == sa.bindparam('_id'))
+        .values({new_column_name: sa.bindparam('_value')})
+    )
+    connection = op.get_bind()
+    rows = connection.execution_options(stream_results=True).execute(
+        sa.select([table.c._storage_id, table.c[column_name]])
+        .where(table.c[column_name].isnot(None))
+    )
+    while True:
+        batch = rows.fetchmany(BATCH_SIZE)
+        if not batch:
+            break
+        connection.execute(update, [
+            {'_id': storage_id, '_value': value}
+            for storage_id, value in batch
+        ])
+
+    op.drop_column(table_name, column_name)
+    op.alter_column(
+        table_name,
+        new_column_name,
+        new_column_name=column_name,
+        nullable=nullable,
+    )
@@ -8,6 +8,9 @@ from manager_rest import config
 from manager_rest.utils import abort_error
 from manager_rest.manager_exceptions import UnauthorizedError
 
+# Largest request body (in bytes) parsed for logging its json data
+MAX_LOGGED_BODY_SIZE = 1024 * 1024
+
 
 def setup_logger(logger):
     """Setup the Flask app's logger
@@ -45,8 +48,12 @@ def log_request():
     # args is the parsed query string data
     args_data = request.args.to_dict(False)
     # json data; other data (e.g. binary) is available via request.data,
-    #  but is not logged
-    json_data = request.json if hasattr(request, 'json') else None
+    #  but is not logged. Large bodies aren't read at all, as they'd be
+    #  buffered in memory (uploaded archives are streamed to disk instead)
+    json_data = None
+    if request.content_length is not None and \
+            request.content_length <= MAX_LOGGED_BODY_SIZE:
+        json_data = request.json if hasattr(request, 'json') else None
 
     # content-type and content-length are already included in headers
 
@@ -13,7 +13,9 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import os
 import ssl
+from threading import Lock
 
 from celery import Celery
 
@@ -28,6 +30,11 @@ TASK_STATE_SUCCESS = 'SUCCESS'
 TASK_STATE_RETRY = 'RETRY'
 TASK_STATE_FAILURE = 'FAILURE'
 
+# The client shared by all the requests of the current process
+_client = None
+_client_pid = None
+_client_lock = Lock()
+
 
 class CeleryClient(object):
 
@@ -48,6 +55,12 @@ class CeleryClient(object):
             CELERY_TASK_SERIALIZER="json",
             CELERY_TASK_RESULT_EXPIRES=600)
         self.celery.conf.update(BROKER_USE_SSL=ssl_settings)
+        # Tasks are sent using the connections and producers pooled by the
+        # app, which are reconnected (and the publish retried) if they break
+        self.celery.conf.update(
+            BROKER_POOL_LIMIT=config.instance.amqp_pool_limit,
+            BROKER_TRANSPORT_OPTIONS={'confirm_publish': True},
+            CELERY_TASK_PUBLISH_RETRY=True)
 
     def close(self):
         if self.celery:
@@ -106,8 +119,21 @@ class CeleryClient(object):
 
 
 def get_client():
+    """Get the Celery client of the current process
+
+    The client is created on first use and then shared, so that its broker
+    connections are reused by all the following requests instead of being
+    opened (including the TLS handshake) for every task. Processes forked
+    after the client was created get a new one.
+    """
+    global _client, _client_pid
+
     if config.instance.test_mode:
         from test.mocks import MockCeleryClient
         return MockCeleryClient()
-    else:
-        return CeleryClient()
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = CeleryClient()
+            _client_pid = os.getpid()
+        return _client
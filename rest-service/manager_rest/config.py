@@ -31,6 +31,7 @@ class Config(object):
         self.amqp_username = 'guest'
         self.amqp_password = 'guest'
         self.amqp_ca_path = ''
+        self.amqp_pool_limit = 10
         self.ldap_server = None
         self.ldap_username = None
         self.ldap_password = None
@@ -40,6 +41,9 @@ class Config(object):
         self.file_server_root = None
         self.file_server_url = None
         self.maintenance_folder = None
+        # Seconds between checks for running executions while maintenance
+        # mode is being activated (0 to check on every request)
+        self.maintenance_mode_activation_check_interval = 5
         self.rest_service_log_level = None
         self.rest_service_log_path = None
         self.rest_service_log_file_size_MB = None
@@ -48,6 +52,28 @@ class Config(object):
         self.insecure_endpoints_disabled = True
         self.max_results = 1000
         self.min_available_memory_mb = None
+        # Bytes read and written at a time when saving uploaded archives
+        self.upload_chunk_size = 1024 * 1024
+        # Largest accepted upload (blueprint, plugin or snapshot archive)
+        # in MB, or None for no limit
+        self.max_upload_size_mb = None
+        # Deployment environments created at the same time when restoring
+        # a snapshot. Only raise this once the workflow context's client
+        # handler is safe to share between threads
+        self.snapshot_restore_deployment_envs_concurrency = 1
+        # Rows deleted (and committed) at a time when deleting the events
+        # and logs of a deployment
+        self.events_delete_batch_size = 1000
+        # Daily partitions of the events and logs tables created ahead of
+        # time, and days for which events and logs are kept (None to keep
+        # them forever)
+        self.events_partitions_precreate_days = 7
+        self.events_retention_days = None
+        # Seconds between updates of a user's last login date
+        self.last_login_update_interval = 60
+        # Seconds for which verified credentials are cached (0 to disable)
+        self.authentication_cache_ttl = 10
+        self.authentication_cache_size = 1000
 
         self.security_hash_salt = None
         self.security_secret_key = None
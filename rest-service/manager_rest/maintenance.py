@@ -15,8 +15,11 @@
 #
 
 import os
+import time
 import StringIO
+import tempfile
 import traceback
+from threading import Lock
 
 from flask import jsonify, request
 
@@ -37,6 +40,14 @@ ALLOWED_ENDPOINTS = ['maintenance',
                      'version']
 LOCAL_ADDRESS = '127.0.0.1'
 
+# The last state read from the maintenance file, and the file's stat
+# signature at the time, so the file is only read again when replaced
+_state_cache = {'signature': None, 'state': None}
+# When running executions were last checked while activating maintenance
+# mode, and whether there were any
+_activation_check = {'checked_at': None, 'has_running_executions': None}
+_lock = Lock()
+
 
 def get_maintenance_file_path():
     return os.path.join(
@@ -58,6 +69,57 @@ def prepare_maintenance_dict(status,
     return state
 
 
+def get_maintenance_state():
+    """Return the maintenance mode state, or None if it's deactivated
+
+    The state file is shared by all the REST service processes, so it's
+    checked on every call, but only read and parsed again when it was
+    replaced, which `set_maintenance_state` always does.
+    """
+    maintenance_file = get_maintenance_file_path()
+    try:
+        stat = os.stat(maintenance_file)
+    except OSError:
+        return None
+    signature = (maintenance_file, stat.st_ino, stat.st_size, stat.st_mtime)
+    with _lock:
+        if _state_cache['signature'] != signature:
+            _state_cache['state'] = utils.read_json_file(maintenance_file)
+            _state_cache['signature'] = signature
+        return dict(_state_cache['state'])
+
+
+def set_maintenance_state(state):
+    """Write the maintenance mode state, replacing the state file atomically
+    """
+    utils.mkdirs(config.instance.maintenance_folder)
+    fd, tmp_path = tempfile.mkstemp(dir=config.instance.maintenance_folder)
+    os.close(fd)
+    utils.write_dict_to_json_file(tmp_path, state)
+    os.rename(tmp_path, get_maintenance_file_path())
+    with _lock:
+        _activation_check['checked_at'] = None
+
+
+def remove_maintenance_state():
+    os.remove(get_maintenance_file_path())
+
+
+def complete_maintenance_mode_activation(state):
+    """Move from the activating to the activated state, once there are no
+    running executions
+    """
+    now = utils.get_formatted_timestamp()
+    state = prepare_maintenance_dict(
+            MAINTENANCE_MODE_ACTIVATED,
+            activated_at=now,
+            remaining_executions=[],
+            requested_by=state['requested_by'],
+            activation_requested_at=state['activation_requested_at'])
+    set_maintenance_state(state)
+    return state
+
+
 def maintenance_mode_handler():
 
     # failed to route the request - this is a 404. Abort early.
@@ -71,24 +133,12 @@ def maintenance_mode_handler():
     # Removing v*/ from the endpoint
     index = request.endpoint.find('/')
     request_endpoint = request.endpoint[index+1:]
-    maintenance_file = os.path.join(
-            config.instance.maintenance_folder,
-            MAINTENANCE_MODE_STATUS_FILE)
 
-    if os.path.isfile(maintenance_file):
-        state = utils.read_json_file(maintenance_file)
+    state = get_maintenance_state()
+    if state is not None:
         if state['status'] == MAINTENANCE_MODE_ACTIVATING:
-            running_executions = get_running_executions()
-            if not running_executions:
-                now = utils.get_formatted_timestamp()
-                state = prepare_maintenance_dict(
-                        MAINTENANCE_MODE_ACTIVATED,
-                        activated_at=now,
-                        remaining_executions=[],
-                        requested_by=state['requested_by'],
-                        activation_requested_at=state[
-                            'activation_requested_at'])
-                utils.write_dict_to_json_file(maintenance_file, state)
+            if not _has_running_executions():
+                state = complete_maintenance_mode_activation(state)
             else:
                 return _handle_activating_mode(
                        state=state,
@@ -101,6 +151,24 @@ def maintenance_mode_handler():
             return _maintenance_mode_error()
 
 
+def _has_running_executions():
+    """Check whether there are running executions, at most once every
+    `maintenance_mode_activation_check_interval` seconds
+    """
+    interval = config.instance.maintenance_mode_activation_check_interval
+    now = time.time()
+    with _lock:
+        checked_at = _activation_check['checked_at']
+        if checked_at is not None and checked_at <= now < \
+                checked_at + interval:
+            return _activation_check['has_running_executions']
+    has_running_executions = bool(get_running_executions())
+    with _lock:
+        _activation_check['checked_at'] = now
+        _activation_check['has_running_executions'] = has_running_executions
+    return has_running_executions
+
+
 def _handle_activating_mode(state, request_endpoint):
     status = state['status']
 
@@ -384,6 +384,18 @@ class MethodNotAllowedError(ManagerException):
         )
 
 
+class PayloadTooLargeError(ManagerException):
+    ERROR_CODE = 'payload_too_large_error'
+
+    def __init__(self, *args, **kwargs):
+        super(PayloadTooLargeError, self).__init__(
+            413,
+            PayloadTooLargeError.ERROR_CODE,
+            *args,
+            **kwargs
+        )
+
+
 class SnapshotActionError(ManagerException):
     ERROR_CODE = 'snapshot_action_error'
 
@@ -19,18 +19,23 @@ import shutil
 import traceback
 import itertools
 from copy import deepcopy
+from collections import OrderedDict
 from StringIO import StringIO
 
 import celery.exceptions
 from flask import current_app
 from flask_security import current_user
+from sqlalchemy import and_ as sql_and, or_ as sql_or
 
 from dsl_parser import constants, tasks
 from dsl_parser import exceptions as parser_exceptions
 
 from manager_rest.constants import DEFAULT_TENANT_NAME
 from manager_rest.dsl_functions import get_secret_method
-from manager_rest.storage import get_storage_manager, models, get_node
+from manager_rest.storage import (db,
+                                  get_storage_manager,
+                                  models,
+                                  get_nodes)
 from manager_rest.storage.models_states import (SnapshotState,
                                                 ExecutionState,
                                                 DeploymentModificationState)
@@ -110,7 +115,9 @@ class ResourceManager(object):
             'postgresql_password': config_instance.postgresql_password,
             'postgresql_db_name': config_instance.postgresql_db_name,
             'postgresql_host': config_instance.postgresql_host,
-            'default_tenant_name': DEFAULT_TENANT_NAME
+            'default_tenant_name': DEFAULT_TENANT_NAME,
+            'deployment_envs_concurrency':
+                config_instance.snapshot_restore_deployment_envs_concurrency
         }
 
     def create_snapshot_model(self,
@@ -344,7 +351,6 @@ class ResourceManager(object):
                          allow_custom_parameters=False,
                          force=False, bypass_maintenance=None):
         deployment = self.sm.get(models.Deployment, deployment_id)
-        blueprint = self.sm.get(models.Blueprint, deployment.blueprint_id)
 
         if workflow_id not in deployment.workflows:
             raise manager_exceptions.NonexistentWorkflowError(
@@ -352,10 +358,7 @@ class ResourceManager(object):
                     workflow_id, deployment_id))
         workflow = deployment.workflows[workflow_id]
 
-        self._verify_deployment_environment_created_successfully(deployment_id)
-
-        self._check_for_active_system_wide_execution()
-        self._check_for_active_executions(deployment_id, force)
+        self._verify_workflow_can_be_executed(deployment, force)
 
         execution_parameters = \
             ResourceManager._merge_and_validate_execution_parameters(
@@ -378,8 +381,13 @@ class ResourceManager(object):
         self.sm.put(new_execution)
 
         # executing the user workflow
-        workflow_plugins = blueprint.plan[
-            constants.WORKFLOW_PLUGINS_TO_INSTALL]
+        workflow_plugins = deployment._workflow_plugins_to_install
+        if workflow_plugins is None:
+            # Deployments restored from old snapshots don't have a copy of
+            # the workflow plugins
+            blueprint = self.sm.get(models.Blueprint, deployment.blueprint_id)
+            workflow_plugins = blueprint.plan[
+                constants.WORKFLOW_PLUGINS_TO_INSTALL]
         workflow_executor.execute_workflow(
             workflow_id,
             workflow,
@@ -409,18 +417,51 @@ class ResourceManager(object):
                 'Currently running executions: {0}'
                 .format(executions))
 
-    def _check_for_active_system_wide_execution(self):
-        filters = {
-            'status': ExecutionState.ACTIVE_STATES
-        }
-        for e in self.list_executions(is_include_system_workflows=True,
-                                      filters=filters).items:
-            if e.deployment_id is None:
+    def _verify_workflow_can_be_executed(self, deployment, force):
+        """Verify that the deployment environment was created successfully,
+        and that no conflicting execution is running
+
+        All the executions the checks depend on (the deployment environment
+        creation and the active executions) are fetched in a single query
+        """
+        executions = self.sm.query(models.Execution).filter(sql_or(
+            models.Execution.status.in_(ExecutionState.ACTIVE_STATES),
+            sql_and(
+                models.Execution._deployment_fk == deployment._storage_id,
+                models.Execution.workflow_id ==
+                'create_deployment_environment'
+            )
+        )).all()
+        deployment_executions = [
+            e for e in executions
+            if e._deployment_fk == deployment._storage_id]
+
+        env_creation = next(
+            (e for e in deployment_executions
+             if e.workflow_id == 'create_deployment_environment'),
+            None)
+        self._verify_deployment_environment_created_successfully(
+            deployment.id, env_creation)
+
+        for e in executions:
+            if e._deployment_fk is None and \
+                    e.status in ExecutionState.ACTIVE_STATES:
                 raise manager_exceptions.ExistingRunningExecutionError(
                     'You cannot start an execution if there is a running '
                     'system-wide execution (id: {0})'
                     .format(e.id))
 
+        # validate no execution is currently in progress
+        if not force:
+            running = [e.id for e in deployment_executions
+                       if e.status in ExecutionState.ACTIVE_STATES]
+            if len(running) > 0:
+                raise manager_exceptions.ExistingRunningExecutionError(
+                    'The following executions are currently running for this '
+                    'deployment: {0}. To execute this workflow anyway, pass '
+                    '"force=true" as a query parameter to this request'.format(
+                        running))
+
     def _execute_system_workflow(self, wf_id, task_mapping, deployment=None,
                                  execution_parameters=None, timeout=0,
                                  created_at=None, verify_no_executions=True,
@@ -566,6 +607,8 @@ class ResourceManager(object):
             groups=deployment_plan['groups'],
             scaling_groups=deployment_plan['scaling_groups'],
             outputs=deployment_plan['outputs'],
+            _workflow_plugins_to_install=deployment_plan[
+                constants.WORKFLOW_PLUGINS_TO_INSTALL],
         )
 
     def prepare_deployment_nodes_for_storage(self,
@@ -606,10 +649,15 @@ class ResourceManager(object):
 
     def _prepare_deployment_node_instances_for_storage(self,
                                                        deployment_id,
-                                                       dsl_node_instances):
+                                                       dsl_node_instances,
+                                                       nodes=None):
+        if nodes is None:
+            nodes = get_nodes(deployment_id,
+                              [node_instance['node_id']
+                               for node_instance in dsl_node_instances])
         node_instances = []
         for node_instance in dsl_node_instances:
-            node = get_node(deployment_id, node_instance['node_id'])
+            node = nodes[node_instance['node_id']]
             instance_id = node_instance['id']
             scaling_groups = node_instance.get('scaling_groups', [])
             relationships = node_instance.get('relationships', [])
@@ -623,7 +671,7 @@ class ResourceManager(object):
                 version=None,
                 scaling_groups=scaling_groups
             )
-            instance.set_node(node)
+            instance.set_node_keys(node)
             node_instances.append(instance)
 
         return node_instances
@@ -631,13 +679,14 @@ class ResourceManager(object):
     def _create_deployment_nodes(self,
                                  deployment_id,
                                  plan,
-                                 node_ids=None):
+                                 node_ids=None,
+                                 commit=True):
         nodes = self.prepare_deployment_nodes_for_storage(plan, node_ids)
         deployment = self.sm.get(models.Deployment, deployment_id)
 
         for node in nodes:
-            node.set_deployment(deployment)
-            self.sm.put(node)
+            node.set_deployment_keys(deployment)
+        self.sm.put_many(nodes, commit=commit)
 
     def _create_deployment_node_instances(self,
                                           deployment_id,
@@ -646,8 +695,7 @@ class ResourceManager(object):
             deployment_id,
             dsl_node_instances)
 
-        for node_instance in node_instances:
-            self.sm.put(node_instance)
+        self.sm.put_many(node_instances)
 
     def create_deployment(self,
                           blueprint_id,
@@ -697,13 +745,18 @@ class ResourceManager(object):
         # private, or the user passed the `private_resource` flag
         private_resource = private_resource or blueprint.private_resource
         new_deployment.private_resource = private_resource
-        self.sm.put(new_deployment)
-
-        self._create_deployment_nodes(deployment_id, deployment_plan)
-
-        self._create_deployment_node_instances(
-            deployment_id,
-            dsl_node_instances=deployment_plan['node_instances'])
+        try:
+            self.sm.put(new_deployment, commit=False)
+            self._create_deployment_nodes(deployment_id,
+                                          deployment_plan,
+                                          commit=False)
+            # Commits all of the above in a single transaction
+            self._create_deployment_node_instances(
+                deployment_id,
+                dsl_node_instances=deployment_plan['node_instances'])
+        except Exception:
+            db.session.rollback()
+            raise
 
         self._create_deployment_environment(new_deployment,
                                             deployment_plan,
@@ -771,21 +824,20 @@ class ResourceManager(object):
                     'started deployment modifications: {0}'
                     .format(active_modifications))
 
-        nodes = [node.to_dict() for node
-                 in self.sm.list(models.Node, filters=deployment_id_filter)]
-        node_instances = [instance.to_dict() for instance
-                          in self.sm.list(models.NodeInstance,
-                          filters=deployment_id_filter)]
+        nodes = self._get_deployment_nodes(deployment)
+        instances = self._get_deployment_node_instances(
+            nodes.values(), locking=True)
+        node_dicts = [node.to_dict() for node in nodes.values()]
+        node_instances = [instance.to_dict() for instance in instances]
+        before_modification = deepcopy(node_instances)
         node_instances_modification = tasks.modify_deployment(
-            nodes=nodes,
-            previous_nodes=nodes,
+            nodes=node_dicts,
+            previous_nodes=node_dicts,
             previous_node_instances=node_instances,
             modified_nodes=modified_nodes,
             scaling_groups=deployment.scaling_groups)
-
-        node_instances_modification['before_modification'] = [
-            instance.to_dict() for instance in
-            self.sm.list(models.NodeInstance, filters=deployment_id_filter)]
+        node_instances_modification['before_modification'] = \
+            before_modification
 
         now = utils.get_formatted_timestamp()
         modification_id = str(uuid.uuid4())
@@ -798,7 +850,6 @@ class ResourceManager(object):
             node_instances=node_instances_modification,
             context=context)
         modification.set_deployment(deployment)
-        self.sm.put(modification)
 
         scaling_groups = deepcopy(deployment.scaling_groups)
         for node_id, modified_node in modified_nodes.items():
@@ -808,27 +859,23 @@ class ResourceManager(object):
                 })
                 deployment.scaling_groups = scaling_groups
             else:
-                node = get_node(modification.deployment_id, node_id)
+                node = self._get_modified_node(nodes, deployment_id, node_id)
                 node.planned_number_of_instances = modified_node['instances']
-                self.sm.update(node)
-        self.sm.update(deployment)
 
+        instances = {instance.id: instance for instance in instances}
         added_and_related = node_instances_modification['added_and_related']
         added_node_instances = []
         for node_instance in added_and_related:
             if node_instance.get('modification') == 'added':
                 added_node_instances.append(node_instance)
             else:
-                node = get_node(
-                    deployment_id=deployment_id,
-                    node_id=node_instance['node_id']
-                )
+                node = nodes[node_instance['node_id']]
                 target_names = [r['target_id'] for r in node.relationships]
-                current = self.sm.get(models.NodeInstance, node_instance['id'])
+                instance = instances[node_instance['id']]
                 current_relationship_groups = {
                     target_name: list(group)
                     for target_name, group in itertools.groupby(
-                        current.relationships,
+                        instance.relationships,
                         key=lambda r: r['target_name'])
                 }
                 new_relationship_groups = {
@@ -843,16 +890,14 @@ class ResourceManager(object):
                         target_name, [])
                     new_relationships += new_relationship_groups.get(
                         target_name, [])
-                instance = self.sm.get(
-                    models.NodeInstance,
-                    node_instance['id'],
-                    locking=True
-                )
                 instance.relationships = deepcopy(new_relationships)
                 instance.version += 1
-                self.sm.update(instance)
-        self._create_deployment_node_instances(deployment_id,
-                                               added_node_instances)
+        self.sm.put_many(
+            self._prepare_deployment_node_instances_for_storage(
+                deployment_id, added_node_instances, nodes),
+            commit=False)
+        # Commits all of the above in a single transaction
+        self.sm.put(modification)
         return modification
 
     def finish_deployment_modification(self, modification_id):
@@ -869,6 +914,10 @@ class ResourceManager(object):
         deployment = self.sm.get(models.Deployment, modification.deployment_id)
 
         modified_nodes = modification.modified_nodes
+        nodes = get_nodes(
+            modification.deployment_id,
+            [node_id for node_id in modified_nodes
+             if node_id not in deployment.scaling_groups])
         scaling_groups = deepcopy(deployment.scaling_groups)
         for node_id, modified_node in modified_nodes.items():
             if node_id in deployment.scaling_groups:
@@ -877,20 +926,18 @@ class ResourceManager(object):
                 })
                 deployment.scaling_groups = scaling_groups
             else:
-                node = get_node(modification.deployment_id, node_id)
-                node.number_of_instances = modified_node['instances']
-                self.sm.update(node)
-        self.sm.update(deployment)
-
-        node_instances = modification.node_instances
-        for node_instance_dict in node_instances['removed_and_related']:
-            instance = self.sm.get(
-                models.NodeInstance,
-                node_instance_dict['id'],
-                locking=True
-            )
+                nodes[node_id].number_of_instances = modified_node['instances']
+
+        removed_and_related = \
+            modification.node_instances['removed_and_related']
+        instances = self._get_node_instances(
+            [node_instance['id'] for node_instance in removed_and_related],
+            locking=True)
+        removed_instances = []
+        for node_instance_dict in removed_and_related:
+            instance = instances[node_instance_dict['id']]
             if node_instance_dict.get('modification') == 'removed':
-                self.sm.delete(instance)
+                removed_instances.append(instance)
             else:
                 removed_relationship_target_ids = set(
                     [rel['target_id']
@@ -901,10 +948,11 @@ class ResourceManager(object):
                                      not in removed_relationship_target_ids]
                 instance.relationships = deepcopy(new_relationships)
                 instance.version += 1
-                self.sm.update(instance)
+        self.sm.delete_many(removed_instances, commit=False)
 
         modification.status = DeploymentModificationState.FINISHED
         modification.ended_at = utils.get_formatted_timestamp()
+        # Commits all of the above in a single transaction
         self.sm.update(modification)
         return modification
 
@@ -922,25 +970,17 @@ class ResourceManager(object):
 
         deployment = self.sm.get(models.Deployment, modification.deployment_id)
 
-        deployment_id_filter = self.create_filters_dict(
-            deployment_id=modification.deployment_id)
-        node_instances = self.sm.list(
-            models.NodeInstance,
-            filters=deployment_id_filter
-        )
+        nodes = self._get_deployment_nodes(deployment)
+        node_instances = self._get_deployment_node_instances(
+            nodes.values(), locking=True)
         modified_instances = deepcopy(modification.node_instances)
         modified_instances['before_rollback'] = [
             instance.to_dict() for instance in node_instances]
-        for instance in node_instances:
-            self.sm.delete(instance)
-        for instance_dict in modified_instances['before_modification']:
-            self.add_node_instance_from_dict(instance_dict)
-        nodes_num_instances = {
-            node.id: node for node in self.sm.list(
-                models.Node,
-                filters=deployment_id_filter,
-                include=['id', 'number_of_instances'])
-            }
+        self.sm.delete_many(node_instances, commit=False)
+        self.sm.put_many(
+            [self._node_instance_from_dict(instance_dict, nodes)
+             for instance_dict in modified_instances['before_modification']],
+            commit=False)
 
         scaling_groups = deepcopy(deployment.scaling_groups)
         for node_id, modified_node in modification.modified_nodes.items():
@@ -949,36 +989,159 @@ class ResourceManager(object):
                 props['planned_instances'] = props['current_instances']
                 deployment.scaling_groups = scaling_groups
             else:
-                node = get_node(modification.deployment_id, node_id)
-                node.planned_number_of_instances = nodes_num_instances[
-                        node_id].number_of_instances
-                self.sm.update(node)
-        self.sm.update(deployment)
+                node = self._get_modified_node(
+                    nodes, modification.deployment_id, node_id)
+                node.planned_number_of_instances = node.number_of_instances
 
         modification.status = DeploymentModificationState.ROLLEDBACK
         modification.ended_at = utils.get_formatted_timestamp()
         modification.node_instances = modified_instances
+        # Commits all of the above in a single transaction
         self.sm.update(modification)
         return modification
 
-    def add_node_instance_from_dict(self, instance_dict):
-        # Remove the IDs from the dict - they don't have comparable columns
-        deployment_id = instance_dict.pop('deployment_id')
-        node_id = instance_dict.pop('node_id')
-        tenant_name = instance_dict.pop('tenant_name')
-        created_by = instance_dict.pop('created_by')
+    def _get_deployment_nodes(self, deployment):
+        """Return a dict of all the nodes of a deployment, by ID"""
+        nodes = (
+            self.sm.query(models.Node)
+            .filter(models.Node._deployment_fk == deployment._storage_id)
+            .order_by(models.Node._storage_id)
+            .all()
+        )
+        return OrderedDict((node.id, node) for node in nodes)
 
-        # Link the node instance object to to the node, and add it to the DB
-        new_node_instance = models.NodeInstance(**instance_dict)
-        node = get_node(deployment_id, node_id)
-        new_node_instance.set_node(node)
-        self.sm.put(new_node_instance)
+    def _get_deployment_node_instances(self, nodes, locking=False):
+        """Return a list of all the node instances of `nodes`
 
-        # Return the IDs to the dict for later use
-        instance_dict['deployment_id'] = deployment_id
-        instance_dict['node_id'] = node_id
-        instance_dict['tenant_name'] = tenant_name
-        instance_dict['created_by'] = created_by
+        Unlike `sm.list`, the number of node instances isn't limited by
+        `max_results`, as they're only used internally
+        """
+        query = (
+            self.sm.query(models.NodeInstance)
+            .filter(models.NodeInstance._node_fk.in_(
+                [node._storage_id for node in nodes]))
+            # Always locking rows in the same order, to avoid deadlocks
+            .order_by(models.NodeInstance._storage_id)
+        )
+        if locking:
+            query = query.with_for_update()
+        return query.all()
+
+    def _get_node_instances(self, node_instance_ids, locking=False):
+        """Return a dict of the node instances with the given IDs, by ID"""
+        node_instances = {}
+        for i in range(0, len(node_instance_ids), self.sm.ID_CHUNK_SIZE):
+            query = (
+                self.sm.query(models.NodeInstance)
+                .filter(models.NodeInstance.id.in_(
+                    node_instance_ids[i:i + self.sm.ID_CHUNK_SIZE]))
+                .order_by(models.NodeInstance._storage_id)
+            )
+            if locking:
+                query = query.with_for_update()
+            node_instances.update(
+                (instance.id, instance) for instance in query)
+        missing = set(node_instance_ids) - set(node_instances)
+        if missing:
+            raise manager_exceptions.NotFoundError(
+                'Requested `NodeInstance`s with IDs `{0}` were not '
+                'found'.format(', '.join(sorted(missing))))
+        return node_instances
+
+    @staticmethod
+    def _get_modified_node(nodes, deployment_id, node_id):
+        try:
+            return nodes[node_id]
+        except KeyError:
+            raise manager_exceptions.NotFoundError(
+                'Requested Node with ID `{0}` on Deployment `{1}` '
+                'was not found'.format(node_id, deployment_id))
+
+    @staticmethod
+    def _node_instance_from_dict(instance_dict, nodes):
+        """Create a node instance from its `to_dict()` representation"""
+        instance_dict = dict(instance_dict)
+        # Remove the IDs from the dict - they don't have comparable columns
+        instance_dict.pop('deployment_id')
+        node_id = instance_dict.pop('node_id')
+        instance_dict.pop('tenant_name')
+        instance_dict.pop('created_by')
+        instance = models.NodeInstance(**instance_dict)
+        instance.set_node_keys(nodes[node_id])
+        return instance
+
+    def update_node_instances(self, updates):
+        """Update the state and/or runtime properties of node instances
+
+        All the updates are applied in a single transaction. The rows of the
+        node instances are locked and their versions are read with a single
+        query (per chunk of ids), and node instances whose current version
+        is different from the one passed aren't updated.
+
+        :param updates: A list of dicts, each with the `id` and `version` of
+                        a node instance, and optionally its new `state`
+                        and either its new `runtime_properties` or a
+                        `runtime_properties_patch` (a JSON merge patch)
+        :return: A list with the result of every update, in the same order
+        """
+        ids = [update['id'] for update in updates]
+        columns = [models.NodeInstance._storage_id,
+                   models.NodeInstance.id,
+                   models.NodeInstance.version]
+        # The runtime properties are only loaded if there are patches to
+        # apply to them
+        if any('runtime_properties_patch' in update for update in updates):
+            columns.append(models.NodeInstance.runtime_properties)
+        current = {}
+        for i in range(0, len(ids), self.sm.ID_CHUNK_SIZE):
+            rows = (
+                self.sm.query(models.NodeInstance)
+                .with_entities(*columns)
+                .filter(models.NodeInstance.id.in_(
+                    ids[i:i + self.sm.ID_CHUNK_SIZE]))
+                # Always locking rows in the same order, so that concurrent
+                # batches don't deadlock
+                .order_by(models.NodeInstance._storage_id)
+                .with_for_update()
+                .all()
+            )
+            current.update((row.id, row) for row in rows)
+
+        results = []
+        values = []
+        for update in updates:
+            instance = current.get(update['id'])
+            result = {'id': update['id']}
+            if instance is None:
+                result['error_code'] = \
+                    manager_exceptions.NotFoundError.NOT_FOUND_ERROR_CODE
+                result['message'] = 'Requested `NodeInstance` with ID `{0}` ' \
+                                    'was not found'.format(update['id'])
+            elif instance.version != update['version']:
+                result['version'] = instance.version
+                result['error_code'] = \
+                    manager_exceptions.ConflictError.CONFLICT_ERROR_CODE
+                result['message'] = 'Node instance `{0}` is at version ' \
+                                    '{1}, not {2}'.format(update['id'],
+                                                          instance.version,
+                                                          update['version'])
+            else:
+                result['version'] = instance.version + 1
+                instance_values = {'_storage_id': instance._storage_id,
+                                   'version': result['version']}
+                for attr in ('state', 'runtime_properties'):
+                    if attr in update:
+                        instance_values[attr] = update[attr]
+                if 'runtime_properties_patch' in update:
+                    instance_values['runtime_properties'] = \
+                        utils.json_merge_patch(
+                            instance.runtime_properties,
+                            update['runtime_properties_patch'])
+                values.append(instance_values)
+            results.append(result)
+
+        self.sm.update_many(models.NodeInstance, values)
+        return results
 
     @staticmethod
     def _try_convert_from_str(string, target_type):
@@ -1099,17 +1262,9 @@ class ResourceManager(object):
             prepared_relationships.append(relationship)
         return prepared_relationships
 
-    def _verify_deployment_environment_created_successfully(self,
-                                                            deployment_id):
-        deployment_id_filter = self.create_filters_dict(
-            deployment_id=deployment_id,
-            workflow_id='create_deployment_environment')
-        env_creation = next(
-            (execution for execution in
-             self.sm.list(models.Execution, filters=deployment_id_filter)
-             if execution.workflow_id == 'create_deployment_environment'),
-            None)
-
+    @staticmethod
+    def _verify_deployment_environment_created_successfully(deployment_id,
+                                                            env_creation):
         if not env_creation:
             raise RuntimeError('Failed to find "create_deployment_environment"'
                                ' execution for deployment {0}'.format(
@@ -1202,29 +1357,6 @@ class ResourceManager(object):
                     constants.WORKFLOW_PLUGINS_TO_INSTALL],
             })
 
-    def _check_for_active_executions(self, deployment_id, force):
-
-        def _get_running_executions(deployment_id=None, include_system=True):
-            deployment_id_filter = self.create_filters_dict(
-                deployment_id=deployment_id,
-                status=ExecutionState.ACTIVE_STATES)
-            executions = self.list_executions(
-                filters=deployment_id_filter,
-                is_include_system_workflows=include_system).items
-            return [e.id for e in executions if
-                    self.sm.get(models.Execution, e.id).status
-                    not in ExecutionState.END_STATES]
-
-        # validate no execution is currently in progress
-        if not force:
-            running = _get_running_executions(deployment_id)
-            if len(running) > 0:
-                raise manager_exceptions.ExistingRunningExecutionError(
-                    'The following executions are currently running for this '
-                    'deployment: {0}. To execute this workflow anyway, pass '
-                    '"force=true" as a query parameter to this request'.format(
-                        running))
-
     @staticmethod
     def _get_only_user_execution_parameters(execution_parameters):
         return {k: v for k, v in execution_parameters.iteritems()
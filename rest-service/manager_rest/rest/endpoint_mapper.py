@@ -49,6 +49,10 @@ def setup_resources(api):
         'NodeInstances': 'node-instances',
         'NodeInstancesId': 'node-instances/<string:node_instance_id>',
         'Events': 'events',
+        'EventsExport': 'events/export',
+        'EventsTail': 'events/tail',
+        'EventsBulk': 'events/bulk',
+        'EventsPartitions': 'events/partitions',
         'Search': 'search',
         'Status': 'status',
         'ProviderContext': 'provider/context',
@@ -14,6 +14,8 @@
 #  * limitations under the License.
 #
 
+import re
+
 from flask import current_app
 from flask_restful_swagger import swagger
 from sqlalchemy import (
@@ -62,6 +64,9 @@ class Events(SecuredResource):
         'event_type': (Event.event_type, 'in'),
         'level': (Log.level, 'in'),
         'message': ('message', 'ilike'),
+        # Case insensitive substring search (the value isn't a pattern),
+        # which can use the trigram indexes on the message columns
+        'message_contains': ('message', 'contains'),
     }
 
     # Map from old Elasticsearch field name to PostgreSQL one
@@ -69,6 +74,18 @@ class Events(SecuredResource):
         'message.text': 'message',
     }
 
+    @staticmethod
+    def _escape_like(value):
+        """Escape the wildcards in a value to match it literally with LIKE.
+
+        :param value: Value to escape
+        :type value: str
+        :returns: Value with `\\`, `%` and `_` escaped with a backslash
+        :rtype: str
+
+        """
+        return re.sub(r'([\\%_])', r'\\\1', value)
+
     @staticmethod
     def _apply_filters(query, model, filters):
         """Apply filters to the query.
@@ -110,10 +127,16 @@ class Events(SecuredResource):
             elif filter_type == 'ilike':
                 for filter_element in filter_:
                     query = query.filter(model_field.ilike(filter_element))
+            elif filter_type == 'contains':
+                for filter_element in filter_:
+                    query = query.filter(model_field.ilike(
+                        u'%{0}%'.format(Events._escape_like(filter_element)),
+                        escape='\\',
+                    ))
             else:
                 raise ValueError(
                     'Unknown filter type: {0}. '
-                    'Allowed values: ilike, in'
+                    'Allowed values: contains, ilike, in'
                     .format(filter_type)
                 )
 
@@ -203,6 +226,30 @@ class Events(SecuredResource):
             query = query.filter(getattr(model, field) <= range_filter['to'])
         return query
 
+    @staticmethod
+    def _get_models_to_query(filters):
+        """Get the models that might have results for the given filters.
+
+        Events are only returned if no log specific filter is used (and the
+        other way around for logs). In both cases, the type filter, if
+        passed, must include them.
+
+        :param filters: Filters passed as request argument
+        :type filters: dict(str, list(str))
+        :returns: Models that should be queried
+        :rtype: list
+
+        """
+        models = []
+        if (('type' not in filters or 'cloudify_event' in filters['type']) and
+                ('level' not in filters)):
+            models.append(Event)
+
+        if (('type' not in filters or 'cloudify_log' in filters['type']) and
+                ('event_type' not in filters)):
+            models.append(Log)
+        return models
+
     @staticmethod
     def _build_select_query(filters, sort, range_filters, tenant_id):
         """Build query used to list events for a given execution.
@@ -245,18 +292,11 @@ class Events(SecuredResource):
         assert isinstance(filters, dict), \
             'Filters is expected to be a dictionary'
 
-        subqueries = []
-        if (('type' not in filters or 'cloudify_event' in filters['type']) and
-                ('level' not in filters)):
-            events_query = Events._build_select_subquery(
-                Event, filters, range_filters, tenant_id)
-            subqueries.append(events_query)
-
-        if (('type' not in filters or 'cloudify_log' in filters['type']) and
-                ('event_type' not in filters)):
-            logs_query = Events._build_select_subquery(
-                Log, filters, range_filters, tenant_id)
-            subqueries.append(logs_query)
+        subqueries = [
+            Events._build_select_subquery(
+                model, filters, range_filters, tenant_id)
+            for model in Events._get_models_to_query(filters)
+        ]
 
         if subqueries:
             query = reduce(lambda left, right: left.union(right), subqueries)
@@ -380,18 +420,11 @@ class Events(SecuredResource):
         assert isinstance(filters, dict), \
             'Filters is expected to be a dictionary'
 
-        subqueries = []
-        if (('type' not in filters or 'cloudify_event' in filters['type']) and
-                ('level' not in filters)):
-            events_query = Events._build_count_subquery(
-                Event, filters, range_filters, tenant_id)
-            subqueries.append(events_query)
-
-        if (('type' not in filters or 'cloudify_log' in filters['type']) and
-                ('event_type' not in filters)):
-            logs_query = Events._build_count_subquery(
-                Log, filters, range_filters, tenant_id)
-            subqueries.append(logs_query)
+        subqueries = [
+            Events._build_count_subquery(
+                model, filters, range_filters, tenant_id)
+            for model in Events._get_models_to_query(filters)
+        ]
 
         if subqueries:
             query = db.session.query(sum(subqueries))
@@ -452,9 +485,12 @@ class Events(SecuredResource):
         :rtype: dict(str)
 
         """
+        # Columns prefixed with an underscore are only used internally
+        # (for example, to build a pagination cursor)
         event = {
             attr: getattr(sql_event, attr)
             for attr in sql_event.keys()
+            if not attr.startswith('_')
         }
         event['@timestamp'] = event['timestamp']
         del event['reported_timestamp']
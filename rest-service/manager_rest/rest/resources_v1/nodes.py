@@ -216,6 +216,10 @@ class NodeInstancesId(SecuredResource):
             node_instance_id,
             locking=True
         )
+        self._update_instance(instance, request_dict, version)
+        return get_storage_manager().update(instance)
+
+    def _update_instance(self, instance, request_dict, version):
         # Only update if new values were included in the request
         instance.runtime_properties = request_dict.get(
             'runtime_properties',
@@ -223,4 +227,3 @@ class NodeInstancesId(SecuredResource):
         )
         instance.state = request_dict.get('state', instance.state)
         instance.version = version + 1
-        return get_storage_manager().update(instance)
@@ -14,14 +14,29 @@
 #  * limitations under the License.
 #
 
+import operator
+
+from dateutil.parser import parse as parse_datetime
 from flask_restful_swagger import swagger
-from sqlalchemy import bindparam
+from sqlalchemy import (
+    asc,
+    bindparam,
+    desc,
+    or_,
+    select,
+    type_coerce,
+    union_all,
+)
 
-from manager_rest import manager_exceptions
+from manager_rest import (
+    config,
+    manager_exceptions,
+)
 from manager_rest.rest import (
     resources_v1,
     rest_decorators,
 )
+from manager_rest.rest.rest_utils import encode_cursor
 from manager_rest.storage.models_base import db
 from manager_rest.storage.resource_models import (
     Deployment,
@@ -50,11 +65,12 @@ class Events(resources_v1.Events):
     @rest_decorators.marshal_events
     @rest_decorators.create_filters()
     @rest_decorators.paginate
+    @rest_decorators.cursorable
     @rest_decorators.rangeable
     @rest_decorators.projection
     @rest_decorators.sortable()
-    def get(self, _include=None, filters=None,
-            pagination=None, sort=None, range_filters=None, **kwargs):
+    def get(self, _include=None, filters=None, pagination=None, sort=None,
+            range_filters=None, cursor=None, get_total=False, **kwargs):
         """List events using a SQL backend.
 
         :param _include:
@@ -87,10 +103,23 @@ class Events(resources_v1.Events):
             Apparently was used to select a timestamp interval. It's not
             currently used.
         :type range_filters: dict(str)
+        :param cursor:
+            Decoded `_cursor` request argument. When set, keyset pagination
+            is used instead of `LIMIT/OFFSET` (see :meth:`_list_with_cursor`)
+        :type cursor: list
+        :param get_total:
+            Whether the total number of events should be counted when using
+            keyset pagination
+        :type get_total: bool
         :returns: Events found in the SQL backend
         :rtype: :class:`manager_rest.storage.storage_manager.ListResult`
 
         """
+        if cursor is not None:
+            return self._list_with_cursor(
+                _include, filters, pagination, sort, range_filters,
+                cursor, get_total)
+
         size = pagination.get('size', self.DEFAULT_SEARCH_SIZE)
         offset = pagination.get('offset', 0)
         params = {
@@ -119,6 +148,226 @@ class Events(resources_v1.Events):
         }
         return ListResult(results, metadata)
 
+    def _list_with_cursor(self, _include, filters, pagination, sort,
+                          range_filters, cursor, get_total):
+        """List events using keyset pagination.
+
+        Instead of skipping `offset` rows, every page starts right after the
+        last event of the previous one. Events are ordered by
+        `(timestamp, type, _storage_id)`, so the cursor that identifies the
+        last event is a `[timestamp, _storage_id, type]` triplet that is
+        returned, encoded, as `next_cursor` in the pagination metadata. This
+        way, the cost of getting a page doesn't depend on how deep it is.
+
+        The total number of events is only counted when requested.
+
+        """
+        if pagination.get('offset'):
+            raise manager_exceptions.BadParametersError(
+                '`_offset` cannot be used together with `_cursor`')
+        size = pagination.get('size', self.DEFAULT_SEARCH_SIZE)
+        descending = self._get_cursor_sort_order(sort) == 'desc'
+        cursor = self._parse_cursor(cursor)
+
+        select_query = self._build_cursor_select_query(
+            filters, descending, range_filters, self.current_tenant.id,
+            cursor)
+        events = select_query.params(limit=size).all() \
+            if select_query is not None else []
+
+        next_cursor = None
+        if events and len(events) == size:
+            next_cursor = self._encode_event_cursor(events[-1])
+
+        total = None
+        if get_total:
+            count_query = self._build_count_query(filters, range_filters,
+                                                  self.current_tenant.id)
+            total = count_query.scalar()
+
+        results = [
+            self._map_event_to_dict(_include, event)
+            for event in events
+        ]
+        metadata = {
+            'pagination': {
+                'size': size,
+                'offset': 0,
+                'total': total,
+                'next_cursor': next_cursor,
+            }
+        }
+        return ListResult(results, metadata)
+
+    @staticmethod
+    def _get_cursor_sort_order(sort):
+        """Get the sorting order to use with keyset pagination.
+
+        :param sort: Result sorting order passed as a request argument
+        :type sort: dict(str, str)
+        :returns: Either `asc` (the default) or `desc`
+        :rtype: str
+
+        """
+        order = 'asc'
+        for field, field_order in sort.items():
+            if field.lstrip('@') != 'timestamp':
+                raise manager_exceptions.BadParametersError(
+                    'Only sorting by timestamp is supported '
+                    'together with `_cursor`')
+            order = field_order
+        return order
+
+    @staticmethod
+    def _encode_event_cursor(event):
+        """Encode the cursor that identifies an event.
+
+        :param event: Event returned by :meth:`_build_cursor_select_query`
+        :type event: :class:`sqlalchemy.util._collections.result`
+        :returns: Cursor to pass as `_cursor` to get the events that follow
+        :rtype: str
+
+        """
+        return encode_cursor([
+            event._cursor_timestamp.isoformat(),
+            event._storage_id,
+            event.type,
+        ])
+
+    @staticmethod
+    def _parse_cursor(cursor):
+        """Validate the values of a cursor passed as a request argument.
+
+        :param cursor: Decoded cursor (empty for the first page)
+        :type cursor: list
+        :returns: A `(timestamp, _storage_id, type)` triplet or `None`
+        :rtype: tuple(datetime.datetime, int, str)
+
+        """
+        if not cursor:
+            return None
+        try:
+            timestamp, storage_id, event_type = cursor
+            return (
+                parse_datetime(timestamp),
+                int(storage_id),
+                event_type,
+            )
+        except (TypeError, ValueError):
+            raise manager_exceptions.BadParametersError(
+                'Invalid cursor values: {0}'.format(cursor))
+
+    @staticmethod
+    def _build_cursor_select_query(filters, descending, range_filters,
+                                   tenant_id, cursor):
+        """Build query used to list events using keyset pagination.
+
+        Every subquery is sorted and limited on its own before the union, so
+        that the database only has to read `limit` rows from each table
+        starting at the cursor position using the timestamp index.
+
+        :param filters: Filters selection (see :meth:`_build_select_query`)
+        :type filters: dict(str, str)
+        :param descending: Whether events should be sorted in descending order
+        :type descending: bool
+        :param range_filters:
+            Range filters selection (see :meth:`_build_select_query`)
+        :type range_filters: dict(str, str)
+        :param tenant_id: Tenant the events belong to
+        :type tenant_id: int
+        :param cursor:
+            `(timestamp, _storage_id, type)` of the last event in the previous
+            page or `None` to get the first page
+        :type cursor: tuple(datetime.datetime, int, str)
+        :returns:
+            A SQL query that returns the events found or `None` if no event
+            can possibly match the filters passed
+        :rtype: :class:`sqlalchemy.orm.query.Query`
+
+        """
+        assert isinstance(filters, dict), \
+            'Filters is expected to be a dictionary'
+
+        order_func = desc if descending else asc
+        subqueries = []
+        for model in Events._get_models_to_query(filters):
+            query = (
+                Events._build_select_subquery(
+                    model, filters, range_filters, tenant_id)
+                .add_columns(
+                    type_coerce(model.timestamp, db.DateTime)
+                    .label('_cursor_timestamp'),
+                    model._storage_id.label('_storage_id'),
+                )
+            )
+            if cursor is not None:
+                query = Events._apply_cursor(query, model, cursor, descending)
+            subquery = (
+                query
+                .order_by(
+                    order_func(model.timestamp),
+                    order_func(model._storage_id),
+                )
+                .limit(bindparam('limit'))
+                .subquery()
+            )
+            subqueries.append(select([subquery]))
+
+        if not subqueries:
+            return None
+
+        events = union_all(*subqueries).alias('events')
+        return (
+            db.session.query(*events.c)
+            .order_by(
+                order_func(events.c.timestamp),
+                order_func(events.c.type),
+                order_func(events.c._storage_id),
+            )
+            .limit(bindparam('limit'))
+        )
+
+    @staticmethod
+    def _apply_cursor(query, model, cursor, descending):
+        """Filter out events that come before the cursor position.
+
+        This is the equivalent of:
+            (timestamp, type, _storage_id) > (cursor timestamp, type, id)
+        but, since the type is constant for every model, it's expressed as a
+        condition on the timestamp (that can be resolved using its index)
+        plus a tie breaker on the storage id.
+
+        :param query: Query in which the filtering should be applied
+        :type query: :class:`sqlalchemy.orm.query.Query`
+        :param model: Model to use to apply the filtering
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+        :param cursor: `(timestamp, _storage_id, type)` of the last event
+        :type cursor: tuple(datetime.datetime, int, str)
+        :param descending: Whether events are sorted in descending order
+        :type descending: bool
+        :returns: Query with filtering applied
+        :rtype: :class:`sqlalchemy.orm.query.Query`
+
+        """
+        timestamp, storage_id, cursor_type = cursor
+        model_type = 'cloudify_{0}'.format(model.__name__.lower())
+        after = operator.lt if descending else operator.gt
+        at_or_after = operator.le if descending else operator.ge
+
+        if model_type == cursor_type:
+            return query.filter(
+                at_or_after(model.timestamp, timestamp),
+                or_(
+                    after(model.timestamp, timestamp),
+                    after(model._storage_id, storage_id),
+                ),
+            )
+        if after(model_type, cursor_type):
+            return query.filter(at_or_after(model.timestamp, timestamp))
+        return query.filter(after(model.timestamp, timestamp))
+
     @rest_decorators.exceptions_handled
     def post(self):
         raise manager_exceptions.MethodNotAllowedError()
@@ -137,7 +386,18 @@ class Events(resources_v1.Events):
     @rest_decorators.sortable()
     def delete(self, filters=None, pagination=None, sort=None,
                range_filters=None, **kwargs):
-        """Delete events/logs connected to a certain Deployment ID."""
+        """Delete events/logs connected to a certain Deployment ID.
+
+        Rows are deleted in batches of `events_delete_batch_size` and every
+        batch is committed on its own, so that a large purge neither holds
+        locks on the whole table nor loads the rows being deleted. If the
+        request is interrupted, sending it again deletes what was left.
+
+        When `_size` is passed, at most that many events/logs are deleted,
+        which lets clients purge a deployment in steps and report progress
+        until the count returned is 0.
+
+        """
         if not isinstance(filters, dict) or 'type' not in filters:
             raise manager_exceptions.BadParametersError(
                 'Filter by type is expected')
@@ -159,34 +419,83 @@ class Events(resources_v1.Events):
             'tenant_id': self.current_tenant.id
         }
 
-        delete_event_query = (
-            db.session.query(Event)
-            .filter(
-                Event._execution_fk.in_(executions_query),
-                Event._tenant_id == bindparam('tenant_id')
-            )
-            .params(**params)
-        )
-        total = delete_event_query.delete(synchronize_session=False)
-
+        models = [Event]
         if 'cloudify_log' in filters['type']:
-            delete_log_query = (
-                db.session.query(Log)
-                .filter(
-                    Log._execution_fk.in_(executions_query),
-                    Log._tenant_id == bindparam('tenant_id')
-                )
-                .params(**params)
-            )
-            total += delete_log_query.delete('fetch')
+            models.append(Log)
+
+        limit = pagination.get('size')
+        total = 0
+        for model in models:
+            total += self._delete_in_batches(
+                model, executions_query, params,
+                None if limit is None else limit - total)
 
         metadata = {
             'pagination': dict(pagination, total=total)
         }
 
-        # Commit bulk row deletions to database
-        db.session.commit()
-
         # We don't really want to return all of the deleted events,
         # so it's a bit of a hack to return the deleted element count.
         return ListResult([total], metadata)
+
+    @staticmethod
+    def _delete_in_batches(model, executions_query, params, limit=None):
+        """Delete the events/logs of some executions in bounded batches.
+
+        Every batch selects the next `_storage_id` values in order (starting
+        after the last one deleted, so that the index scan doesn't go
+        through rows that were already deleted) and deletes them without
+        synchronizing the session.
+
+        :param model: Model whose rows should be deleted
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+        :param executions_query:
+            Query that returns the storage id of the executions whose
+            events/logs should be deleted
+        :type executions_query: :class:`sqlalchemy.orm.query.Query`
+        :param params: Parameters to bind to the queries
+        :type params: dict(str)
+        :param limit: Maximum number of rows to delete (None for no limit)
+        :type limit: int
+        :returns: Number of rows deleted
+        :rtype: int
+
+        """
+        batch_size = config.instance.events_delete_batch_size
+        select_query = (
+            db.session.query(model._storage_id)
+            .filter(
+                model._execution_fk.in_(executions_query),
+                model._tenant_id == bindparam('tenant_id'),
+                model._storage_id > bindparam('last_storage_id'),
+            )
+            .order_by(model._storage_id)
+            .limit(bindparam('batch_size'))
+        )
+
+        deleted = 0
+        last_storage_id = 0
+        while limit is None or deleted < limit:
+            if limit is not None:
+                batch_size = min(batch_size, limit - deleted)
+            storage_ids = [
+                storage_id for storage_id, in select_query.params(
+                    last_storage_id=last_storage_id,
+                    batch_size=batch_size,
+                    **params
+                )
+            ]
+            if not storage_ids:
+                break
+            deleted += (
+                db.session.query(model)
+                .filter(model._storage_id.in_(storage_ids))
+                .delete(synchronize_session=False)
+            )
+            # Commit every batch so that locks are released as soon as
+            # possible and the work done so far isn't lost
+            db.session.commit()
+            last_storage_id = storage_ids[-1]
+        return deleted
@@ -13,7 +13,6 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 #
-import os
 import sys
 
 from flask import request
@@ -21,7 +20,6 @@ from flask_security import current_user
 from flask_restful_swagger import swagger
 
 from manager_rest.deployment_update.constants import PHASES
-from manager_rest import config
 from manager_rest import manager_exceptions
 from manager_rest import utils
 from manager_rest.storage import models
@@ -32,8 +30,12 @@ from manager_rest.constants import (MAINTENANCE_MODE_ACTIVATED,
                                     MAINTENANCE_MODE_ACTIVATING,
                                     MAINTENANCE_MODE_DEACTIVATED)
 from manager_rest.maintenance import (get_maintenance_file_path,
+                                      get_maintenance_state,
+                                      set_maintenance_state,
+                                      remove_maintenance_state,
                                       prepare_maintenance_dict,
-                                      get_running_executions)
+                                      get_running_executions,
+                                      complete_maintenance_mode_activation)
 from manager_rest.manager_exceptions import BadParametersError
 from manager_rest.utils import create_filter_params_list_description
 from manager_rest.upload_manager import \
@@ -49,22 +51,17 @@ class MaintenanceMode(SecuredResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(MaintenanceModeResponse)
     def get(self, **_):
-        maintenance_file_path = get_maintenance_file_path()
-        if os.path.isfile(maintenance_file_path):
-            state = utils.read_json_file(maintenance_file_path)
-
-            if state['status'] == MAINTENANCE_MODE_ACTIVATED:
-                return state
-            if state['status'] == MAINTENANCE_MODE_ACTIVATING:
-                running_executions = get_running_executions()
-
-                # If there are no running executions,
-                # maintenance mode would have been activated at the
-                # maintenance handler hook (server.py)
-                state['remaining_executions'] = running_executions
-                return state
-        else:
+        state = get_maintenance_state()
+        if state is None:
             return prepare_maintenance_dict(MAINTENANCE_MODE_DEACTIVATED)
+        if state['status'] == MAINTENANCE_MODE_ACTIVATING:
+            running_executions = get_running_executions()
+            # Requests only check for running executions periodically, so
+            # maintenance mode might not have been activated yet
+            if not running_executions:
+                return complete_maintenance_mode_activation(state)
+            state['remaining_executions'] = running_executions
+        return state
 
 
 class MaintenanceModeAction(SecuredResource):
@@ -75,10 +72,9 @@ class MaintenanceModeAction(SecuredResource):
             raise_unauthorized_user_error(
                 '{0} does not have privileges to set maintenance mode'.format(
                     current_user))
-        maintenance_file_path = get_maintenance_file_path()
+        state = get_maintenance_state()
         if maintenance_action == 'activate':
-            if os.path.isfile(maintenance_file_path):
-                state = utils.read_json_file(maintenance_file_path)
+            if state is not None:
                 return state, 304
             now = utils.get_formatted_timestamp()
             try:
@@ -89,20 +85,19 @@ class MaintenanceModeAction(SecuredResource):
             status = MAINTENANCE_MODE_ACTIVATING \
                 if remaining_executions else MAINTENANCE_MODE_ACTIVATED
             activated_at = '' if remaining_executions else now
-            utils.mkdirs(config.instance.maintenance_folder)
             new_state = prepare_maintenance_dict(
                 status=status,
                 activation_requested_at=now,
                 activated_at=activated_at,
                 remaining_executions=remaining_executions,
                 requested_by=user)
-            utils.write_dict_to_json_file(maintenance_file_path, new_state)
+            set_maintenance_state(new_state)
             return new_state
         if maintenance_action == 'deactivate':
-            if not os.path.isfile(maintenance_file_path):
+            if state is None:
                 return prepare_maintenance_dict(
                         MAINTENANCE_MODE_DEACTIVATED), 304
-            os.remove(maintenance_file_path)
+            remove_maintenance_state()
             return prepare_maintenance_dict(MAINTENANCE_MODE_DEACTIVATED)
         valid_actions = ['activate', 'deactivate']
         raise BadParametersError(
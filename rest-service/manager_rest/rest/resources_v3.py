@@ -692,6 +692,7 @@ class Events(v2_Events):
         event = {
             attr: getattr(sql_event, attr)
             for attr in sql_event.keys()
+            if not attr.startswith('_')
         }
 
         for unused_field in Events.UNUSED_FIELDS:
@@ -14,14 +14,31 @@
 #  * limitations under the License.
 #
 
+import json
+import time
 from subprocess import check_call, Popen
 
+from dateutil.parser import parse as parse_datetime
+from flask import request
+from flask_restful_swagger import swagger
 from flask_security import current_user
+from sqlalchemy import or_
 from manager_rest.app_logging import raise_unauthorized_user_error
 
-from . import resources_v1
-from manager_rest.rest import rest_utils
+from . import resources_v1, resources_v2, resources_v3
+from .responses_v3_1 import (
+    EventsBulkResult,
+    EventsPartitionsMaintenanceResult,
+    NodeInstanceUpdateResult,
+)
+from manager_rest import manager_exceptions, utils
+from manager_rest.resource_manager import get_resource_manager
+from manager_rest.rest import rest_decorators, rest_utils
 from manager_rest.security import SecuredResource
+from manager_rest.storage import ListResult, get_storage_manager
+from manager_rest.storage.models_base import db
+from manager_rest.storage.partitions import maintain_partitions
+from manager_rest.storage.resource_models import Event, Execution, Log
 from manager_rest.rest.rest_decorators import exceptions_handled
 
 
@@ -42,6 +59,105 @@ class DeploymentsId(resources_v1.DeploymentsId):
         return request_dict.get('skip_plugins_validation', False)
 
 
+class NodeInstances(resources_v2.NodeInstances):
+
+    @swagger.operation(
+        responseClass='List[{0}]'.format(NodeInstanceUpdateResult.__name__),
+        nickname="patchNodeInstances",
+        notes="Update many node instances in a single transaction. "
+              "Expecting the request body to be a dictionary containing "
+              "'node_instances', a list of dictionaries with the 'id' and "
+              "'version' of every node instance, and optionally its new "
+              "'state' (string) and either its new 'runtime_properties' "
+              "(dictionary) or a 'runtime_properties_patch' (a JSON merge "
+              "patch of the runtime properties). "
+              "Node instances whose version doesn't match aren't updated, "
+              "and the result of every update is returned",
+        parameters=[{'name': 'node_instances',
+                     'description': 'the updates of the node instances',
+                     'required': True,
+                     'allowMultiple': False,
+                     'dataType': 'list',
+                     'paramType': 'body'}],
+        consumes=["application/json"]
+    )
+    @exceptions_handled
+    @rest_decorators.marshal_with(NodeInstanceUpdateResult)
+    def patch(self, **kwargs):
+        """Update node instances by id."""
+        request_dict = rest_utils.get_json_and_verify_params(
+            {'node_instances': {'type': list}}
+        )
+        updates = request_dict['node_instances']
+        ids = set()
+        for update in updates:
+            self._validate_update(update)
+            if update['id'] in ids:
+                raise manager_exceptions.BadParametersError(
+                    'Node instance `{0}` can only be updated once in a '
+                    'request'.format(update['id']))
+            ids.add(update['id'])
+        return get_resource_manager().update_node_instances(updates)
+
+    @staticmethod
+    def _validate_update(update):
+        if not isinstance(update, dict) or \
+                not isinstance(update.get('id'), basestring) or \
+                type(update.get('version')) is not int:
+            raise manager_exceptions.BadParametersError(
+                'Every node instance update is expected to be a map '
+                'containing an "id" (string) and a "version" (int) field, '
+                'and optionally "runtime_properties" and/or "state" fields')
+        if not isinstance(update.get('state', ''), basestring):
+            raise manager_exceptions.BadParametersError(
+                'The state of node instance `{0}` is expected to be a '
+                'string'.format(update['id']))
+        if not isinstance(update.get('runtime_properties', {}), dict):
+            raise manager_exceptions.BadParametersError(
+                'The runtime properties of node instance `{0}` are expected '
+                'to be a map'.format(update['id']))
+        if not isinstance(update.get('runtime_properties_patch', {}), dict):
+            raise manager_exceptions.BadParametersError(
+                'The runtime properties patch of node instance `{0}` is '
+                'expected to be a map'.format(update['id']))
+        if 'runtime_properties' in update and \
+                'runtime_properties_patch' in update:
+            raise manager_exceptions.BadParametersError(
+                'Only one of runtime_properties and runtime_properties_patch '
+                'can be passed for node instance `{0}`'.format(update['id']))
+
+
+class NodeInstancesId(resources_v3.NodeInstancesId):
+
+    def _update_instance(self, instance, request_dict, version):
+        """Apply `runtime_properties_patch` to the runtime properties
+
+        The patch is a JSON merge patch (RFC 7386), so only the keys that
+        changed have to be sent. It's only applied if the version passed
+        is the current version of the node instance, as the result depends
+        on it.
+        """
+        runtime_properties_patch = request_dict.get('runtime_properties_patch')
+        if runtime_properties_patch is not None:
+            if not isinstance(runtime_properties_patch, dict):
+                raise manager_exceptions.BadParametersError(
+                    'runtime_properties_patch is expected to be a map')
+            if 'runtime_properties' in request_dict:
+                raise manager_exceptions.BadParametersError(
+                    'Only one of runtime_properties and '
+                    'runtime_properties_patch can be passed')
+            if version != instance.version:
+                raise manager_exceptions.ConflictError(
+                    'Node instance `{0}` is at version {1}, not {2}'.format(
+                        instance.id, instance.version, version))
+            request_dict = dict(
+                request_dict,
+                runtime_properties=utils.json_merge_patch(
+                    instance.runtime_properties, runtime_properties_patch))
+        super(NodeInstancesId, self)._update_instance(
+            instance, request_dict, version)
+
+
 class SSLConfig(SecuredResource):
     @exceptions_handled
     def post(self):
@@ -79,3 +195,454 @@ class SSLConfig(SecuredResource):
         with open(DEFAULT_CONF_PATH) as f:
             content = f.read()
         return content.find(HTTPS_PATH) >= 0
+
+
+class EventsPartitions(SecuredResource):
+
+    @swagger.operation(
+        responseClass=EventsPartitionsMaintenanceResult,
+        nickname="maintainEventsPartitions",
+        notes="Create the daily partitions of the events and logs tables "
+              "ahead of time, and drop the partitions older than the "
+              "retention period. Meant to be called periodically"
+    )
+    @exceptions_handled
+    @rest_decorators.marshal_with(EventsPartitionsMaintenanceResult)
+    def post(self):
+        """Maintain the partitions of the events and logs tables."""
+        if not current_user.is_admin:
+            raise_unauthorized_user_error(
+                '{0} does not have privileges to maintain the events '
+                'partitions'.format(current_user))
+        return maintain_partitions()
+
+
+class EventsBulk(SecuredResource):
+    """Bulk events ingestion resource.
+
+    Insert many events and logs sent as newline-delimited JSON, in the same
+    format as the one returned by the events export endpoint.
+
+    """
+
+    # Number of rows inserted with a single statement
+    INSERT_BATCH_SIZE = 1000
+
+    @swagger.operation(
+        responseClass=EventsBulkResult,
+        nickname="bulk insert events",
+        notes='Inserts events and logs sent as newline-delimited JSON, '
+              'one per line. Either all of them are inserted or none is',
+        consumes=["application/x-ndjson"]
+    )
+    @exceptions_handled
+    @rest_decorators.marshal_with(EventsBulkResult)
+    def post(self):
+        """Insert events and logs sent as newline-delimited JSON.
+
+        The request body is read in batches of `INSERT_BATCH_SIZE` lines.
+        The executions of a batch are looked up with a single query, and
+        its events and logs are inserted with a multi-row INSERT statement
+        for each table. All the batches are inserted in one transaction.
+
+        Note that the partition routing trigger still runs once for every
+        inserted row (see `manager_rest.storage.partitions`), so batching
+        saves round trips, but not the cost of routing each row.
+
+        Only admins can insert events, as they can be inserted into the
+        executions of any tenant.
+
+        :returns: Number of events and logs inserted
+        :rtype: dict(str, int)
+
+        """
+        if not current_user.is_admin:
+            raise_unauthorized_user_error(
+                '{0} does not have privileges to bulk insert '
+                'events'.format(current_user))
+        if request.mimetype != 'application/x-ndjson':
+            raise manager_exceptions.UnsupportedContentTypeError(
+                'Content type must be application/x-ndjson')
+
+        execution_keys = {}
+        counts = {Event: 0, Log: 0}
+        try:
+            for batch in self._read_batches(request.stream):
+                self._load_execution_keys(batch, execution_keys)
+                rows = {Event: [], Log: []}
+                for line_number, item in batch:
+                    model, row = self._get_row(line_number, item)
+                    row.update(execution_keys[item['execution_id']])
+                    rows[model].append(row)
+                for model, model_rows in rows.items():
+                    if model_rows:
+                        db.session.execute(
+                            model.__table__.insert().values(model_rows))
+                        counts[model] += len(model_rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return {'events': counts[Event], 'logs': counts[Log]}, 201
+
+    @classmethod
+    def _read_batches(cls, stream):
+        """Read the events and logs in the request body in batches.
+
+        :param stream: Request body
+        :type stream: file
+        :returns: Batches of (line number, decoded line) pairs
+        :rtype: iterator(list(tuple(int, dict)))
+
+        """
+        batch = []
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                raise manager_exceptions.BadParametersError(
+                    'Invalid JSON on line {0}'.format(line_number))
+            if not isinstance(item, dict) or \
+                    not isinstance(item.get('execution_id'), basestring):
+                raise manager_exceptions.BadParametersError(
+                    'Missing or invalid execution_id on line {0}'
+                    .format(line_number))
+            batch.append((line_number, item))
+            if len(batch) == cls.INSERT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _load_execution_keys(batch, execution_keys):
+        """Load the keys of the executions of a batch of events and logs.
+
+        Only the executions that weren't loaded for a previous batch are
+        queried.
+
+        :param batch: (line number, decoded line) pairs
+        :type batch: list(tuple(int, dict))
+        :param execution_keys:
+            Foreign key, tenant, creator and privacy of the executions loaded
+            so far, by execution id. Updated in place.
+        :type execution_keys: dict(str, dict)
+
+        """
+        execution_ids = set(
+            item['execution_id'] for _, item in batch
+            if item['execution_id'] not in execution_keys
+        )
+        if not execution_ids:
+            return
+        executions = (
+            get_storage_manager().query(Execution)
+            .with_entities(
+                Execution.id,
+                Execution._storage_id,
+                Execution._tenant_id,
+                Execution._creator_id,
+                Execution.private_resource,
+            )
+            .filter(Execution.id.in_(execution_ids))
+        )
+        for execution in executions:
+            execution_keys[execution.id] = {
+                '_execution_fk': execution._storage_id,
+                '_tenant_id': execution._tenant_id,
+                '_creator_id': execution._creator_id,
+                'private_resource': execution.private_resource,
+            }
+        missing = execution_ids.difference(execution_keys)
+        if missing:
+            raise manager_exceptions.NotFoundError(
+                'Requested `Execution` with ID `{0}` was not found'
+                .format(sorted(missing)[0]))
+
+    @staticmethod
+    def _get_row(line_number, item):
+        """Get the column values of an event or log.
+
+        :param line_number: Line of the request body the item was read from
+        :type line_number: int
+        :param item: Event or log as returned by the events export endpoint
+        :type item: dict
+        :returns: Model and column values of the row to insert
+        :rtype: tuple(type, dict)
+
+        """
+        try:
+            timestamp = parse_datetime(item['timestamp'])
+            reported_timestamp = parse_datetime(
+                item.get('reported_timestamp') or item['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            raise manager_exceptions.BadParametersError(
+                'Missing or invalid timestamp on line {0}'
+                .format(line_number))
+
+        row = {
+            'id': item.get('id'),
+            'timestamp': timestamp,
+            'reported_timestamp': reported_timestamp,
+            'message': item.get('message'),
+            'message_code': item.get('message_code'),
+            'operation': item.get('operation'),
+            'node_id': item.get('node_instance_id'),
+        }
+        if item.get('type') == 'cloudify_event':
+            row['event_type'] = item.get('event_type')
+            row['error_causes'] = item.get('error_causes')
+            return Event, row
+        if item.get('type') == 'cloudify_log':
+            row['logger'] = item.get('logger')
+            row['level'] = item.get('level')
+            return Log, row
+        raise manager_exceptions.BadParametersError(
+            'Invalid type on line {0}: expected `cloudify_event` or '
+            '`cloudify_log`'.format(line_number))
+
+
+class EventsExport(resources_v3.Events):
+    """Events export resource.
+
+    Stream all the events and logs that match the filters passed as
+    newline-delimited JSON, instead of paging through the events endpoint.
+
+    """
+
+    # Number of rows fetched from the database cursor at a time
+    YIELD_PER = 1000
+
+    @swagger.operation(
+        nickname="export events",
+        notes='Streams events and logs for optionally provided filters as '
+              'newline-delimited JSON'
+    )
+    @exceptions_handled
+    @rest_decorators.create_filters()
+    @rest_decorators.rangeable
+    @rest_decorators.projection
+    def get(self, _include=None, filters=None, range_filters=None, **kwargs):
+        """Export events using a SQL backend.
+
+        Rows are fetched through a server side cursor and written to the
+        response as they are read, so memory usage in the REST service
+        doesn't depend on the number of events exported.
+
+        :param _include: Fields to include in every event
+        :type _include: list(str)
+        :param filters: Filters selection (see :meth:`Events.get`)
+        :type filters: dict(str, str)
+        :param range_filters: Range filters selection (see :meth:`Events.get`)
+        :type range_filters: dict(str)
+        :returns: Events found sorted by timestamp, one per line
+        :rtype: :class:`flask.Response`
+
+        """
+        query = self._build_export_query(
+            filters, range_filters, self.current_tenant.id)
+        rows = query.yield_per(self.YIELD_PER) if query is not None else []
+        events = (self._map_event_to_dict(_include, row) for row in rows)
+        return rest_utils.make_ndjson_response(events)
+
+    @staticmethod
+    def _build_export_query(filters, range_filters, tenant_id):
+        """Build query used to export events sorted by timestamp.
+
+        :param filters: Filters selection (see :meth:`_build_select_query`)
+        :type filters: dict(str, str)
+        :param range_filters:
+            Range filters selection (see :meth:`_build_select_query`)
+        :type range_filters: dict(str, str)
+        :param tenant_id: Tenant the events belong to
+        :type tenant_id: int
+        :returns:
+            A SQL query that returns the events found or `None` if no event
+            can possibly match the filters passed
+        :rtype: :class:`sqlalchemy.orm.query.Query`
+
+        """
+        subqueries = [
+            EventsExport._build_select_subquery(
+                model, filters, range_filters, tenant_id)
+            for model in EventsExport._get_models_to_query(filters)
+        ]
+        if not subqueries:
+            return None
+        query = reduce(lambda left, right: left.union_all(right), subqueries)
+        return EventsExport._apply_sort(query, {'timestamp': 'asc'})
+
+    @exceptions_handled
+    def post(self):
+        raise manager_exceptions.MethodNotAllowedError()
+
+    @exceptions_handled
+    def delete(self):
+        raise manager_exceptions.MethodNotAllowedError()
+
+
+class EventsTail(resources_v3.Events):
+    """Events tail resource.
+
+    Long polling alternative to listing events periodically: a request blocks
+    until there are new events or logs for an execution after the cursor
+    passed, or until the timeout expires.
+
+    """
+
+    # Seconds to wait between checks for new events
+    POLL_INTERVAL = 0.5
+    DEFAULT_TIMEOUT = 30
+    MAX_TIMEOUT = 60
+
+    @swagger.operation(
+        responseclass='List[Event]',
+        nickname="tail events",
+        notes='Waits for events and logs that follow the cursor passed for '
+              'an execution'
+    )
+    @exceptions_handled
+    @rest_decorators.marshal_events
+    @rest_decorators.create_filters()
+    @rest_decorators.paginate
+    @rest_decorators.cursorable
+    @rest_decorators.projection
+    def get(self, _include=None, filters=None, pagination=None, cursor=None,
+            **kwargs):
+        """Wait for events that follow a cursor.
+
+        :param _include: Fields to include in every event
+        :type _include: list(str)
+        :param filters:
+            Filters selection (see :meth:`Events.get`). Filtering by
+            `execution_id` is mandatory.
+        :type filters: dict(str, str)
+        :param pagination: Maximum number of events to return in `size`
+        :type pagination: dict(str, int)
+        :param cursor:
+            Decoded `_cursor` request argument. Events are returned starting
+            from the first one if it's empty or missing.
+        :type cursor: list
+        :returns:
+            Events found (empty if the timeout expired) and the cursor to
+            pass in the next request as `next_cursor`
+        :rtype: :class:`manager_rest.storage.storage_manager.ListResult`
+
+        """
+        if not filters.get('execution_id'):
+            raise manager_exceptions.BadParametersError(
+                '`execution_id` filter is expected')
+        if pagination.get('offset'):
+            raise manager_exceptions.BadParametersError(
+                '`_offset` cannot be used when tailing events')
+        size = pagination.get('size', self.DEFAULT_SEARCH_SIZE)
+        timeout = self._get_timeout()
+        tenant_id = self.current_tenant.id
+        parsed_cursor = self._parse_cursor(cursor)
+        next_cursor = rest_utils.encode_cursor(cursor or [])
+
+        select_query = self._build_cursor_select_query(
+            filters, False, {}, tenant_id, parsed_cursor)
+        if select_query is None:
+            return ListResult([], self._get_metadata(size, next_cursor))
+        probe_query = self._build_probe_query(
+            filters, tenant_id, parsed_cursor)
+
+        deadline = time.time() + timeout
+        events = select_query.params(limit=size).all()
+        while not events and self._wait_for_events(probe_query, deadline):
+            events = select_query.params(limit=size).all()
+
+        if events:
+            next_cursor = self._encode_event_cursor(events[-1])
+        results = [
+            self._map_event_to_dict(_include, event)
+            for event in events
+        ]
+        return ListResult(results, self._get_metadata(size, next_cursor))
+
+    def _get_timeout(self):
+        """Get number of seconds to wait for events from the request.
+
+        :returns: Timeout passed in `_timeout` capped to `MAX_TIMEOUT`
+        :rtype: int
+
+        """
+        timeout = rest_utils.convert_to_int(
+            request.args.get('_timeout', self.DEFAULT_TIMEOUT))
+        if timeout < 0:
+            raise manager_exceptions.BadParametersError(
+                '`_timeout` is expected to be a positive integer')
+        return min(timeout, self.MAX_TIMEOUT)
+
+    @staticmethod
+    def _get_metadata(size, next_cursor):
+        return {
+            'pagination': {
+                'size': size,
+                'offset': 0,
+                'total': None,
+                'next_cursor': next_cursor,
+            }
+        }
+
+    def _wait_for_events(self, probe_query, deadline):
+        """Sleep until the probe query finds events or the deadline expires.
+
+        :param probe_query: Query that checks if there are new events
+        :type probe_query: :class:`sqlalchemy.orm.query.Query`
+        :param deadline: Time at which to stop waiting
+        :type deadline: float
+        :returns: Whether new events were found
+        :rtype: bool
+
+        """
+        while True:
+            # Don't keep a transaction (and its connection) open while
+            # sleeping
+            db.session.rollback()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.POLL_INTERVAL, remaining))
+            if probe_query.scalar():
+                return True
+
+    @staticmethod
+    def _build_probe_query(filters, tenant_id, cursor):
+        """Build query that checks if there are events after the cursor.
+
+        Unlike the select query, it doesn't join any other table, so that it
+        can be resolved using just the `(_execution_fk, timestamp)` indexes.
+        Other filters are ignored, which might lead to false positives that
+        just mean that the select query is run once more.
+
+        :param filters: Filters selection (see :meth:`get`)
+        :type filters: dict(str, str)
+        :param tenant_id: Tenant the events belong to
+        :type tenant_id: int
+        :param cursor: `(timestamp, _storage_id, type)` of the last event
+        :type cursor: tuple(datetime.datetime, int, str)
+        :returns: A SQL query that returns a boolean
+        :rtype: :class:`sqlalchemy.orm.query.Query`
+
+        """
+        executions = (
+            db.session.query(Execution._storage_id)
+            .filter(
+                Execution.id.in_(filters['execution_id']),
+                Execution._tenant_id == tenant_id,
+            )
+        )
+        probes = []
+        for model in EventsTail._get_models_to_query(filters):
+            query = (
+                db.session.query(model._storage_id)
+                .filter(model._execution_fk.in_(executions))
+            )
+            if cursor is not None:
+                query = EventsTail._apply_cursor(query, model, cursor, False)
+            probes.append(query.exists())
+        return db.session.query(or_(*probes))
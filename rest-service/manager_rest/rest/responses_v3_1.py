@@ -0,0 +1,59 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from flask_restful import fields
+from flask_restful_swagger import swagger
+
+
+@swagger.model
+class NodeInstanceUpdateResult(object):
+    resource_fields = {
+        'id': fields.String,
+        'version': fields.Integer(default=None),
+        'error_code': fields.String,
+        'message': fields.String
+    }
+
+    def __init__(self, **kwargs):
+        self.id = kwargs.get('id')
+        self.version = kwargs.get('version')
+        self.error_code = kwargs.get('error_code')
+        self.message = kwargs.get('message')
+
+
+@swagger.model
+class EventsPartitionsMaintenanceResult(object):
+    resource_fields = {
+        'created': fields.List(fields.String),
+        'dropped': fields.List(fields.String),
+        'deleted': fields.Integer,
+    }
+
+    def __init__(self, **kwargs):
+        self.created = kwargs.get('created')
+        self.dropped = kwargs.get('dropped')
+        self.deleted = kwargs.get('deleted')
+
+
+@swagger.model
+class EventsBulkResult(object):
+    resource_fields = {
+        'events': fields.Integer,
+        'logs': fields.Integer,
+    }
+
+    def __init__(self, **kwargs):
+        self.events = kwargs.get('events')
+        self.logs = kwargs.get('logs')
@@ -43,27 +43,47 @@ from voluptuous import (
 
 from ..security.authentication import authenticator
 from manager_rest import utils, config, manager_exceptions
-from manager_rest.rest.rest_utils import verify_and_convert_bool
-from manager_rest.storage.models_base import SQLModelBase
+from manager_rest.rest.rest_utils import (
+    decode_cursor,
+    verify_and_convert_bool,
+)
 
 from .responses_v2 import ListResponse
+from .serializers import Serializer
 
 INCLUDE = 'Include'
 SORT = 'Sort'
 FILTER = 'Filter'
 
+# Number of serializers (API version and include set combinations) cached
+# by every `marshal_with` decorator
+MAX_CACHED_SERIALIZERS = 100
+
+
+def _get_json_path_field(field_name):
+    """Get the field (JSON column) of a path in it, e.g. `runtime_properties`
+    for `runtime_properties.ip`, or None if `field_name` isn't a path
+    """
+    field, separator, path = field_name.partition('.')
+    if not separator or not all(path.split('.')):
+        return None
+    return field
 
-def _validate_fields(valid_fields, fields_to_check, action):
+
+def _validate_fields(valid_fields, fields_to_check, action, json_fields=()):
     """Assert that `fields_to_check` is a subset of `valid_fields`
 
     :param valid_fields: A list/dict of valid fields
     :param fields_to_check: A list/dict of fields to check
     :param action: The action being performed (Sort/Include/Filter)
+    :param json_fields: Valid fields which are JSON columns, whose paths
+                        (e.g. `runtime_properties.ip`) are valid as well
     """
     error_type = {INCLUDE: manager_exceptions.NoSuchIncludeFieldError,
                   SORT: manager_exceptions.BadParametersError,
                   FILTER: manager_exceptions.BadParametersError}
-    unknowns = [k for k in fields_to_check if k not in valid_fields]
+    unknowns = [k for k in fields_to_check if k not in valid_fields and
+                _get_json_path_field(k) not in json_fields]
     if unknowns:
         raise error_type[action](
             '{action} keys \'{key_names}\' do not exist. Allowed '
@@ -119,6 +139,9 @@ class marshal_with(object):
                 'class variable'.format(type(response_class)))
 
         self.response_class = response_class
+        self._json_fields = getattr(response_class, 'json_fields', ())
+        self._fields_by_version = {}
+        self._serializers = {}
 
     def __call__(self, f):
         @wraps(f)
@@ -126,45 +149,47 @@ class marshal_with(object):
             if hasattr(request, '__skip_marshalling'):
                 return f(*args, **kwargs)
 
-            fields_to_include = self._get_fields_to_include()
+            serializer = self._get_serializer()
             if self._is_include_parameter_in_request():
                 # only pushing "_include" into kwargs when the request
                 # contained this parameter, to keep things cleaner (identical
                 # behavior for passing "_include" which contains all fields)
-                kwargs['_include'] = fields_to_include.keys()
+                kwargs['_include'] = self._get_include(serializer)
 
             response = f(*args, **kwargs)
 
             if isinstance(response, ListResponse):
-                wrapped_items = self.wrap_with_response_object(response.items)
-                response.items = marshal(wrapped_items, fields_to_include)
+                response.items = serializer(response.items, self._get_data())
                 return marshal(response, ListResponse.resource_fields)
             # SQLAlchemy returns a class that subtypes tuple, but acts
-            # differently (it's taken care of in `wrap_with_response_object`)
+            # differently (it's taken care of in the serializer)
             if isinstance(response, tuple) and \
                     not isinstance(response, sql_alchemy_collection):
                 data, code, headers = unpack(response)
-                data = self.wrap_with_response_object(data)
-                return marshal(data, fields_to_include), code, headers
+                return serializer(data, self._get_data()), code, headers
             else:
-                response = self.wrap_with_response_object(response)
-                return marshal(response, fields_to_include)
+                return serializer(response, self._get_data())
 
         return wrapper
 
-    def wrap_with_response_object(self, data):
-        if isinstance(data, dict):
-            return data
-        elif isinstance(data, list):
-            return map(self.wrap_with_response_object, data)
-        elif isinstance(data, SQLModelBase):
-            return data.to_response(get_data=self._get_data())
-        # Support for partial results from SQLAlchemy (i.e. only
-        # certain columns, and not the whole model class)
-        elif isinstance(data, sql_alchemy_collection):
-            return data._asdict()
-        raise RuntimeError('Unexpected response data (type {0}) {1}'.format(
-            type(data), data))
+    def _get_serializer(self):
+        """Get the serializer of the request's API version and include set
+
+        Serializers are created on the first request using them, and reused
+        by the following ones
+        """
+        include = None
+        if self._is_include_parameter_in_request():
+            include = frozenset(request.args['_include'].split(','))
+        key = (self._get_api_version(), include)
+        serializer = self._serializers.get(key)
+        if serializer is None:
+            if len(self._serializers) >= MAX_CACHED_SERIALIZERS:
+                # Keep the number of different include sets cached bounded
+                self._serializers.clear()
+            serializer = Serializer(self._get_fields_to_include())
+            self._serializers[key] = serializer
+        return serializer
 
     @staticmethod
     def _is_include_parameter_in_request():
@@ -175,19 +200,50 @@ class marshal_with(object):
         get_data = request.args.get('_get_data', False)
         return verify_and_convert_bool('get_data', get_data)
 
+    def _get_include(self, serializer):
+        """Get the fields and JSON paths to include in the response
+
+        A JSON column whose paths are included is serialized as a field, with
+        only those paths (unless the whole column is included as well)
+        """
+        include = request.args['_include'].split(',')
+        json_paths = [path for path in OrderedDict.fromkeys(include)
+                      if _get_json_path_field(path) in serializer.fields
+                      and _get_json_path_field(path) not in include]
+        fields = [field for field in serializer.fields.keys()
+                  if field in include]
+        return fields + json_paths
+
     def _get_fields_to_include(self):
-        skipped_fields = self._get_skipped_fields()
-        model_fields = {k: v for k, v in self._fields.iteritems()
-                        if k not in skipped_fields}
+        model_fields = self._get_model_fields()
 
         if self._is_include_parameter_in_request():
             include = set(request.args['_include'].split(','))
-            _validate_fields(model_fields, include, INCLUDE)
+            json_fields = self._json_fields & set(model_fields)
+            _validate_fields(model_fields, include, INCLUDE, json_fields)
+            # JSON columns are serialized with only their included paths
+            include |= set(_get_json_path_field(k) for k in include) - {None}
             include_fields = {k: v for k, v in model_fields.iteritems()
                               if k in include}
             return include_fields
         return model_fields
 
+    def _get_model_fields(self):
+        """Get the fields of the response class in the request's API version
+
+        The fields of each API version are only computed on its first
+        request, and are shared by all the following ones, so they're frozen
+        """
+        api_version = self._get_api_version()
+        model_fields = self._fields_by_version.get(api_version)
+        if model_fields is None:
+            skipped_fields = self._get_skipped_fields(api_version)
+            model_fields = utils.FrozenDict(
+                (k, v) for k, v in self._fields.iteritems()
+                if k not in skipped_fields)
+            self._fields_by_version[api_version] = model_fields
+        return model_fields
+
     @staticmethod
     def _get_api_version():
         url = request.base_url
@@ -196,8 +252,7 @@ class marshal_with(object):
         version = url.split('/api/')[1]
         return version.split('/')[0]
 
-    def _get_skipped_fields(self):
-        api_version = self._get_api_version()
+    def _get_skipped_fields(self, api_version):
         if hasattr(self.response_class, 'skipped_fields'):
             return self.response_class.skipped_fields.get(api_version, [])
         return []
@@ -442,14 +497,44 @@ def paginate(func):
     return verify_and_create_pagination_params
 
 
+def cursorable(func):
+    """Decorator for enabling keyset (cursor) pagination.
+
+    This decorator looks into the request for the `_cursor` and `_get_total`
+    parameters. When `_cursor` is present, its decoded value is passed as the
+    `cursor` parameter to the decorated function; an empty `_cursor` stands
+    for the first page. When it's absent, `cursor` is `None` and the
+    decorated function is expected to fall back to offset pagination.
+
+    Since counting all the matching rows is as expensive as reading them,
+    the `get_total` parameter is only `True` when explicitly requested.
+
+    :param func: Function to be decorated
+    :type func: callable
+
+    """
+    @wraps(func)
+    def create_cursor_params(*args, **kw):
+        cursor = request.args.get('_cursor')
+        if cursor is not None:
+            cursor = decode_cursor(cursor) if cursor else []
+        get_total = verify_and_convert_bool(
+            'get_total', request.args.get('_get_total', False))
+        return func(cursor=cursor, get_total=get_total, *args, **kw)
+    return create_cursor_params
+
+
 def create_filters(response_class=None):
     """
     Decorator for extracting filter parameters from the request arguments and
     optionally verifying their validity according to the provided fields.
+    Paths in JSON columns (e.g. `runtime_properties.ip`) can be filtered by
+    as well, and match values that are strings.
     :param response_class: The response class to be marshalled with
     :return: a Decorator for creating and validating the accepted fields.
     """
     fields = response_class.resource_fields if response_class else {}
+    json_fields = getattr(response_class, 'json_fields', ())
 
     def create_filters_dec(f):
         @wraps(f)
@@ -459,7 +544,8 @@ def create_filters(response_class=None):
             filters = {k: v for k, v in
                        request_args.iteritems() if not k.startswith('_')}
             if fields:
-                _validate_fields(fields, filters.iterkeys(), FILTER)
+                _validate_fields(fields, filters.iterkeys(), FILTER,
+                                 json_fields)
             return f(filters=filters, *args, **kw)
         return some_func
     return create_filters_dec
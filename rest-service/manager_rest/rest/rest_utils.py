@@ -12,12 +12,15 @@
 #  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
+import json
+import zlib
 import urllib
 import subprocess
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from flask import current_app
 from string import ascii_letters
 
-from flask import request, make_response
+from flask import Response, request, make_response, stream_with_context
 from flask_restful.reqparse import RequestParser
 
 from contextlib import contextmanager
@@ -92,6 +95,38 @@ def convert_to_int(value):
             'invalid parameter, should be int, got: {0}'.format(value))
 
 
+def encode_cursor(values):
+    """Encode the sort key of the last item of a page as an opaque token.
+
+    :param values: JSON serializable values that identify the item
+    :type values: list
+    :returns: Token to be passed back as `_cursor` to get the next page
+    :rtype: str
+
+    """
+    return urlsafe_b64encode(json.dumps(values))
+
+
+def decode_cursor(token):
+    """Decode a token previously created with :func:`encode_cursor`.
+
+    :param token: Token passed in the `_cursor` request argument
+    :type token: str
+    :returns: The values encoded in the token
+    :rtype: list
+
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(str(token)))
+    except (TypeError, ValueError):
+        values = None
+    if not isinstance(values, list):
+        raise manager_exceptions.BadParametersError(
+            'Invalid cursor: {0}. Expected a `next_cursor` value returned '
+            'in a previous response'.format(token))
+    return values
+
+
 def make_streaming_response(res_id, res_path, content_length, archive_type):
     response = make_response()
     response.headers['Content-Description'] = 'File Transfer'
@@ -105,6 +140,62 @@ def make_streaming_response(res_id, res_path, content_length, archive_type):
     return response
 
 
+def make_ndjson_response(items):
+    """Stream items to the client as newline-delimited JSON.
+
+    Items are serialized one at a time while the response is being sent, so
+    memory usage doesn't depend on the number of items. If the client
+    accepts it, the response body is gzip compressed on the fly.
+
+    :param items: JSON serializable items to send
+    :type items: iterable
+    :returns: A streaming response
+    :rtype: :class:`flask.Response`
+
+    """
+    lines = (json.dumps(item) + '\n' for item in items)
+    headers = {
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        # Let nginx pass chunks to the client as soon as they are generated
+        'X-Accel-Buffering': 'no',
+    }
+    if request.accept_encodings['gzip']:
+        lines = _gzip_stream(lines)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(lines),
+                    mimetype='application/x-ndjson',
+                    headers=headers)
+
+
+def _gzip_stream(chunks, chunk_size=64 * 1024):
+    """Gzip compress a stream of chunks incrementally.
+
+    :param chunks: Uncompressed data
+    :type chunks: iterable(str)
+    :param chunk_size: Minimum amount of compressed data to yield at a time
+    :type chunk_size: int
+    :returns: Compressed data
+    :rtype: iterable(str)
+
+    """
+    # wbits=16 + MAX_WBITS makes zlib add the gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    buffered = []
+    buffered_size = 0
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            buffered.append(compressed)
+            buffered_size += len(compressed)
+        if buffered_size >= chunk_size:
+            yield ''.join(buffered)
+            buffered = []
+            buffered_size = 0
+    buffered.append(compressor.flush())
+    yield ''.join(buffered)
+
+
 def set_restart_task(delay=1):
     current_app.logger.info('Restarting the rest service')
     cmd = 'sleep {0}; sudo systemctl restart {1}' \
@@ -0,0 +1,152 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from collections import OrderedDict
+from itertools import izip
+
+from flask_restful import fields as flask_fields, marshal
+from sqlalchemy.util._collections import _LW as sql_alchemy_collection
+
+from manager_rest.storage.models_base import SQLModelBase
+from manager_rest.storage.resource_models_base import SQLResourceBase
+
+
+# Fields whose output depends only on the value of their own key
+_VALUE_OUTPUT_FIELDS = (flask_fields.List, flask_fields.Nested)
+
+
+class Serializer(object):
+    """Marshal response data with a fixed set of fields
+
+    The output is identical to wrapping the data with `to_response()` and
+    passing it to `flask_restful.marshal`, but the fields are inspected only
+    once, when the serializer is created, instead of for every field of every
+    item, and every item is serialized in a single pass. Models that don't
+    override `to_response()` are read directly, so only the attributes of
+    the serialized fields are loaded.
+    """
+    def __init__(self, fields):
+        """
+        :param fields: A mapping of field names and their flask types
+        """
+        self.fields = fields
+        self._keys = fields.keys()
+        self._compiled_fields = [_compile_field(field)
+                                 for field in fields.values()]
+        # Fields that can't be formatted by their value alone (e.g. fields
+        # reading another attribute) are marshalled from the whole item
+        self._generic = any(
+            field is None or '.' in key
+            for key, field in izip(self._keys, self._compiled_fields))
+        self._attributes_by_model = {}
+
+    def __call__(self, data, get_data=False):
+        """Serialize response data
+
+        :param data: A dict, a model, a partial SQLAlchemy result, or a list
+                     of those
+        :param get_data: Passed to the `to_response()` of models
+        :return: An OrderedDict, or a list of OrderedDicts
+        """
+        if isinstance(data, list):
+            return [self(item, get_data) for item in data]
+        if self._generic:
+            return marshal(self._to_dict(data, get_data), self.fields)
+        if isinstance(data, dict):
+            return self._serialize(data.get(key) for key in self._keys)
+        if isinstance(data, SQLModelBase):
+            attributes = self._get_model_attributes(type(data))
+            if attributes is None:
+                response = data.to_response(get_data=get_data)
+                return self._serialize(
+                    response.get(key) for key in self._keys)
+            return self._serialize(
+                getattr(data, attr) if attr else None for attr in attributes)
+        return self._serialize(
+            self._to_dict(data, get_data).get(key) for key in self._keys)
+
+    def _serialize(self, values):
+        result = OrderedDict()
+        for key, field, value in izip(
+                self._keys, self._compiled_fields, values):
+            default, formatter, output = field
+            if output is not None:
+                value = output(key, {key: value})
+            elif value is None:
+                value = default
+            elif formatter is not None:
+                value = formatter(value)
+            result[key] = value
+        return result
+
+    def _get_model_attributes(self, model_class):
+        """Get the attributes to read for every field of a model
+
+        :return: A list with the attribute name of every field, or None for
+                 fields not in the model's response, or None instead of a
+                 list if the model's `to_response()` has to be called
+        """
+        try:
+            return self._attributes_by_model[model_class]
+        except KeyError:
+            pass
+        to_response = model_class.to_response.im_func
+        if to_response is SQLResourceBase.to_response.im_func:
+            response_fields = model_class.response_fields
+        elif to_response is SQLModelBase.to_response.im_func:
+            response_fields = model_class.resource_fields
+        else:
+            response_fields = None
+        attributes = None
+        if response_fields is not None:
+            attributes = [key if key in response_fields else None
+                          for key in self._keys]
+        self._attributes_by_model[model_class] = attributes
+        return attributes
+
+    @classmethod
+    def _to_dict(cls, data, get_data):
+        if isinstance(data, dict):
+            return data
+        elif isinstance(data, SQLModelBase):
+            return data.to_response(get_data=get_data)
+        # Support for partial results from SQLAlchemy (i.e. only
+        # certain columns, and not the whole model class)
+        elif isinstance(data, sql_alchemy_collection):
+            return data._asdict()
+        raise RuntimeError('Unexpected response data (type {0}) {1}'.format(
+            type(data), data))
+
+
+def _compile_field(field):
+    """Get the default value and the formatting functions of a field
+
+    :return: A (default, formatter, output) tuple, where formatter is None if
+             the value is returned as is, and output is the field's `output`
+             method if it has to be used to format the value; None is
+             returned if the field reads more than the value of its own key
+    """
+    if isinstance(field, type):
+        field = field()
+    field_type = type(field)
+    if not isinstance(field, flask_fields.Raw) or field.attribute is not None:
+        return None
+    if field_type in _VALUE_OUTPUT_FIELDS:
+        return None, None, field.output
+    if field_type.output.im_func is not flask_fields.Raw.output.im_func:
+        return None
+    if field_type.format.im_func is flask_fields.Raw.format.im_func:
+        return field.default, None, None
+    return field.default, field.format, None
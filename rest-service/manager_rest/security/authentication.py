@@ -13,13 +13,14 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from collections import namedtuple
 
 from flask import current_app
 from flask_security.utils import verify_password, md5
 
 from . import user_handler
+from manager_rest import config
 from manager_rest.storage import user_datastore
 from manager_rest.app_logging import raise_unauthorized_user_error
 
@@ -28,6 +29,10 @@ Authorization = namedtuple('Authorization', 'username password')
 
 
 class Authentication(object):
+    def __init__(self):
+        # Last time the login date was stored for every user id
+        self._last_login_updates = {}
+
     @property
     def logger(self):
         return current_app.logger
@@ -67,10 +72,28 @@ class Authentication(object):
         if not user:
             raise_unauthorized_user_error('No authentication info provided')
         self.logger.info('Authenticated user: {0}'.format(user))
-        user.last_login_at = datetime.now()
-        user_datastore.commit()
+        self._update_last_login(user)
         return user
 
+    def _update_last_login(self, user):
+        """Store the login date of a user
+
+        To avoid a write transaction on every request, the date is stored
+        at most once every `last_login_update_interval` seconds for every
+        user in each REST service process
+
+        :param user: The DB user object
+        """
+        now = datetime.now()
+        interval = timedelta(
+            seconds=config.instance.last_login_update_interval)
+        last_update = self._last_login_updates.get(user.id)
+        if last_update and now - last_update < interval:
+            return
+        user.last_login_at = now
+        user_datastore.commit()
+        self._last_login_updates[user.id] = now
+
     def _authenticate_password(self, user, auth):
         self.logger.debug('Authenticating username/password')
         username, password = auth.username, auth.password
@@ -0,0 +1,105 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import time
+from threading import Lock
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from manager_rest import config
+from manager_rest.storage.models import Group, Role, Tenant, User
+
+# Changes to these user attributes don't affect authentication
+_IGNORED_USER_ATTRIBUTES = {'last_login_at'}
+
+
+class AuthenticationCache(object):
+    """An LRU cache of verified credentials
+
+    Entries expire after `authentication_cache_ttl` seconds, and the whole
+    cache is cleared when users, groups, roles or tenants are modified in
+    this process. Other processes will see those modifications once their
+    entries expire.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Get a value from the cache
+
+        :param key: The key of the entry
+        :return: The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                return None
+            # Re-insert the entry to mark it as the most recently used
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Add a value to the cache
+
+        :param key: The key of the entry
+        :param value: The value to cache
+        :param ttl: Seconds after which the entry expires (if shorter than
+                    the configured TTL)
+        """
+        max_ttl = config.instance.authentication_cache_ttl
+        ttl = max_ttl if ttl is None else min(ttl, max_ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.time() + ttl)
+            max_size = config.instance.authentication_cache_size
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _is_user_modified(user):
+    state = inspect(user)
+    return any(
+        attr.history.has_changes()
+        for attr in state.attrs
+        if attr.key not in _IGNORED_USER_ATTRIBUTES
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _clear_on_changes(session, flush_context):
+    """Clear the cache when users, groups, roles or tenants are modified"""
+    added_or_deleted = session.new | session.deleted
+    for instance in added_or_deleted | session.dirty:
+        if isinstance(instance, (Group, Role, Tenant)) or (
+                isinstance(instance, User) and (
+                    instance in added_or_deleted or
+                    _is_user_modified(instance))):
+            authentication_cache.clear()
+            return
+
+
+authentication_cache = AuthenticationCache()
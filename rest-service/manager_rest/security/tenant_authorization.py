@@ -1,13 +1,15 @@
 from flask import current_app
 
 from manager_rest.storage.models import Tenant
-from manager_rest.storage import get_storage_manager
+from manager_rest.storage import db, get_storage_manager
 from manager_rest.manager_exceptions import NotFoundError
 from manager_rest.constants import (CLOUDIFY_TENANT_HEADER,
                                     CURRENT_TENANT_CONFIG)
 
 from manager_rest.app_logging import raise_unauthorized_user_error
 
+from .authentication_cache import authentication_cache
+
 
 class TenantAuthorization(object):
     def authorize(self, user, request, tenant_name=None):
@@ -20,6 +22,17 @@ class TenantAuthorization(object):
         if not tenant_name:
             raise raise_unauthorized_user_error(
                 'a Tenant name was not provided')
+
+        # Tenants a user was already authorized for are fetched by their
+        # primary key, without walking through the user's groups
+        cache_key = ('tenant', user.id, tenant_name)
+        tenant_id = authentication_cache.get(cache_key)
+        if tenant_id is not None:
+            tenant = db.session.query(Tenant).get(tenant_id)
+            if tenant:
+                current_app.config[CURRENT_TENANT_CONFIG] = tenant
+                return
+
         try:
             tenant = get_storage_manager().get(
                 Tenant,
@@ -37,6 +50,7 @@ class TenantAuthorization(object):
                 '{0} is not associated with {1}'.format(user, tenant)
             )
 
+        authentication_cache.set(cache_key, tenant.id)
         current_app.config[CURRENT_TENANT_CONFIG] = tenant
 
 
@@ -13,6 +13,7 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 import json
+from datetime import datetime, timedelta
 
 from flask import current_app
 from itsdangerous import BadSignature, SignatureExpired
@@ -23,6 +24,8 @@ from manager_rest.manager_exceptions import NotFoundError
 from manager_rest.storage import user_datastore, get_storage_manager
 from manager_rest.utils import CLOUDIFY_API_AUTH_TOKEN_HEADER
 
+from .authentication_cache import authentication_cache
+
 ENCODED_ID_LENGTH = 5
 
 
@@ -58,11 +61,19 @@ def user_loader(request):
 def extract_api_token(api_token):
     user_id = api_token[:ENCODED_ID_LENGTH]
     user_token_key = api_token[ENCODED_ID_LENGTH:]
+    cache_key = ('api_token', api_token)
+    cached_user_id = authentication_cache.get(cache_key)
+    if cached_user_id is not None:
+        user = user_datastore.get_user(cached_user_id)
+        if user:
+            return user, user_token_key
     user_id = get_encoder().decode(user_id)
     try:
         user = get_storage_manager().get(User, user_id)
     except NotFoundError:
         return None, None
+    if user.api_token_key == user_token_key:
+        authentication_cache.set(cache_key, user.id)
     return user, user_token_key
 
 
@@ -89,18 +100,31 @@ def get_api_token_from_request(request):
 def get_token_status(token):
     """Mimic flask_security.utils.get_token_status with some changes
 
+    Tokens that were successfully decrypted are cached until they expire
+    (up to the cache TTL), so the signature doesn't need to be verified and
+    the user can be fetched by its primary key
+
     :param token: The token to decrypt
     :return: A tuple: (expired, invalid, user, data)
     """
+    cache_key = ('token', token)
+    cached = authentication_cache.get(cache_key)
+    if cached is not None:
+        user_id, data = cached
+        user = user_datastore.get_user(user_id)
+        if user:
+            return False, False, user, data, None
+
     security = current_app.extensions['security']
     serializer = security.remember_token_serializer
     max_age = security.token_max_age
 
-    user, data, error = None, None, None
+    user, data, error, timestamp = None, None, None, None
     expired, invalid = False, False
 
     try:
-        data = serializer.loads(token, max_age=max_age)
+        data, timestamp = serializer.loads(
+            token, max_age=max_age, return_timestamp=True)
     except SignatureExpired:
         expired = True
     except (BadSignature, TypeError, ValueError) as e:
@@ -110,4 +134,11 @@ def get_token_status(token):
     if data:
         user = user_datastore.find_user(id=data[0])
 
+    if user and isinstance(data, list) and len(data) == 2:
+        ttl = None
+        if max_age:
+            expires_at = timestamp + timedelta(seconds=max_age)
+            ttl = (expires_at - datetime.utcnow()).total_seconds()
+        authentication_cache.set(cache_key, (user.id, data), ttl)
+
     return expired, invalid, user, data, error
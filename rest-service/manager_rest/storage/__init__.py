@@ -19,3 +19,4 @@ from .models import user_datastore                          # NOQA
 from .storage_manager import ListResult                     # NOQA
 from .storage_manager import get_storage_manager            # NOQA
 from .storage_utils import get_node                         # NOQA
+from .storage_utils import get_nodes                        # NOQA
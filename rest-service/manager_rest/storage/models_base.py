@@ -20,10 +20,11 @@ from collections import OrderedDict
 from dateutil import parser as date_parser
 from flask_sqlalchemy import SQLAlchemy, inspect
 from flask_restful import fields as flask_fields
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB as PostgreSQLJSONB
 from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import cached_classproperty, FrozenDict
 
 
 db = SQLAlchemy(metadata=MetaData(naming_convention={
@@ -85,6 +86,68 @@ class JSONString(db.TypeDecorator):
         return json.loads(value)
 
 
+class JSONB(db.TypeDecorator):
+
+    """A json object stored as JSONB in PostgreSQL.
+
+    Unlike pickled values, JSONB values can be filtered and projected in SQL.
+    Other databases (such as the SQLite one used in tests) store the object
+    as a json encoded string.
+
+    """
+
+    impl = db.Text
+
+    class comparator_factory(db.TypeDecorator.Comparator):
+
+        def __getitem__(self, keys):
+            """Get the value at a path of keys in the object.
+
+            This uses the `#>` operator, so it's only supported by
+            PostgreSQL.
+
+            :param keys: Keys of the nested objects in the path
+            :type keys: tuple(str)
+
+            """
+            return type_coerce(self.expr, PostgreSQLJSONB)[tuple(keys)]
+
+    def __init__(self, comparator=None):
+        """Create type.
+
+        :param comparator:
+            Function used to compare values to decide if a column has been
+            modified (as in :class:`sqlalchemy.types.PickleType`)
+        :type comparator: callable
+
+        """
+        super(JSONB, self).__init__()
+        self.comparator = comparator
+
+    def load_dialect_impl(self, dialect):
+        """Use native JSONB type in PostgreSQL."""
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(PostgreSQLJSONB())
+        return dialect.type_descriptor(db.Text())
+
+    def process_bind_param(self, value, dialect):
+        """Encode object to a string if not using PostgreSQL."""
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        """Decode string to an object if not using PostgreSQL."""
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return json.loads(value)
+
+    def compare_values(self, x, y):
+        if self.comparator:
+            return self.comparator(x, y)
+        return x == y
+
+
 class CIColumn(db.Column):
     """A column for case insensitive string fields
     """
@@ -112,6 +175,7 @@ class SQLModelBase(db.Model):
         'Text': flask_fields.String,
         'String': flask_fields.String,
         'PickleType': flask_fields.Raw,
+        'JSONB': flask_fields.Raw,
         'UTCDateTime': flask_fields.String,
         'Enum': flask_fields.String,
         'Boolean': flask_fields.Boolean
@@ -141,10 +205,13 @@ class SQLModelBase(db.Model):
     def to_response(self, **kwargs):
         return {f: getattr(self, f) for f in self.resource_fields}
 
-    @classproperty
+    @cached_classproperty
     def resource_fields(cls):
         """Return a mapping of available field names and their corresponding
         flask types
+
+        The mapping is computed only once for every class, so it's frozen to
+        make sure it's not modified
         """
         fields = dict()
         columns = inspect(cls).columns
@@ -154,7 +221,16 @@ class SQLModelBase(db.Model):
         for field_name, field_type in columns_dict.iteritems():
             field_type_name = field_type.__class__.__name__
             fields[field_name] = cls._sql_to_flask_type_map[field_type_name]
-        return fields
+        return FrozenDict(fields)
+
+    @cached_classproperty
+    def json_fields(cls):
+        """Return the names of the JSONB columns, whose paths (e.g.
+        `runtime_properties.ip`) can be included and filtered by
+        """
+        return frozenset(column.name for column in inspect(cls).columns
+                         if isinstance(column.type, JSONB)
+                         and not column.name.startswith('_'))
 
     @classmethod
     def _get_association_proxies(cls):
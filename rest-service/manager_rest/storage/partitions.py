@@ -0,0 +1,238 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Daily partitions of the events and logs tables.
+
+Events and logs are stored in child tables (one per day) that inherit from
+the `events` and `logs` tables, each with a CHECK constraint on its range
+of timestamps. Rows inserted into the parent tables are routed to the
+partition of their day by a trigger (see the `route_to_partition` function
+created by the migrations) or kept in the parent table when that partition
+doesn't exist.
+
+Queries on the parent tables go through all of their partitions, and the
+partitions that can't match a range of timestamps are skipped by the
+planner (constraint exclusion), while old events and logs are deleted by
+dropping whole partitions.
+
+Partitions are maintained by `maintain_partitions`, which is run every hour
+by a cron job (see `resources/rest-service/cloudify/cron`) and can also be
+triggered with `POST /events/partitions`.
+
+The trigger runs once per inserted row, looking up its partition and
+re-inserting the row there with a dynamic statement. That cost is paid by
+every row, even when inserted with a multi-row INSERT statement (e.g. by
+bulk events ingestion): batching saves round trips, not the routing.
+
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from manager_rest import config
+from manager_rest.storage.models_base import db
+
+PARTITIONED_TABLES = ('events', 'logs')
+PARTITION_DATE_FORMAT = '%Y%m%d'
+
+# Key of the advisory lock that serializes partition maintenance
+MAINTENANCE_LOCK_KEY = 7310
+
+
+def get_partition_name(table, day):
+    """Get the name of the partition that stores the rows of a day.
+
+    This must match the name computed by the `route_to_partition` trigger.
+
+    :param table: Partitioned table name
+    :type table: str
+    :param day: Day whose rows are stored in the partition
+    :type day: datetime.date
+    :returns: Partition name
+    :rtype: str
+
+    """
+    return '{0}_{1}'.format(table, day.strftime(PARTITION_DATE_FORMAT))
+
+
+def get_partition_day(table, partition_name):
+    """Get the day whose rows are stored in a partition.
+
+    :param table: Partitioned table name
+    :type table: str
+    :param partition_name: Name of a table that inherits from `table`
+    :type partition_name: str
+    :returns: Day of the partition or `None` if it isn't a daily partition
+    :rtype: datetime.date
+
+    """
+    match = re.match(r'^{0}_(\d{{8}})$'.format(table), partition_name)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(
+            match.group(1), PARTITION_DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def maintain_partitions(today=None):
+    """Pre-create future partitions and apply the retention policy.
+
+    The number of partitions created ahead is set by
+    `events_partitions_precreate_days`, and events and logs older than
+    `events_retention_days` are deleted (unless it's not set).
+
+    This is a no-op when the database isn't PostgreSQL (e.g. in tests).
+
+    :param today: Current day (UTC), for testing purposes
+    :type today: datetime.date
+    :returns: Partitions created and dropped and the number of rows deleted
+    :rtype: dict(str)
+
+    """
+    result = {'created': [], 'dropped': [], 'deleted': 0}
+    if db.engine.dialect.name != 'postgresql':
+        return result
+
+    today = today or datetime.utcnow().date()
+    precreate_days = config.instance.events_partitions_precreate_days
+    retention_days = config.instance.events_retention_days
+
+    db.session.execute(
+        'SELECT pg_advisory_xact_lock(:key)', {'key': MAINTENANCE_LOCK_KEY})
+    for table in PARTITIONED_TABLES:
+        partitions = _get_partitions(table)
+        for offset in range(precreate_days + 1):
+            day = today + timedelta(days=offset)
+            if day not in partitions:
+                result['created'].append(_create_partition(table, day))
+        if retention_days is not None:
+            cutoff = today - timedelta(days=retention_days)
+            for day, partition_name in sorted(partitions.items()):
+                if day < cutoff:
+                    db.session.execute('DROP TABLE {0}'.format(partition_name))
+                    result['dropped'].append(partition_name)
+    db.session.commit()
+
+    if retention_days is not None:
+        cutoff = today - timedelta(days=retention_days)
+        for table in PARTITIONED_TABLES:
+            result['deleted'] += _delete_unpartitioned_rows(table, cutoff)
+    return result
+
+
+def _get_partitions(table):
+    """Get the daily partitions of a table.
+
+    :param table: Partitioned table name
+    :type table: str
+    :returns: Partition names by day
+    :rtype: dict(datetime.date, str)
+
+    """
+    rows = db.session.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = CAST(:table AS regclass)',
+        {'table': table},
+    )
+    partitions = {}
+    for partition_name, in rows:
+        day = get_partition_day(table, partition_name)
+        if day is not None:
+            partitions[day] = partition_name
+    return partitions
+
+
+def _create_partition(table, day):
+    """Create the partition of a table that stores the rows of a day.
+
+    Columns, defaults, indexes and constraints are copied from the parent
+    table, except for foreign keys, which PostgreSQL doesn't copy and are
+    added afterwards (so that rows are still deleted along with their
+    execution or tenant).
+
+    :param table: Partitioned table name
+    :type table: str
+    :param day: Day whose rows are stored in the partition
+    :type day: datetime.date
+    :returns: Partition name
+    :rtype: str
+
+    """
+    partition_name = get_partition_name(table, day)
+    db.session.execute(
+        'CREATE TABLE {partition} ('
+        '  LIKE {table} INCLUDING ALL,'
+        "  CHECK (timestamp >= '{start}' AND timestamp < '{end}')"
+        ') INHERITS ({table})'.format(
+            partition=partition_name,
+            table=table,
+            start=day.isoformat(),
+            end=(day + timedelta(days=1)).isoformat(),
+        )
+    )
+    foreign_keys = db.session.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'",
+        {'table': table},
+    )
+    for name, definition in foreign_keys.fetchall():
+        # e.g. events__execution_fk_fkey -> events_20171225__execution_fk_fkey
+        name = name[len(table) + 1:] if name.startswith(table) else name
+        db.session.execute(
+            'ALTER TABLE {partition} ADD CONSTRAINT {partition}_{name} '
+            '{definition}'.format(
+                partition=partition_name,
+                name=name,
+                definition=definition,
+            )
+        )
+    return partition_name
+
+
+def _delete_unpartitioned_rows(table, cutoff):
+    """Delete old rows stored in the parent table itself.
+
+    Those are rows inserted before the table was partitioned, or for a day
+    whose partition didn't exist. They are deleted in batches, each in its
+    own transaction.
+
+    :param table: Partitioned table name
+    :type table: str
+    :param cutoff: Rows older than this day are deleted
+    :type cutoff: datetime.date
+    :returns: Number of rows deleted
+    :rtype: int
+
+    """
+    deleted = 0
+    while True:
+        result = db.session.execute(
+            'DELETE FROM ONLY {table} WHERE _storage_id IN ('
+            '  SELECT _storage_id FROM ONLY {table}'
+            '  WHERE timestamp < :cutoff'
+            '  LIMIT :batch_size'
+            ')'.format(table=table),
+            {
+                'cutoff': cutoff,
+                'batch_size': config.instance.events_delete_batch_size,
+            },
+        )
+        db.session.commit()
+        if not result.rowcount:
+            return deleted
+        deleted += result.rowcount
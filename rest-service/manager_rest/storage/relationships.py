@@ -50,8 +50,10 @@ def one_to_many_relationship(child_class,
         parent_class,
         primaryjoin=lambda: parent_primary_key == foreign_key_column,
         # The following line makes sure that when the *parent* is
-        # deleted, all its connected children are deleted as well
-        backref=db.backref(backreference, cascade='all')
+        # deleted, all its connected children are deleted as well. They're
+        # deleted by the DB (the foreign keys are ON DELETE CASCADE) rather
+        # than loaded into the session to be deleted one by one
+        backref=db.backref(backreference, cascade='all', passive_deletes=True)
     )
 
 
@@ -20,12 +20,13 @@ from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import cached_classproperty, FrozenDict
 from manager_rest.rest.responses import Workflow
 from manager_rest.deployment_update.constants import ACTION_TYPES, ENTITY_TYPES
 
 from .models_base import (
     db,
+    JSONB,
     JSONString,
     UTCDateTime,
 )
@@ -48,7 +49,7 @@ class Blueprint(SQLResourceBase):
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     main_file_name = db.Column(db.Text, nullable=False)
-    plan = db.Column(db.PickleType, nullable=False)
+    plan = db.Column(JSONB, nullable=False)
     updated_at = db.Column(UTCDateTime)
     description = db.Column(db.Text)
 
@@ -89,11 +90,11 @@ class Secret(SQLResourceBase):
     def key(self):
         return self.id
 
-    @classproperty
+    @cached_classproperty
     def resource_fields(cls):
-        fields = super(Secret, cls).resource_fields
+        fields = super(Secret, cls).resource_fields.copy()
         fields['key'] = fields.pop('id')
-        return fields
+        return FrozenDict(fields)
 
 # endregion
 
@@ -111,17 +112,20 @@ class Deployment(SQLResourceBase):
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     description = db.Column(db.Text)
-    inputs = db.Column(db.PickleType)
+    inputs = db.Column(JSONB)
     groups = db.Column(db.PickleType)
     permalink = db.Column(db.Text)
     policy_triggers = db.Column(db.PickleType)
     policy_types = db.Column(db.PickleType)
-    outputs = db.Column(db.PickleType(comparator=lambda *a: False))
+    outputs = db.Column(JSONB(comparator=lambda *a: False))
     scaling_groups = db.Column(db.PickleType)
     updated_at = db.Column(UTCDateTime)
-    workflows = db.Column(db.PickleType(comparator=lambda *a: False))
+    workflows = db.Column(JSONB(comparator=lambda *a: False))
+    # A copy of the blueprint plan's workflow plugins, so that the plan
+    # doesn't have to be loaded to execute a workflow
+    _workflow_plugins_to_install = db.Column(JSONB)
 
-    _blueprint_fk = foreign_key(Blueprint._storage_id)
+    _blueprint_fk = foreign_key(Blueprint._storage_id, index=True)
 
     @declared_attr
     def blueprint(cls):
@@ -129,13 +133,13 @@ class Deployment(SQLResourceBase):
 
     blueprint_id = association_proxy('blueprint', 'id')
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
-        fields = super(Deployment, cls).response_fields
+        fields = super(Deployment, cls).response_fields.copy()
         fields['workflows'] = flask_fields.List(
             flask_fields.Nested(Workflow.resource_fields)
         )
-        return fields
+        return FrozenDict(fields)
 
     def to_response(self, **kwargs):
         dep_dict = super(Deployment, self).to_response()
@@ -165,11 +169,13 @@ class Execution(SQLResourceBase):
     is_system_workflow = db.Column(db.Boolean, nullable=False)
     parameters = db.Column(db.PickleType)
     status = db.Column(
-        db.Enum(*ExecutionState.STATES, name='execution_status')
+        db.Enum(*ExecutionState.STATES, name='execution_status'),
+        index=True
     )
     workflow_id = db.Column(db.Text, nullable=False)
 
-    _deployment_fk = foreign_key(Deployment._storage_id, nullable=True)
+    _deployment_fk = foreign_key(
+        Deployment._storage_id, nullable=True, index=True)
 
     @declared_attr
     def deployment(cls):
@@ -193,6 +199,26 @@ class Event(SQLResourceBase):
     """Execution events."""
 
     __tablename__ = 'events'
+    __table_args__ = (
+        # Composite index used to get the events of an execution sorted by
+        # timestamp. It also covers queries that filter only by execution.
+        db.Index(
+            'events__execution_fk_timestamp_idx',
+            '_execution_fk',
+            'timestamp',
+        ),
+        # Trigram index used to search messages by substring or pattern
+        db.Index(
+            'events_message_idx',
+            'message',
+            postgresql_using='gin',
+            postgresql_ops={'message': 'gin_trgm_ops'},
+        ),
+        # Rows are moved to the table's partitions by a trigger (see
+        # manager_rest.storage.partitions), so INSERT ... RETURNING can't
+        # be used to get the id of new rows
+        {'implicit_returning': False},
+    )
 
     timestamp = db.Column(
         UTCDateTime,
@@ -226,6 +252,26 @@ class Log(SQLResourceBase):
     """Execution logs."""
 
     __tablename__ = 'logs'
+    __table_args__ = (
+        # Composite index used to get the events of an execution sorted by
+        # timestamp. It also covers queries that filter only by execution.
+        db.Index(
+            'logs__execution_fk_timestamp_idx',
+            '_execution_fk',
+            'timestamp',
+        ),
+        # Trigram index used to search messages by substring or pattern
+        db.Index(
+            'logs_message_idx',
+            'message',
+            postgresql_using='gin',
+            postgresql_ops={'message': 'gin_trgm_ops'},
+        ),
+        # Rows are moved to the table's partitions by a trigger (see
+        # manager_rest.storage.partitions), so INSERT ... RETURNING can't
+        # be used to get the id of new rows
+        {'implicit_returning': False},
+    )
 
     timestamp = db.Column(
         UTCDateTime,
@@ -279,13 +325,13 @@ class DeploymentUpdate(SQLResourceBase):
     deployment_id = association_proxy('deployment', 'id')
     execution_id = association_proxy('execution', 'id')
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
-        fields = super(DeploymentUpdate, cls).response_fields
+        fields = super(DeploymentUpdate, cls).response_fields.copy()
         fields['steps'] = flask_fields.List(
             flask_fields.Nested(DeploymentUpdateStep.response_fields)
         )
-        return fields
+        return FrozenDict(fields)
 
     def to_response(self, **kwargs):
         dep_update_dict = super(DeploymentUpdate, self).to_response()
@@ -370,13 +416,13 @@ class Node(SQLResourceBase):
     planned_number_of_instances = db.Column(db.Integer, nullable=False)
     plugins = db.Column(db.PickleType)
     plugins_to_install = db.Column(db.PickleType)
-    properties = db.Column(db.PickleType)
-    relationships = db.Column(db.PickleType)
-    operations = db.Column(db.PickleType)
+    properties = db.Column(JSONB)
+    relationships = db.Column(JSONB)
+    operations = db.Column(JSONB)
     type = db.Column(db.Text, nullable=False, index=True)
     type_hierarchy = db.Column(db.PickleType)
 
-    _deployment_fk = foreign_key(Deployment._storage_id)
+    _deployment_fk = foreign_key(Deployment._storage_id, index=True)
 
     @declared_attr
     def deployment(cls):
@@ -389,6 +435,11 @@ class Node(SQLResourceBase):
         self._set_parent(deployment)
         self.deployment = deployment
 
+    def set_deployment_keys(self, deployment):
+        """Set the deployment of a node that is going to be saved in bulk"""
+        self._set_parent_keys(deployment)
+        self._deployment_fk = deployment._storage_id
+
 
 class NodeInstance(SQLResourceBase):
     __tablename__ = 'node_instances'
@@ -403,12 +454,12 @@ class NodeInstance(SQLResourceBase):
     # in the code, currently, that the host will be created beforehand
     host_id = db.Column(db.Text)
     relationships = db.Column(db.PickleType)
-    runtime_properties = db.Column(db.PickleType)
+    runtime_properties = db.Column(JSONB)
     scaling_groups = db.Column(db.PickleType)
     state = db.Column(db.Text, nullable=False)
     version = db.Column(db.Integer, default=1)
 
-    _node_fk = foreign_key(Node._storage_id)
+    _node_fk = foreign_key(Node._storage_id, index=True)
 
     @declared_attr
     def node(cls):
@@ -421,4 +472,9 @@ class NodeInstance(SQLResourceBase):
         self._set_parent(node)
         self.node = node
 
+    def set_node_keys(self, node):
+        """Set the node of an instance that is going to be saved in bulk"""
+        self._set_parent_keys(node)
+        self._node_fk = node._storage_id
+
 # endregion
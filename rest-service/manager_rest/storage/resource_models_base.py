@@ -16,7 +16,7 @@
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import cached_classproperty, FrozenDict
 
 from .models_base import db, SQLModelBase
 from .management_models import Tenant, User
@@ -42,11 +42,11 @@ class SQLResourceBase(SQLModelBase):
     # Lists of fields to skip when using older versions of the client
     skipped_fields = {'v1': [], 'v2': [], 'v2.1': []}
 
-    @classproperty
+    @cached_classproperty
     def response_fields(cls):
         fields = cls.resource_fields.copy()
         fields.update(cls._extra_fields)
-        return fields
+        return FrozenDict(fields)
 
     @classmethod
     def unique_id(cls):
@@ -100,3 +100,11 @@ class SQLResourceBase(SQLModelBase):
             self.creator = parent_instance.creator
             self.tenant = parent_instance.tenant
             self.private_resource = parent_instance.private_resource
+
+    def _set_parent_keys(self, parent_instance):
+        """Same as `_set_parent`, but only sets the foreign keys, for
+        resources saved in bulk (where relationships aren't handled)
+        """
+        self._creator_id = parent_instance._creator_id
+        self._tenant_id = parent_instance._tenant_id
+        self.private_resource = parent_instance.private_resource
@@ -27,6 +27,8 @@ from manager_rest.constants import CURRENT_TENANT_CONFIG
 from sqlalchemy import or_ as sql_or, func
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.interfaces import ONETOMANY
+from sqlalchemy.util import lightweight_named_tuple
 from sqlite3 import DatabaseError as SQLiteDBError
 
 try:
@@ -38,6 +40,12 @@ except ImportError:
 
 
 class SQLStorageManager(object):
+    # Maximum number of ids passed in a single `IN` clause
+    ID_CHUNK_SIZE = 500
+    # Separates the name of a JSON column from the keys of a path in it
+    # (e.g. `runtime_properties.ip`)
+    JSON_PATH_SEPARATOR = '.'
+
     @staticmethod
     def _safe_commit():
         """Try to commit changes in the session. Roll back if exception raised
@@ -51,6 +59,19 @@ class SQLStorageManager(object):
                 'SQL Storage error: {0}'.format(str(e))
             )
 
+    @staticmethod
+    def _safe_flush():
+        """Same as `_safe_commit`, but only flush the changes, leaving the
+        transaction open
+        """
+        try:
+            db.session.flush()
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+
     def _get_base_query(self, model_class, include, joins):
         """Create the initial query from the model class and included columns
 
@@ -228,7 +249,9 @@ class SQLStorageManager(object):
                    include=None,
                    filters=None,
                    sort=None,
-                   all_tenants=None):
+                   all_tenants=None,
+                   include_paths=None,
+                   json_filters=None):
         """Get an SQL query object based on the params passed
 
         :param model_class: SQL DB table class
@@ -238,18 +261,175 @@ class SQLStorageManager(object):
         of such values)
         :param sort: An optional dictionary where keys are column names to
         sort by, and values are the order (asc/desc)
+        :param include_paths: An optional dictionary of paths in JSON columns
+        to include in the query (see `_split_json_paths`)
+        :param json_filters: An optional list of paths in JSON columns to
+        filter by (see `_split_json_filters`)
         :return: A sorted and filtered query with only the relevant
         columns
         """
+        include = list(include or [])
+        include_paths = include_paths or {}
+        json_filters = json_filters or []
+        if (include or include_paths) and not self._json_operators_supported():
+            # The paths are extracted and filtered by in python, so the
+            # whole JSON columns are needed
+            json_columns = [column_name
+                            for column_name, _ in include_paths.values()]
+            json_columns += [column_name
+                             for column_name, _, _ in json_filters]
+            include += [column_name
+                        for column_name in OrderedDict.fromkeys(json_columns)
+                        if column_name not in include]
+
         include, filters, sort, joins = self._get_joins_and_converted_columns(
             model_class, include, filters, sort
         )
+        if include_paths and self._json_operators_supported():
+            include.extend(
+                getattr(model_class, column_name)[keys].label(field_name)
+                for field_name, (column_name, keys)
+                in include_paths.iteritems())
 
         query = self._get_base_query(model_class, include, joins)
         query = self._filter_query(query, model_class, filters, all_tenants)
+        if json_filters and self._json_operators_supported():
+            query = self._add_json_filter(query, model_class, json_filters)
         query = self._sort_query(query, sort)
         return query
 
+    @staticmethod
+    def _json_operators_supported():
+        """Paths in JSON columns are filtered by and projected in SQL by
+        PostgreSQL, and in python for other databases
+
+        The python fallback is only meant for the SQLite database used in
+        tests: filtering by a JSON path reads all the rows matching the other
+        filters, so it doesn't scale to production tables
+        """
+        return db.engine.dialect.name == 'postgresql'
+
+    def _split_json_paths(self, model_class, field_names):
+        """Separate the paths in JSON columns (e.g. `runtime_properties.ip`)
+        from the column names
+
+        :param field_names: A list of column names and JSON paths
+        :return: A tuple of the list of column names, and an ordered
+        dictionary where keys are the JSON paths, and values are the name of
+        their column and the keys of the nested objects in the path
+        """
+        column_names = []
+        json_paths = OrderedDict()
+        for field_name in field_names or []:
+            if self.JSON_PATH_SEPARATOR not in field_name:
+                column_names.append(field_name)
+                continue
+            keys = field_name.split(self.JSON_PATH_SEPARATOR)
+            column_name = keys.pop(0)
+            if column_name not in model_class.json_fields or not all(keys):
+                raise manager_exceptions.BadParametersError(
+                    '`{0}` is not a path in a JSON column of `{1}`'.format(
+                        field_name, model_class.__name__
+                    )
+                )
+            json_paths[field_name] = (column_name, tuple(keys))
+        return column_names, json_paths
+
+    def _split_json_filters(self, model_class, filters):
+        """Separate the filters of paths in JSON columns from the filters of
+        columns
+
+        :param filters: A dictionary where keys are column names or JSON
+        paths, and values are values to filter by (or lists of such values)
+        :return: A tuple of the dictionary of column filters, and a list of
+        the column name, the keys and the value of every JSON path filter
+        """
+        filters = filters or {}
+        column_names, json_paths = self._split_json_paths(model_class,
+                                                          filters)
+        column_filters = {name: filters[name] for name in column_names}
+        json_filters = [(column_name, keys, filters[field_name])
+                        for field_name, (column_name, keys)
+                        in json_paths.iteritems()]
+        return column_filters, json_filters
+
+    @staticmethod
+    def _add_json_filter(query, model_class, json_filters):
+        for column_name, keys, value in json_filters:
+            column = getattr(model_class, column_name)[keys]
+            if isinstance(value, (list, tuple)):
+                query = query.filter(column.in_(value))
+            else:
+                query = query.filter(column == value)
+        return query
+
+    @staticmethod
+    def _get_json_path_value(value, keys):
+        """Get the value at a path in a JSON object, or None if there is no
+        such path (as the `#>` operator of PostgreSQL does)
+        """
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def _matches_json_filters(self, result, json_filters):
+        """Check in python if a result matches the filters of JSON paths"""
+        for column_name, keys, value in json_filters:
+            result_value = self._get_json_path_value(
+                getattr(result, column_name), keys)
+            if isinstance(value, (list, tuple)):
+                if result_value not in value:
+                    return False
+            elif result_value != value:
+                return False
+        return True
+
+    def _project_json_paths(self,
+                            results,
+                            include,
+                            include_paths,
+                            json_filters):
+        """Put the values of the included JSON paths in the results, in
+        objects with only those paths, in place of their JSON columns
+
+        e.g. including `runtime_properties.ip` gives results where the
+        runtime properties are `{'ip': <ip>}`. JSON columns that were only
+        selected to be filtered by in python are removed from the results.
+        """
+        filtered_in_python = json_filters and \
+            not self._json_operators_supported()
+        if not include_paths and not (include and filtered_in_python):
+            return results
+        include = list(include or [])
+        fields = include + [column_name
+                            for column_name, _ in include_paths.values()
+                            if column_name not in include]
+        fields = list(OrderedDict.fromkeys(fields))
+        result_class = lightweight_named_tuple('result', fields)
+        projected = []
+        for result in results:
+            values = OrderedDict((name, getattr(result, name))
+                                 for name in include)
+            for field_name, (column_name, keys) in include_paths.iteritems():
+                if column_name in include:
+                    # The whole column is included anyway
+                    continue
+                if self._json_operators_supported():
+                    value = getattr(result, field_name)
+                else:
+                    value = self._get_json_path_value(
+                        getattr(result, column_name), keys)
+                json_object = values.get(column_name)
+                if json_object is None:
+                    json_object = values[column_name] = {}
+                for key in keys[:-1]:
+                    json_object = json_object.setdefault(key, {})
+                json_object[keys[-1]] = value
+            projected.append(result_class([values[name] for name in fields]))
+        return projected
+
     def _get_columns_from_field_names(self,
                                       model_class,
                                       include,
@@ -309,6 +489,23 @@ class SQLStorageManager(object):
             results = query.all()
             return results, len(results), 0, 0
 
+    def _paginate_json_filtered(self, query, json_filters, pagination):
+        """Same as `_paginate`, but for databases which can't filter by JSON
+        paths: all the results of the query are filtered in python, and then
+        paginated
+        """
+        results = [result for result in query
+                   if self._matches_json_filters(result, json_filters)]
+        total = len(results)
+        if pagination:
+            size = pagination.get('size', 0)
+            self._validate_pagination(size)
+            offset = pagination.get('offset', 0)
+            return results[offset:offset + size], total, size, offset
+        else:
+            self._validate_returned_size(total)
+            return results, total, 0, 0
+
     @staticmethod
     def _validate_pagination(pagination_size):
         if pagination_size < 0:
@@ -337,9 +534,12 @@ class SQLStorageManager(object):
                 )
             )
 
-    def _validate_unique_resource_id_per_tenant(self, instance):
+    def _validate_unique_resource_id_per_tenant(self, instance, commit=True):
         """Assert that only a single resource exists with a given id in a
         given tenant
+
+        :param commit: Whether the instance was committed. If it wasn't, the
+                       current transaction is rolled back if it's a duplicate
         """
         # Only relevant for resources that have unique IDs and are connected
         # to a tenant
@@ -350,9 +550,12 @@ class SQLStorageManager(object):
 
         # There should be only one instance with this id on this tenant
         if len(self.list(instance.__class__, filters=filters)) != 1:
-            # Delete the newly added instance, and raise an error
-            db.session.delete(instance)
-            self._safe_commit()
+            if commit:
+                # Delete the newly added instance, and raise an error
+                db.session.delete(instance)
+                self._safe_commit()
+            else:
+                db.session.rollback()
 
             raise manager_exceptions.ConflictError(
                 '{0} already exists on {1}'.format(
@@ -361,6 +564,38 @@ class SQLStorageManager(object):
                 )
             )
 
+    def _validate_unique_resource_ids_per_tenant(self,
+                                                 model_class,
+                                                 instances):
+        """Assert that the ids of newly added instances aren't used by other
+        resources in their tenants, rolling back the current transaction if
+        they are
+        """
+        if not model_class.is_resource or not model_class.is_id_unique:
+            return
+
+        ids = list(set(instance.id for instance in instances))
+        duplicates = []
+        # Checking the ids in chunks, to keep the number of query parameters
+        # bounded
+        for i in range(0, len(ids), self.ID_CHUNK_SIZE):
+            duplicates.extend(
+                db.session.query(model_class.id, model_class._tenant_id)
+                .filter(model_class.id.in_(ids[i:i + self.ID_CHUNK_SIZE]))
+                .group_by(model_class.id, model_class._tenant_id)
+                .having(func.count(model_class._storage_id) > 1)
+                .all()
+            )
+        if duplicates:
+            db.session.rollback()
+            raise manager_exceptions.ConflictError(
+                '{0} instances with ids {1} already exist on {2}'.format(
+                    model_class.__name__,
+                    sorted(duplicate.id for duplicate in duplicates),
+                    self.current_tenant
+                )
+            )
+
     def _associate_users_and_tenants(self, instance):
         """Associate, if necessary, the instance with the current tenant/user
         """
@@ -374,10 +609,14 @@ class SQLStorageManager(object):
     def _load_relationships(instance):
         """A helper method used to overcome a problem where the relationships
         that rely on joins aren't being loaded automatically
+
+        Collections of children (e.g. the executions of a deployment) aren't
+        loaded, as the DB deletes them along with their parent
         """
         if instance.is_resource:
             for rel in instance.__mapper__.relationships:
-                getattr(instance, rel.key)
+                if rel.direction != ONETOMANY:
+                    getattr(instance, rel.key)
 
     @property
     def current_tenant(self):
@@ -397,16 +636,29 @@ class SQLStorageManager(object):
             'Get `{0}` with ID `{1}`'.format(model_class.__name__, element_id)
         )
         filters = filters or {'id': element_id}
-        query = self._get_query(model_class, include, filters)
+        include, include_paths = self._split_json_paths(model_class, include)
+        filters, json_filters = self._split_json_filters(model_class, filters)
+        query = self._get_query(model_class,
+                                include,
+                                filters,
+                                include_paths=include_paths,
+                                json_filters=json_filters)
         if locking:
             query = query.with_for_update()
-        result = query.first()
+        if json_filters and not self._json_operators_supported():
+            result = next((r for r in query
+                           if self._matches_json_filters(r, json_filters)),
+                          None)
+        else:
+            result = query.first()
 
         if not result:
             raise manager_exceptions.NotFoundError(
                 'Requested `{0}` with ID `{1}` was not found'
                 .format(model_class.__name__, element_id)
             )
+        result, = self._project_json_paths(
+            [result], include, include_paths, json_filters)
         current_app.logger.debug('Returning {0}'.format(result))
         return result
 
@@ -442,32 +694,112 @@ class SQLStorageManager(object):
             msg = 'List `{0}`'.format(model_class.__name__)
 
         current_app.logger.debug(msg)
+        include, include_paths = self._split_json_paths(model_class, include)
+        filters, json_filters = self._split_json_filters(model_class, filters)
         query = self._get_query(model_class,
                                 include,
                                 filters,
                                 sort,
-                                all_tenants)
+                                all_tenants,
+                                include_paths,
+                                json_filters)
 
-        results, total, size, offset = self._paginate(query, pagination)
+        if json_filters and not self._json_operators_supported():
+            results, total, size, offset = self._paginate_json_filtered(
+                query, json_filters, pagination)
+        else:
+            results, total, size, offset = self._paginate(query, pagination)
+        results = self._project_json_paths(
+            results, include, include_paths, json_filters)
         pagination = {'total': total, 'size': size, 'offset': offset}
 
         current_app.logger.debug('Returning: {0}'.format(results))
         return ListResult(items=results, metadata={'pagination': pagination})
 
-    def put(self, instance):
+    def query(self, model_class, all_tenants=None):
+        """Return a query of `model_class` with the same tenant and
+        permissions filters used by `list`, to be refined by the caller
+        """
+        query = db.session.query(model_class)
+        query = self._add_tenant_filter(query, model_class, all_tenants)
+        return self._add_permissions_filter(query, model_class)
+
+    def put(self, instance, commit=True):
         """Create a `model_class` instance from a serializable `model` object
 
         :param instance: An instance of the SQLModelBase class (or some class
         derived from it)
+        :param commit: Whether to commit the transaction. If False, the
+                       instance is only flushed, and committed with the
+                       following changes
         :return: The same instance, with the tenant set, if necessary
         """
         self._associate_users_and_tenants(instance)
         current_app.logger.debug('Put {0}'.format(instance))
-        self.update(instance, log=False)
+        if commit:
+            self.update(instance, log=False)
+        else:
+            db.session.add(instance)
+            self._safe_flush()
 
-        self._validate_unique_resource_id_per_tenant(instance)
+        self._validate_unique_resource_id_per_tenant(instance, commit)
         return instance
 
+    def put_many(self, instances, commit=True):
+        """Create many instances of the same model class in a single
+        transaction, inserting them in bulk
+
+        Unlike `put`, relationships aren't handled: the foreign keys of the
+        instances (including their tenant and creator) need to be set
+        explicitly, and the instances aren't added to the session
+
+        :param instances: A list of instances of an SQLModelBase class
+        :param commit: Whether to commit the transaction. If False, the
+                       instances are committed with the following changes
+        :return: The same instances
+        """
+        if not instances:
+            return instances
+        model_class = instances[0].__class__
+        current_app.logger.debug('Put {0} {1} instances'.format(
+            len(instances), model_class.__name__))
+        try:
+            db.session.bulk_save_objects(instances)
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+        self._validate_unique_resource_ids_per_tenant(model_class, instances)
+        if commit:
+            self._safe_commit()
+        return instances
+
+    def insert_many(self, model_class, values):
+        """Insert many `model_class` rows with a single multi-row INSERT
+        statement, and commit
+
+        This is meant for importing large amounts of data: no instances are
+        created, and the ids of the rows aren't validated to be unique.
+
+        :param model_class: SQL DB table class
+        :param values: A list of dicts, all with the same keys, each with the
+                       values of the columns of a row (including its foreign
+                       keys, tenant and creator)
+        """
+        if not values:
+            return
+        current_app.logger.debug('Insert {0} {1} instances'.format(
+            len(values), model_class.__name__))
+        try:
+            db.session.execute(model_class.__table__.insert().values(values))
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+        self._safe_commit()
+
     def delete(self, instance):
         """Delete the passed instance
         """
@@ -477,6 +809,25 @@ class SQLStorageManager(object):
         self._safe_commit()
         return instance
 
+    def delete_many(self, instances, commit=True):
+        """Delete many instances in a single transaction
+
+        :param instances: A list of instances loaded into the session
+        :param commit: Whether to commit the transaction. If False, the
+                       deletions are only flushed, and committed with the
+                       following changes
+        :return: The same instances
+        """
+        current_app.logger.debug('Delete {0} instances'.format(
+            len(instances)))
+        for instance in instances:
+            db.session.delete(instance)
+        if commit:
+            self._safe_commit()
+        else:
+            self._safe_flush()
+        return instances
+
     def update(self, instance, log=True, modified_attrs=()):
         """Add `instance` to the DB session, and attempt to commit
 
@@ -498,6 +849,28 @@ class SQLStorageManager(object):
         self._safe_commit()
         return instance
 
+    def update_many(self, model_class, values):
+        """Update the columns of many `model_class` rows, and commit
+
+        The rows are updated with bulk UPDATE statements by their primary
+        key, without loading them into the session (so any instances of
+        them already in the session aren't refreshed).
+
+        :param model_class: SQL DB table class
+        :param values: A list of dicts, each with the `_storage_id` of a row
+                       and the new values of its columns
+        """
+        current_app.logger.debug('Update {0} {1} instances'.format(
+            len(values), model_class.__name__))
+        try:
+            db.session.bulk_update_mappings(model_class, values)
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+        self._safe_commit()
+
     def refresh(self, instance):
         """Reload the instance with fresh information from the DB
 
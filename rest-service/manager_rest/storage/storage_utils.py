@@ -37,6 +37,28 @@ def get_node(deployment_id, node_id):
     return nodes[0]
 
 
+def get_nodes(deployment_id, node_ids):
+    """Return a dict of the nodes with the given IDs in a deployment, by ID
+    """
+    node_ids = list(set(node_ids))
+    if not node_ids:
+        return {}
+    nodes = get_storage_manager().list(
+        Node,
+        filters={'deployment_id': deployment_id, 'id': node_ids},
+        pagination={'size': len(node_ids)}
+    )
+    nodes = {node.id: node for node in nodes}
+    missing = [node_id for node_id in node_ids if node_id not in nodes]
+    if missing:
+        raise NotFoundError(
+            'Requested Nodes with IDs `{0}` on Deployment `{1}` '
+            'were not found'.format(', '.join(sorted(missing)),
+                                    deployment_id)
+        )
+    return nodes
+
+
 def create_default_user_tenant_and_roles(admin_username,
                                          admin_password,
                                          amqp_manager):
@@ -27,6 +27,7 @@ from flask.testing import FlaskClient
 from nose.plugins.attrib import attr
 from wagon.wagon import Wagon
 from mock import MagicMock, patch
+from sqlalchemy import event
 
 from manager_rest import utils, config, constants, archiving
 from manager_rest.test.security_utils import get_admin_user
@@ -48,6 +49,12 @@ FILE_SERVER_PORT = 53229
 LATEST_API_VERSION = 3.1  # to be used by max_client_version test attribute
 
 
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
 class TestClient(FlaskClient):
     """A helper class that overrides flask's default testing.FlaskClient
     class for the purpose of adding authorization headers to all rest calls
@@ -194,6 +201,12 @@ class BaseServerTestCase(unittest.TestCase):
 
     @staticmethod
     def _handle_default_db_config(server):
+        # Children are deleted along with their parents by the foreign keys'
+        # ON DELETE CASCADE, which SQLite only enforces when asked to
+        if not event.contains(server.db.engine, 'connect',
+                              _enable_sqlite_foreign_keys):
+            event.listen(server.db.engine, 'connect',
+                         _enable_sqlite_foreign_keys)
         server.db.create_all()
         admin_user = get_admin_user()
 
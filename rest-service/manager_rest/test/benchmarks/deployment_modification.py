@@ -0,0 +1,113 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure scaling out a node of a deployment with many node instances.
+
+A REST service backed by an in-memory database is set up the same way the
+unit tests do it, and a deployment of the `modify1.yaml` mock blueprint
+(`node2` is connected to `node1`) is scaled to the initial number of
+`node1` instances. The time taken to start and finish (or roll back) a
+modification adding more instances is then measured.
+
+Example (scaling 5000 instances by +1000):
+
+    python deployment_modification.py --instances 5000 --added 1000
+
+"""
+
+import argparse
+import logging
+import time
+
+from manager_rest.test import base_test
+
+
+LOGGER = logging.getLogger(__name__)
+DEPLOYMENT_ID = 'deployment'
+
+
+class DeploymentModificationBenchmark(base_test.BaseServerTestCase):
+    """Server set up for the benchmark (not collected as a test)."""
+
+    __test__ = False
+
+    def runTest(self):
+        pass
+
+    def scale(self, instances, end_func):
+        """Scale node1 to a number of instances.
+
+        :param instances: Number of node1 instances after the modification
+        :type instances: int
+        :param end_func: Function called with the modification id to end it
+        :type end_func: callable
+        :returns: Seconds taken to start and to end the modification
+        :rtype: tuple(float, float)
+
+        """
+        started_at = time.time()
+        modification = self.client.deployment_modifications.start(
+            DEPLOYMENT_ID, nodes={'node1': {'instances': instances}})
+        ended_at = time.time()
+        end_func(modification.id)
+        return ended_at - started_at, time.time() - ended_at
+
+
+def main():
+    """Run benchmark."""
+    args = parse_arguments()
+    # Only the results are logged, and not the REST service's own messages
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(logging.INFO)
+
+    benchmark = DeploymentModificationBenchmark()
+    benchmark.setUp()
+    try:
+        benchmark.put_deployment(deployment_id=DEPLOYMENT_ID,
+                                 blueprint_file_name='modify1.yaml')
+        modifications = benchmark.client.deployment_modifications
+        benchmark.scale(args.instances, modifications.finish)
+
+        total = args.instances + args.added
+        for description, end_func in [('Rollback', modifications.rollback),
+                                      ('Finish', modifications.finish)]:
+            start_time, end_time = benchmark.scale(total, end_func)
+            LOGGER.info(
+                'Scale node1 from %d to %d instances (%s)\n'
+                '    start: %.2f seconds\n'
+                '    %s: %.2f seconds',
+                args.instances, total, description.lower(), start_time,
+                description.lower(), end_time)
+    finally:
+        benchmark.doCleanups()
+
+
+def parse_arguments():
+    """Parse command line arguments.
+
+    :returns: Parsed arguments
+    :rtype: argparse.Namespace
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--instances', type=int, default=5000)
+    parser.add_argument('--added', type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Compare query plans of event queries with and without foreign key indexes.
+
+A scratch schema with a simplified copy of the deployments, executions and
+events tables is populated with generated data. The queries the REST service
+runs to list, count and delete the events of an execution are then explained
+before and after creating the indexes added in the `4dfd8797fdfa` migration.
+
+Example (10M events):
+
+    python fk_indexes.py --postgresql-host localhost --events 10000000
+
+The scratch schema is dropped when the benchmark finishes.
+
+"""
+
+import argparse
+import logging
+import time
+
+import psycopg2
+
+
+LOGGER = logging.getLogger(__name__)
+SCHEMA = 'fk_indexes_benchmark'
+
+CREATE_TABLES = """
+CREATE SCHEMA {schema};
+SET search_path TO {schema};
+CREATE TABLE deployments (
+    _storage_id serial PRIMARY KEY,
+    id text NOT NULL
+);
+CREATE TABLE executions (
+    _storage_id serial PRIMARY KEY,
+    id text NOT NULL,
+    _deployment_fk integer REFERENCES deployments (_storage_id)
+);
+CREATE TABLE events (
+    _storage_id serial PRIMARY KEY,
+    timestamp timestamp NOT NULL,
+    message text,
+    _execution_fk integer NOT NULL REFERENCES executions (_storage_id)
+);
+CREATE INDEX executions_id_idx ON executions (id);
+CREATE INDEX events_timestamp_idx ON events (timestamp);
+"""
+
+POPULATE_TABLES = """
+INSERT INTO deployments (id)
+SELECT 'deployment_' || i FROM generate_series(1, %(deployments)s) AS i;
+INSERT INTO executions (id, _deployment_fk)
+SELECT 'execution_' || i, 1 + i %% %(deployments)s
+FROM generate_series(1, %(executions)s) AS i;
+INSERT INTO events (timestamp, message, _execution_fk)
+SELECT
+    now() - (i || ' milliseconds')::interval,
+    md5(i::text),
+    1 + i %% %(executions)s
+FROM generate_series(1, %(events)s) AS i;
+ANALYZE;
+"""
+
+CREATE_INDEXES = """
+CREATE INDEX executions__deployment_fk_idx
+    ON executions (_deployment_fk);
+CREATE INDEX events__execution_fk_timestamp_idx
+    ON events (_execution_fk, timestamp);
+ANALYZE;
+"""
+
+QUERIES = [
+    (
+        'List events of an execution',
+        """
+        SELECT events.timestamp, events.message
+        FROM events
+        JOIN executions ON events._execution_fk = executions._storage_id
+        WHERE executions.id = 'execution_1'
+        ORDER BY events.timestamp
+        LIMIT 100
+        """,
+    ),
+    (
+        'Count events of an execution',
+        """
+        SELECT count(*)
+        FROM events
+        JOIN executions ON events._execution_fk = executions._storage_id
+        WHERE executions.id = 'execution_1'
+        """,
+    ),
+    (
+        'Count events of a deployment (as done before deleting them)',
+        """
+        SELECT count(*)
+        FROM events
+        WHERE events._execution_fk IN (
+            SELECT executions._storage_id
+            FROM executions
+            JOIN deployments
+            ON executions._deployment_fk = deployments._storage_id
+            WHERE deployments.id = 'deployment_1'
+        )
+        """,
+    ),
+]
+
+
+def main():
+    """Run benchmark."""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    connection = psycopg2.connect(
+        host=args.postgresql_host,
+        dbname=args.database,
+        user=args.username,
+        password=args.password,
+    )
+    connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        LOGGER.info('Populating %d events...', args.events)
+        cursor.execute(CREATE_TABLES.format(schema=SCHEMA))
+        cursor.execute(POPULATE_TABLES, {
+            'deployments': args.deployments,
+            'executions': args.executions,
+            'events': args.events,
+        })
+
+        LOGGER.info('\n### Without foreign key indexes')
+        explain_queries(cursor)
+
+        LOGGER.info('\n### With foreign key indexes')
+        cursor.execute(CREATE_INDEXES)
+        explain_queries(cursor)
+    finally:
+        cursor.execute('DROP SCHEMA IF EXISTS {0} CASCADE'.format(SCHEMA))
+        connection.close()
+
+
+def explain_queries(cursor):
+    """Log query plan and execution time for every benchmark query.
+
+    :param cursor: Database cursor
+    :type cursor: :class:`psycopg2.extensions.cursor`
+
+    """
+    for description, query in QUERIES:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS) {0}'.format(query))
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        start = time.time()
+        cursor.execute(query)
+        cursor.fetchall()
+        elapsed = time.time() - start
+
+        LOGGER.info('\n%s (%.3f seconds)\n%s', description, elapsed, plan)
+
+
+def parse_arguments():
+    """Parse command line arguments.
+
+    :returns: Parsed arguments
+    :rtype: argparse.Namespace
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--postgresql-host', default='localhost')
+    parser.add_argument('--database', default='cloudify_db')
+    parser.add_argument('--username', default='cloudify')
+    parser.add_argument('--password', default='cloudify')
+    parser.add_argument('--deployments', type=int, default=1000)
+    parser.add_argument('--executions', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=10000000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Compare marshalling node instances with flask_restful and a serializer.
+
+Node instances are created in memory (no database is needed), and then
+marshalled the way `marshal_with` used to do it (`to_response()` followed by
+`flask_restful.marshal`) and with a precompiled `Serializer`, both with all
+the fields and with a few included ones.
+
+Example (1000 node instances, best of 5 runs):
+
+    python serializers.py --node-instances 1000 --repeat 5
+
+"""
+
+import argparse
+import json
+import logging
+import timeit
+
+from flask_restful import marshal
+
+from manager_rest.rest.serializers import Serializer
+from manager_rest.storage import models
+
+
+LOGGER = logging.getLogger(__name__)
+INCLUDE = ['id', 'node_id', 'state', 'runtime_properties']
+
+
+def main():
+    """Run benchmark."""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    node_instances = create_node_instances(args.node_instances)
+    all_fields = models.NodeInstance.response_fields
+    included_fields = {k: v for k, v in all_fields.items() if k in INCLUDE}
+
+    for description, fields in [('All fields', all_fields),
+                                ('Included fields', included_fields)]:
+        serializer = Serializer(fields)
+        assert json.dumps(marshal_items(node_instances, fields)) == \
+            json.dumps(serializer(node_instances))
+
+        marshal_time = best_time(
+            lambda: marshal_items(node_instances, fields), args.repeat)
+        serializer_time = best_time(
+            lambda: serializer(node_instances), args.repeat)
+        LOGGER.info(
+            '%s (%d node instances)\n'
+            '    flask_restful marshal: %.4f seconds\n'
+            '    serializer:            %.4f seconds (%.1fx)',
+            description, len(node_instances), marshal_time,
+            serializer_time, marshal_time / serializer_time)
+
+
+def create_node_instances(count):
+    """Create node instances in memory.
+
+    :param count: Number of node instances to create
+    :type count: int
+    :returns: Node instances attached to a node, tenant and creator
+    :rtype: list(:class:`manager_rest.storage.models.NodeInstance`)
+
+    """
+    tenant = models.Tenant(name='default_tenant')
+    creator = models.User(username='admin')
+    node = models.Node(
+        id='vm',
+        type='cloudify.nodes.Compute',
+        number_of_instances=count,
+        deploy_number_of_instances=count,
+        max_number_of_instances=count,
+        min_number_of_instances=count,
+        planned_number_of_instances=count,
+    )
+    node.deployment = models.Deployment(id='deployment')
+    node_instances = []
+    for index in range(count):
+        node_instance = models.NodeInstance(
+            id='vm_{0}'.format(index),
+            host_id='vm_{0}'.format(index),
+            relationships=[],
+            runtime_properties={'ip': '10.0.0.{0}'.format(index % 256)},
+            scaling_groups=[],
+            state='started',
+            version=1,
+        )
+        node_instance.node = node
+        node_instance.tenant = tenant
+        node_instance.creator = creator
+        node_instances.append(node_instance)
+    return node_instances
+
+
+def marshal_items(items, fields):
+    """Marshal items the way `marshal_with` did before using serializers.
+
+    :param items: Models to marshal
+    :type items: list(:class:`manager_rest.storage.models_base.SQLModelBase`)
+    :param fields: Fields to marshal
+    :type fields: dict
+    :returns: Marshalled items
+    :rtype: list(collections.OrderedDict)
+
+    """
+    return marshal([item.to_response() for item in items], fields)
+
+
+def best_time(function, repeat):
+    """Get the fastest of several runs of a function.
+
+    :param function: Function to call
+    :type function: callable
+    :param repeat: Number of runs
+    :type repeat: int
+    :returns: Seconds taken by the fastest run
+    :rtype: float
+
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def parse_arguments():
+    """Parse command line arguments.
+
+    :returns: Parsed arguments
+    :rtype: argparse.Namespace
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--node-instances', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
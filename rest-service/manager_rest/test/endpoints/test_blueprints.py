@@ -14,12 +14,17 @@
 #  * limitations under the License.
 
 import os
+import base64
+import hashlib
 import tempfile
 import shutil
 
+from mock import patch
 from nose.plugins.attrib import attr
 
-from manager_rest import archiving
+from manager_rest import archiving, config
+from manager_rest.constants import (DEFAULT_TENANT_NAME,
+                                    FILE_SERVER_UPLOADED_BLUEPRINTS_FOLDER)
 from manager_rest.storage import FileServer
 from manager_rest.test import base_test
 from cloudify_rest_client.exceptions import CloudifyClientError
@@ -227,6 +232,52 @@ class BlueprintsTestCase(base_test.BaseServerTestCase):
         )
         self.assertEqual(put_blueprints_response.status_code, 400)
 
+    def test_put_blueprint_archive_in_chunks(self):
+        resource_path, archive_path, _ = self.put_blueprint_args(
+            blueprint_id='chunked')
+        with patch.object(config.instance, 'upload_chunk_size', 100):
+            response = self.put_file(resource_path, archive_path)
+        self.assertEqual(201, response.status_code)
+        uploaded_path = os.path.join(
+            self.server_configuration.file_server_root,
+            FILE_SERVER_UPLOADED_BLUEPRINTS_FOLDER, DEFAULT_TENANT_NAME,
+            'chunked', 'chunked.tar.gz')
+        with open(archive_path, 'rb') as archive, \
+                open(uploaded_path, 'rb') as uploaded:
+            self.assertEqual(archive.read(), uploaded.read())
+
+    def test_put_blueprint_archive_too_large(self):
+        resource_path, archive_path, _ = self.put_blueprint_args()
+        archive_size_mb = os.path.getsize(archive_path) / 1024.0 / 1024
+        with patch.object(config.instance, 'max_upload_size_mb',
+                          archive_size_mb / 2):
+            response = self.put_file(resource_path, archive_path)
+        self.assertEqual(413, response.status_code)
+        self.assertEqual('payload_too_large_error',
+                         response.json['error_code'])
+        with patch.object(config.instance, 'max_upload_size_mb',
+                          archive_size_mb):
+            response = self.put_file(resource_path, archive_path)
+        self.assertEqual(201, response.status_code)
+
+    def test_put_blueprint_archive_digest(self):
+        resource_path, archive_path, _ = self.put_blueprint_args()
+        with open(archive_path, 'rb') as f:
+            data = f.read()
+        digest = base64.b64encode(hashlib.sha256(data).digest())
+        wrong_digest = base64.b64encode(hashlib.sha256('wrong').digest())
+
+        response = self.app.put(
+            resource_path, data=data,
+            headers={'Digest': 'SHA-256={0}'.format(wrong_digest)})
+        self.assertEqual(400, response.status_code)
+        self.assertIn('digest mismatch', response.data)
+
+        response = self.app.put(
+            resource_path, data=data,
+            headers={'Digest': 'MD5=abc, SHA-256={0}'.format(digest)})
+        self.assertEqual(201, response.status_code)
+
     @attr(client_min_version=2,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_blueprint_main_file_name(self):
@@ -18,10 +18,12 @@ import os
 import uuid
 import exceptions
 
+from mock import patch
 from nose.plugins.attrib import attr
 
 from manager_rest.test import base_test
 from manager_rest import manager_exceptions
+from manager_rest.storage import models
 from manager_rest.constants import DEFAULT_TENANT_NAME
 from manager_rest.constants import FILE_SERVER_DEPLOYMENTS_FOLDER
 
@@ -105,6 +107,21 @@ class DeploymentsTestCase(base_test.BaseServerTestCase):
         self.assertEqual(deployment_response.json['error_code'],
                          manager_exceptions.ConflictError.CONFLICT_ERROR_CODE)
 
+    def test_failed_creation_is_rolled_back(self):
+        blueprint_id = self.put_blueprint('mock_blueprint', None,
+                                          'blueprint')['id']
+        with patch('manager_rest.resource_manager.ResourceManager.'
+                   '_create_deployment_node_instances',
+                   side_effect=manager_exceptions.SQLStorageException(
+                       'failed creating node instances')):
+            deployment_response = self.put(
+                '/deployments/{0}'.format(self.DEPLOYMENT_ID),
+                {'blueprint_id': blueprint_id})
+        self.assertEqual(409, deployment_response.status_code)
+        # Neither the deployment nor its nodes were created
+        self.assertEqual(0, len(self.sm.list(models.Deployment)))
+        self.assertEqual(0, len(self.sm.list(models.Node)))
+
     def test_get_by_id(self):
         (blueprint_id, deployment_id, blueprint_response,
          deployment_response) = self.put_deployment(self.DEPLOYMENT_ID)
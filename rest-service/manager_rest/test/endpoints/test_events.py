@@ -542,6 +542,31 @@ class SelectEventsFilterTest(SelectEventsBaseTest):
         """Filter events by message.text."""
         self.filter_by_message_helper('message.text')
 
+    def test_filter_by_message_contains(self):
+        """Filter events by a substring of their message."""
+        for event, message in zip(self.events,
+                                  ['Progress: 100%_Done', '100%xdone']):
+            event.message = message
+        db.session.commit()
+        filters = {
+            'message_contains': ['100%_done'],
+            'type': ['cloudify_event', 'cloudify_log']
+        }
+
+        query = EventsV1._build_select_query(
+            filters,
+            self.DEFAULT_SORT,
+            self.DEFAULT_RANGE_FILTERS,
+            self.tenant.id
+        )
+        events = query.params(**self.DEFAULT_PAGINATION).all()
+
+        # Wildcards in the value are matched literally
+        self.assertListEqual(
+            [event.id for event in events],
+            [self.events[0].id],
+        )
+
     def test_filter_by_unknown(self):
         """Filter events by an unknown field."""
         filters = {
@@ -12,9 +12,33 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import gzip
+import json
+import time
+from datetime import date
+from StringIO import StringIO
+from unittest import TestCase
+
+from mock import patch
 from nose.plugins.attrib import attr
+from sqlalchemy import bindparam, false
 
+from manager_rest import config
+from manager_rest.rest.resources_v2 import Events as EventsV2
+from manager_rest.rest.resources_v3_1 import (
+    EventsBulk,
+    EventsExport,
+    EventsTail,
+)
+from manager_rest.storage import db, partitions
+from manager_rest.storage.resource_models import (
+    Deployment,
+    Event,
+    Execution,
+    Log,
+)
 from manager_rest.test import base_test
+from manager_rest.test.endpoints.test_events import SelectEventsBaseTest
 
 
 @attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
@@ -38,9 +62,577 @@ class EventsTest(base_test.BaseServerTestCase):
         self.assertEquals(total, response.metadata.pagination.total)
         self.assertEquals(len(hits), len(response.items))
 
+    def test_list_events_with_cursor(self):
+        response = self.client.events.list(
+            execution_id='<execution_id>',
+            _cursor='',
+            _size=100,
+        )
+        pagination = response.metadata.pagination
+        self.assertEqual(0, len(response.items))
+        self.assertIsNone(pagination['next_cursor'])
+        self.assertIsNone(pagination['total'])
+
+    def test_list_events_with_cursor_and_total(self):
+        response = self.client.events.list(
+            execution_id='<execution_id>',
+            _cursor='',
+            _get_total=True,
+        )
+        self.assertEqual(0, response.metadata.pagination.total)
+
+    def test_list_events_with_invalid_cursor(self):
+        response = self.get('/events', query_params={'_cursor': 'invalid'})
+        self.assertEqual(400, response.status_code)
+
+    def test_list_events_with_cursor_and_offset(self):
+        response = self.get(
+            '/events', query_params={'_cursor': '', '_offset': 10})
+        self.assertEqual(400, response.status_code)
+
     @attr(client_min_version=3,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_delete_events(self):
         response = self.client.events.delete(
             '<deployment_id>', include_logs=True)
         self.assertEqual(response.items, [0])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_export_events(self):
+        response = self.app.get(
+            '/api/v3.1/events/export',
+            query_string='execution_id=<execution_id>')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response.mimetype)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual('', response.data)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_export_events_gzip(self):
+        response = self.app.get(
+            '/api/v3.1/events/export',
+            query_string='execution_id=<execution_id>',
+            headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        data = gzip.GzipFile(fileobj=StringIO(response.data)).read()
+        self.assertEqual('', data)
+
+    def _post_bulk(self, lines, content_type='application/x-ndjson'):
+        return self.app.post(
+            '/api/v3.1/events/bulk',
+            content_type=content_type,
+            data=''.join(json.dumps(line) + '\n' for line in lines))
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bulk_insert_events(self):
+        execution = self._add_execution(
+            self._add_deployment(self._add_blueprint()), 'e1')
+        lines = [
+            {
+                'type': 'cloudify_event',
+                'execution_id': 'e1',
+                'timestamp': '2017-12-25T10:00:{0:02d}.000Z'.format(i),
+                'message': 'event {0}'.format(i),
+                'event_type': 'task_succeeded',
+            }
+            for i in range(5)
+        ] + [
+            {
+                'type': 'cloudify_log',
+                'execution_id': 'e1',
+                'timestamp': '2017-12-25T10:01:00.000Z',
+                'reported_timestamp': '2017-12-25T10:00:59.000Z',
+                'message': 'log',
+                'logger': 'ctx',
+                'level': 'info',
+                'node_instance_id': 'node_1',
+            },
+        ]
+        with patch.object(EventsBulk, 'INSERT_BATCH_SIZE', 2):
+            response = self._post_bulk(lines)
+        self.assertEqual(201, response.status_code)
+        self.assertEqual({'events': 5, 'logs': 1}, json.loads(response.data))
+
+        events = db.session.query(Event).order_by(Event.timestamp).all()
+        self.assertEqual(
+            ['event {0}'.format(i) for i in range(5)],
+            [event.message for event in events])
+        self.assertTrue(all(
+            event._execution_fk == execution._storage_id and
+            event._tenant_id == execution._tenant_id
+            for event in events))
+        log = db.session.query(Log).one()
+        self.assertEqual('node_1', log.node_id)
+        self.assertEqual('ctx', log.logger)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bulk_insert_events_unknown_execution(self):
+        self._add_execution(self._add_deployment(self._add_blueprint()), 'e1')
+        lines = [
+            {
+                'type': 'cloudify_event',
+                'execution_id': execution_id,
+                'timestamp': '2017-12-25T10:00:00.000Z',
+            }
+            for execution_id in ('e1', 'missing')
+        ]
+        response = self._post_bulk(lines)
+        self.assertEqual(404, response.status_code)
+        self.assertEqual(0, db.session.query(Event).count())
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bulk_insert_invalid_events(self):
+        self._add_execution(self._add_deployment(self._add_blueprint()), 'e1')
+        event = {
+            'type': 'cloudify_event',
+            'execution_id': 'e1',
+            'timestamp': '2017-12-25T10:00:00.000Z',
+        }
+        for invalid_line in ({'type': 'cloudify_event'},
+                             dict(event, type='unknown'),
+                             dict(event, timestamp='invalid'),
+                             'not an event'):
+            response = self._post_bulk([event, invalid_line])
+            self.assertEqual(400, response.status_code)
+            self.assertIn('line 2', json.loads(response.data)['message'])
+        self.assertEqual(0, db.session.query(Event).count())
+
+        response = self._post_bulk([event], content_type='application/json')
+        self.assertEqual(415, response.status_code)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bulk_insert_events_not_admin(self):
+        self._add_execution(self._add_deployment(self._add_blueprint()), 'e1')
+        event = {
+            'type': 'cloudify_event',
+            'execution_id': 'e1',
+            'timestamp': '2017-12-25T10:00:00.000Z',
+        }
+        with patch('manager_rest.rest.resources_v3_1.current_user') as user:
+            user.is_admin = False
+            response = self._post_bulk([event])
+        self.assertEqual(401, response.status_code)
+        self.assertEqual(0, db.session.query(Event).count())
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_maintain_events_partitions(self):
+        # Partitions are only used with PostgreSQL
+        response = self.post('/events/partitions', {})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            {'created': [], 'dropped': [], 'deleted': 0}, response.json)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_tail_events(self):
+        response = self.get('/api/v3.1/events/tail', query_params={
+            'execution_id': '<execution_id>',
+            '_cursor': '',
+            '_timeout': 0,
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.json['items'])
+        self.assertIsNotNone(
+            response.json['metadata']['pagination']['next_cursor'])
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_tail_events_without_execution(self):
+        response = self.get(
+            '/api/v3.1/events/tail', query_params={'_timeout': 0})
+        self.assertEqual(400, response.status_code)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_tail_events_with_invalid_timeout(self):
+        response = self.get('/api/v3.1/events/tail', query_params={
+            'execution_id': '<execution_id>',
+            '_timeout': -1,
+        })
+        self.assertEqual(400, response.status_code)
+
+
+@attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
+class SelectEventsCursorTest(SelectEventsBaseTest):
+
+    """Get events page by page using keyset pagination."""
+
+    DEFAULT_FILTERS = {
+        'type': ['cloudify_event', 'cloudify_log']
+    }
+    DEFAULT_RANGE_FILTERS = {}
+    PAGE_SIZE = 7
+
+    def _get_all_pages(self, descending, filters=None):
+        """Get all the events following the cursor from one page to the next.
+
+        :param descending: Whether events should be sorted in descending order
+        :type descending: bool
+        :param filters: Filters selection (all events and logs by default)
+        :type filters: dict(str, list(str))
+        :returns: Type and storage id of all the events returned
+        :rtype: list(tuple(str, int))
+
+        """
+        cursor = None
+        events = []
+        while True:
+            query = EventsV2._build_cursor_select_query(
+                filters or self.DEFAULT_FILTERS,
+                descending,
+                self.DEFAULT_RANGE_FILTERS,
+                self.tenant.id,
+                cursor,
+            )
+            page = query.params(limit=self.PAGE_SIZE).all()
+            self.assertLessEqual(len(page), self.PAGE_SIZE)
+            events.extend((event.type, event._storage_id) for event in page)
+            if len(page) < self.PAGE_SIZE:
+                return events
+            last_event = page[-1]
+            cursor = (
+                last_event._cursor_timestamp,
+                last_event._storage_id,
+                last_event.type,
+            )
+
+    def _get_expected_events(self, descending):
+        """Sort events as expected when using keyset pagination.
+
+        :param descending: Whether events should be sorted in descending order
+        :type descending: bool
+        :returns: Type and storage id of all the events in the database
+        :rtype: list(tuple(str, int))
+
+        """
+        events = [
+            (
+                event.timestamp,
+                'cloudify_{0}'.format(type(event).__name__.lower()),
+                event._storage_id,
+            )
+            for event in self.events
+        ]
+        return [
+            (event_type, storage_id)
+            for _, event_type, storage_id
+            in sorted(events, reverse=descending)
+        ]
+
+    def test_pages_ascending(self):
+        """Get all events in ascending order."""
+        self.assertListEqual(
+            self._get_all_pages(descending=False),
+            self._get_expected_events(descending=False),
+        )
+
+    def test_pages_descending(self):
+        """Get all events in descending order."""
+        self.assertListEqual(
+            self._get_all_pages(descending=True),
+            self._get_expected_events(descending=True),
+        )
+
+    def test_pages_same_timestamp(self):
+        """Get all events when many of them share the same timestamp."""
+        timestamp = self.fake.date_time()
+        for model in (Event, Log):
+            db.session.query(model).update({'timestamp': timestamp})
+        db.session.commit()
+
+        self.assertListEqual(
+            self._get_all_pages(descending=False),
+            self._get_expected_events(descending=False),
+        )
+
+    def test_pages_events_only(self):
+        """Get all events when logs are filtered out."""
+        expected_events = [
+            (event_type, storage_id)
+            for event_type, storage_id
+            in self._get_expected_events(descending=False)
+            if event_type == 'cloudify_event'
+        ]
+        self.assertListEqual(
+            self._get_all_pages(
+                descending=False, filters={'type': ['cloudify_event']}),
+            expected_events,
+        )
+
+    def test_unknown_type(self):
+        """No query is built when filters can't match any event."""
+        query = EventsV2._build_cursor_select_query(
+            {'type': ['cloudify_event'], 'level': ['INFO']},
+            False,
+            self.DEFAULT_RANGE_FILTERS,
+            self.tenant.id,
+            None,
+        )
+        self.assertIsNone(query)
+
+
+@attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
+class DeleteEventsBatchesTest(SelectEventsBaseTest):
+
+    """Delete the events/logs of a deployment in batches."""
+
+    BATCH_SIZE = 7
+
+    def setUp(self):
+        super(DeleteEventsBatchesTest, self).setUp()
+        self.deployment = max(
+            self.deployments,
+            key=lambda deployment: len(self._get_events(deployment)),
+        )
+        patcher = patch.object(
+            config.instance, 'events_delete_batch_size', self.BATCH_SIZE)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_events(self, deployment, model=None):
+        """Get the events/logs stored for a deployment.
+
+        :param deployment: Deployment the events/logs belong to
+        :type deployment:
+            :class:`manager_rest.storage.resource_models.Deployment`
+        :param model: Model to query (both events and logs by default)
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+        :returns: Storage id of the events/logs found
+        :rtype: list(int)
+
+        """
+        events = []
+        for event_model in [model] if model else [Event, Log]:
+            events.extend(
+                storage_id for storage_id, in
+                db.session.query(event_model._storage_id)
+                .join(Execution)
+                .filter(Execution._deployment_fk ==
+                        deployment._storage_id)
+            )
+        return events
+
+    def _delete(self, model, limit=None):
+        """Delete events/logs as the events endpoint would do.
+
+        :param model: Model whose rows should be deleted
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+        :param limit: Maximum number of rows to delete
+        :type limit: int
+        :returns: Number of rows deleted
+        :rtype: int
+
+        """
+        executions_query = (
+            db.session.query(Execution._storage_id)
+            .filter(
+                Execution._deployment_fk == Deployment._storage_id,
+                Deployment.id == bindparam('deployment_id'),
+                Execution._tenant_id == bindparam('tenant_id')
+            )
+        )
+        params = {
+            'deployment_id': self.deployment.id,
+            'tenant_id': self.tenant.id,
+        }
+        return EventsV2._delete_in_batches(
+            model, executions_query, params, limit)
+
+    def test_delete_all(self):
+        """All the events/logs of the deployment are deleted."""
+        other_events = len(self.events) - len(
+            self._get_events(self.deployment))
+        for model in (Event, Log):
+            expected = len(self._get_events(self.deployment, model))
+            self.assertEqual(expected, self._delete(model))
+        self.assertEqual([], self._get_events(self.deployment))
+        self.assertEqual(
+            other_events,
+            db.session.query(Event).count() + db.session.query(Log).count(),
+        )
+
+    def test_delete_with_limit(self):
+        """Deletion stops at the limit and resumes when called again."""
+        events = len(self._get_events(self.deployment, Event))
+        limit = self.BATCH_SIZE + 1
+        deleted = 0
+        while True:
+            count = self._delete(Event, limit)
+            self.assertLessEqual(count, limit)
+            deleted += count
+            self.assertEqual(
+                events - deleted,
+                len(self._get_events(self.deployment, Event)),
+            )
+            if count == 0:
+                break
+        self.assertEqual(events, deleted)
+
+
+@attr(client_min_version=3.1,
+      client_max_version=base_test.LATEST_API_VERSION)
+class PartitionNamesTest(TestCase):
+
+    """Map the partitions of the events and logs tables to days."""
+
+    def test_partition_name(self):
+        self.assertEqual(
+            'events_20171225',
+            partitions.get_partition_name('events', date(2017, 12, 25)))
+
+    def test_partition_day(self):
+        for table in partitions.PARTITIONED_TABLES:
+            day = date(2017, 12, 25)
+            self.assertEqual(
+                day,
+                partitions.get_partition_day(
+                    table, partitions.get_partition_name(table, day)))
+
+    def test_not_a_partition(self):
+        for name in ('logs_20171225', 'events_2017122', 'events_20171332',
+                     'events_20171225_old'):
+            self.assertIsNone(partitions.get_partition_day('events', name))
+
+
+@attr(client_min_version=3.1,
+      client_max_version=base_test.LATEST_API_VERSION)
+class SelectEventsExportTest(SelectEventsBaseTest):
+
+    """Export all events in a single query."""
+
+    DEFAULT_RANGE_FILTERS = {}
+
+    def _export(self, filters):
+        """Export events as the events export endpoint would do.
+
+        :param filters: Filters selection
+        :type filters: dict(str, list(str))
+        :returns: Exported events
+        :rtype: list(dict(str))
+
+        """
+        query = EventsExport._build_export_query(
+            filters, self.DEFAULT_RANGE_FILTERS, self.tenant.id)
+        return [
+            json.loads(json.dumps(EventsExport._map_event_to_dict(None, row)))
+            for row in query.yield_per(10)
+        ]
+
+    def test_export_all(self):
+        """Export both events and logs sorted by timestamp."""
+        events = self._export({'type': ['cloudify_event', 'cloudify_log']})
+        self.assertEqual(len(self.events), len(events))
+        timestamps = [event['timestamp'] for event in events]
+        self.assertListEqual(sorted(timestamps), timestamps)
+
+    def test_export_events_only(self):
+        """Export only events when logs are filtered out."""
+        events = self._export({'type': ['cloudify_event']})
+        self.assertEqual(
+            len([
+                event for event in self.events
+                if isinstance(event, Event)
+            ]),
+            len(events),
+        )
+        self.assertTrue(
+            all(event['type'] == 'cloudify_event' for event in events))
+
+    def test_unknown_type(self):
+        """No query is built when filters can't match any event."""
+        query = EventsExport._build_export_query(
+            {'type': ['cloudify_event'], 'level': ['INFO']},
+            self.DEFAULT_RANGE_FILTERS,
+            self.tenant.id,
+        )
+        self.assertIsNone(query)
+
+
+@attr(client_min_version=3.1,
+      client_max_version=base_test.LATEST_API_VERSION)
+class SelectEventsTailTest(SelectEventsBaseTest):
+
+    """Check for new events when tailing an execution."""
+
+    DEFAULT_FILTERS = {
+        'type': ['cloudify_event', 'cloudify_log']
+    }
+
+    def _probe(self, execution, cursor):
+        """Run probe query for an execution.
+
+        :param execution: Execution to look events for
+        :type execution:
+            :class:`manager_rest.storage.resource_models.Execution`
+        :param cursor: `(timestamp, _storage_id, type)` of the last event
+        :type cursor: tuple(datetime.datetime, int, str)
+        :returns: Whether events after the cursor were found
+        :rtype: bool
+
+        """
+        filters = dict(self.DEFAULT_FILTERS, execution_id=[execution.id])
+        query = EventsTail._build_probe_query(
+            filters, self.tenant.id, cursor)
+        return query.scalar()
+
+    def _get_execution_events(self, execution):
+        return [
+            event for event in self.events
+            if event._execution_fk == execution._storage_id
+        ]
+
+    def test_probe_without_cursor(self):
+        """Events are found from the beginning without a cursor."""
+        for execution in self.executions:
+            self.assertEqual(
+                bool(self._get_execution_events(execution)),
+                self._probe(execution, None),
+            )
+
+    def test_probe_after_last_event(self):
+        """No events are found after the last one."""
+        for execution in self.executions:
+            events = self._get_execution_events(execution)
+            if not events:
+                continue
+            last_event = max(
+                events, key=lambda event: (event.timestamp, event._storage_id))
+            cursor = (
+                last_event.timestamp,
+                last_event._storage_id,
+                'cloudify_{0}'.format(type(last_event).__name__.lower()),
+            )
+            self.assertFalse(self._probe(execution, cursor))
+
+    def test_wait_for_events_timeout(self):
+        """Waiting stops when the deadline expires."""
+        tail = EventsTail()
+        query = db.session.query(false())
+        self.assertFalse(tail._wait_for_events(query, time.time() + 0.1))
+
+    def test_wait_for_events_sleeps_remaining_time(self):
+        """The time left is read once, so sleeps are never negative."""
+        tail = EventsTail()
+        query = db.session.query(false())
+        with patch('manager_rest.rest.resources_v3_1.time') as time_mock, \
+                patch.object(db.session, 'rollback') as rollback_mock:
+            time_mock.time.side_effect = [0, 0.9, 1.0001]
+            self.assertFalse(tail._wait_for_events(query, 1))
+        sleeps = [args[0] for args, _ in time_mock.sleep.call_args_list]
+        self.assertEqual(2, len(sleeps))
+        self.assertEqual(EventsTail.POLL_INTERVAL, sleeps[0])
+        self.assertAlmostEqual(0.1, sleeps[1])
+        # The transaction was ended before every sleep
+        self.assertEqual(3, rollback_mock.call_count)
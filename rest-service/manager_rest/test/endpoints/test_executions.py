@@ -697,6 +697,37 @@ class ExecutionsTestCase(BaseServerTestCase):
             except exceptions.CloudifyClientError, e:
                 self.assertEqual(expected_status_code, e.status_code)
 
+    def test_execute_with_running_system_wide_execution_fails(self):
+        _, deployment_id, _, _ = self.put_deployment(self.DEPLOYMENT_ID)
+        self.sm.put(models.Execution(
+            id='system-wide',
+            status=ExecutionState.STARTED,
+            created_at=utils.get_formatted_timestamp(),
+            workflow_id='create_snapshot',
+            error='',
+            parameters={},
+            is_system_workflow=True))
+
+        # force doesn't apply to system-wide executions
+        with self.assertRaises(exceptions.CloudifyClientError) as cm:
+            self.client.executions.start(deployment_id, 'install', force=True)
+        self.assertEqual(400, cm.exception.status_code)
+        self.assertIn('system-wide', str(cm.exception))
+
+    def test_execute_uses_deployment_workflow_plugins(self):
+        blueprint_id, deployment_id, _, _ = \
+            self.put_deployment(self.DEPLOYMENT_ID)
+        deployment = self.sm.get(models.Deployment, deployment_id)
+        blueprint = self.sm.get(models.Blueprint, blueprint_id)
+        self.assertEqual(blueprint.plan['workflow_plugins_to_install'],
+                         deployment._workflow_plugins_to_install)
+
+        with mock.patch('manager_rest.workflow_executor.execute_workflow') \
+                as execute_workflow:
+            self.client.executions.start(deployment_id, 'install')
+        self.assertEqual(deployment._workflow_plugins_to_install,
+                         execute_workflow.call_args[1]['workflow_plugins'])
+
     def test_get_non_existent_execution(self):
         resource_path = '/executions/idonotexist'
         response = self.get(resource_path)
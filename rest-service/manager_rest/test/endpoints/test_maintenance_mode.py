@@ -19,7 +19,7 @@ from nose.plugins.attrib import attr
 
 from cloudify_rest_client import exceptions
 
-from manager_rest import utils
+from manager_rest import config, maintenance, utils
 from manager_rest.test import base_test
 from manager_rest.storage import models
 from manager_rest.test.base_test import BaseServerTestCase
@@ -33,6 +33,13 @@ from manager_rest.constants import (MAINTENANCE_MODE_ACTIVATED,
 @attr(client_min_version=2.1, client_max_version=base_test.LATEST_API_VERSION)
 class MaintenanceModeTest(BaseServerTestCase):
 
+    def create_configuration(self):
+        test_config = super(MaintenanceModeTest, self).create_configuration()
+        # Check for running executions on every request, so that maintenance
+        # mode is activated as soon as they end
+        test_config.maintenance_mode_activation_check_interval = 0
+        return test_config
+
     def test_maintenance_mode_inactive(self):
         response = self.client.maintenance_mode.status()
         self.assertEqual(MAINTENANCE_MODE_DEACTIVATED, response.status)
@@ -130,6 +137,32 @@ class MaintenanceModeTest(BaseServerTestCase):
         response = self.client.maintenance_mode.status()
         self.assertEqual(response.status, MAINTENANCE_MODE_ACTIVATED)
 
+    def test_running_executions_checked_periodically(self):
+        execution = self._start_maintenance_transition_mode()
+        with patch.object(config.instance,
+                          'maintenance_mode_activation_check_interval', 60), \
+                patch('manager_rest.maintenance.get_running_executions',
+                      wraps=maintenance.get_running_executions) as check:
+            # Running executions were just checked by the status request of
+            # the activation
+            self.client.blueprints.list()
+            self.client.blueprints.list()
+            self.assertEqual(0, check.call_count)
+
+            # Requests still see the last check's result
+            self._terminate_execution(execution.id)
+            self.assertRaises(exceptions.MaintenanceModeActivatingError,
+                              self.client.deployments.create,
+                              blueprint_id='transition_blueprint',
+                              deployment_id='d1')
+            self.assertEqual(0, check.call_count)
+
+            # ...but the status is always checked
+            response = self.client.maintenance_mode.status()
+            self.assertEqual(MAINTENANCE_MODE_ACTIVATED, response.status)
+            self.assertRaises(exceptions.MaintenanceModeActiveError,
+                              self.client.blueprints.list)
+
     def test_deployment_denial_in_maintenance_transition_mode(self):
         self._start_maintenance_transition_mode()
         self.client.blueprints.upload(
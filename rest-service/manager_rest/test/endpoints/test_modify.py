@@ -17,11 +17,12 @@ import copy
 import uuid
 import dateutil.parser
 from datetime import timedelta
+from mock import patch
 from nose.plugins.attrib import attr
 
 from manager_rest.test.base_test import CLIENT_API_VERSION
 
-from manager_rest import utils
+from manager_rest import config, utils
 from manager_rest.test import base_test
 from cloudify_rest_client import exceptions
 from cloudify_rest_client.deployment_modifications import (
@@ -441,6 +442,23 @@ class ModifyTests(base_test.BaseServerTestCase):
         deployment = self.client.deployments.delete(deployment.id)
         assert_deployment_instances(deployment, **end_expectation)
 
+    def test_modify_more_instances_than_max_results(self):
+        """Modifications aren't limited by the max size of list results"""
+        _, _, _, deployment = self.put_deployment(
+            deployment_id=str(uuid.uuid4()),
+            blueprint_file_name='modify1.yaml')
+        modifications = self.client.deployment_modifications
+        with patch.object(config.instance, 'max_results', 1):
+            modification = modifications.start(
+                deployment.id, nodes={'node1': {'instances': 3}})
+            modifications.rollback(modification.id)
+            modification = modifications.start(
+                deployment.id, nodes={'node1': {'instances': 3}})
+            modifications.finish(modification.id)
+        node_instances = self.client.node_instances.list(
+            deployment_id=deployment.id)
+        self.assertEqual(4, len(node_instances))
+
     @attr(client_min_version=2,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_relationship_order_of_related_nodes(self):
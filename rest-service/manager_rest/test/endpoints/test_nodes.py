@@ -374,6 +374,145 @@ class NodesTest(base_test.BaseServerTestCase):
 
         self.assertEqual(cm.exception.status_code, 404)
 
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_many_node_instances(self):
+        self.put_node_instance(instance_id='1', deployment_id='111',
+                               runtime_properties={'key': 'value'}, version=1)
+        self.put_node_instance(instance_id='2', deployment_id='111',
+                               version=3)
+        response = self.patch('/node-instances', {'node_instances': [
+            {'id': '1', 'version': 1, 'state': 'started'},
+            {'id': '2', 'version': 2, 'runtime_properties': {'a': 'b'}},
+            {'id': '3', 'version': 1, 'state': 'started'},
+        ]})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [('1', 2, None), ('2', 3, 'conflict_error'),
+             ('3', None, 'not_found_error')],
+            [(result['id'], result['version'], result['error_code'])
+             for result in response.json])
+
+        # Only the node instance with the right version was updated
+        instance = self.client.node_instances.get('1')
+        self.assertEqual('started', instance.state)
+        self.assertEqual({'key': 'value'}, instance.runtime_properties)
+        self.assertEqual(2, instance.version)
+        instance = self.client.node_instances.get('2')
+        self.assertEqual('', instance.state)
+        self.assertEqual({}, instance.runtime_properties)
+        self.assertEqual(3, instance.version)
+
+        response = self.patch('/node-instances', {'node_instances': [
+            {'id': '2', 'version': 3, 'runtime_properties': {'a': 'b'}},
+        ]})
+        self.assertEqual([None], [r['error_code'] for r in response.json])
+        instance = self.client.node_instances.get('2')
+        self.assertEqual({'a': 'b'}, instance.runtime_properties)
+        self.assertEqual(4, instance.version)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_many_node_instances_bad_parameters(self):
+        self.put_node_instance(instance_id='1', deployment_id='111')
+        for node_instances in ([{'id': '1'}],
+                               [{'id': '1', 'version': '1'}],
+                               [{'id': '1', 'version': 1, 'state': 1}],
+                               [{'id': '1', 'version': 1,
+                                 'runtime_properties': []}],
+                               [{'id': '1', 'version': 1},
+                                {'id': '1', 'version': 2}]):
+            response = self.patch('/node-instances',
+                                  {'node_instances': node_instances})
+            self.assertEqual(400, response.status_code)
+        self.assertEqual(1, self.client.node_instances.get('1').version)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_node_runtime_properties_patch(self):
+        self.put_node_instance(
+            instance_id='1234',
+            deployment_id='111',
+            runtime_properties={'a': 1, 'b': {'c': 2, 'd': 3}}
+        )
+        response = self.patch('/node-instances/1234', {
+            'runtime_properties_patch': {'a': None, 'b': {'c': 4}},
+            'version': 1
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'b': {'c': 4, 'd': 3}},
+                         response.json['runtime_properties'])
+        self.assertEqual(2, response.json['version'])
+
+        # The patch is only applied to the current version
+        response = self.patch('/node-instances/1234', {
+            'runtime_properties_patch': {'a': 1},
+            'version': 1
+        })
+        self.assertEqual(409, response.status_code)
+        response = self.patch('/node-instances/1234', {
+            'runtime_properties_patch': {'a': 1},
+            'runtime_properties': {},
+            'version': 2
+        })
+        self.assertEqual(400, response.status_code)
+        self.assertEqual({'b': {'c': 4, 'd': 3}},
+                         self.client.node_instances.get(
+                             '1234').runtime_properties)
+
+    @attr(client_min_version=3.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_patch_many_node_instances_runtime_properties_patch(self):
+        self.put_node_instance(instance_id='1', deployment_id='111',
+                               runtime_properties={'a': 1, 'b': 2})
+        self.put_node_instance(instance_id='2', deployment_id='111')
+        response = self.patch('/node-instances', {'node_instances': [
+            {'id': '1', 'version': 1, 'runtime_properties_patch': {'a': 3}},
+            {'id': '2', 'version': 1, 'state': 'started'},
+        ]})
+        self.assertEqual([None, None],
+                         [r['error_code'] for r in response.json])
+        self.assertEqual({'a': 3, 'b': 2}, self.client.node_instances.get(
+            '1').runtime_properties)
+        self.assertEqual('started', self.client.node_instances.get(
+            '2').state)
+
+    @attr(client_min_version=2,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_list_node_instances_runtime_properties_paths(self):
+        for instance_id in ('1', '2'):
+            self.put_node_instance(
+                instance_id=instance_id,
+                deployment_id='111',
+                runtime_properties={
+                    'ip': '10.0.0.{0}'.format(instance_id),
+                    'agent': {'name': 'agent_{0}'.format(instance_id),
+                              'key': 'secret'},
+                })
+
+        response = self.get('/node-instances', query_params={
+            '_include': 'id,runtime_properties.agent.name',
+            'runtime_properties.ip': '10.0.0.2',
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [{'id': '2',
+              'runtime_properties': {'agent': {'name': 'agent_2'}}}],
+            response.json['items'])
+
+        response = self.get('/node-instances', query_params={
+            '_include': 'id,runtime_properties.ip'})
+        self.assertEqual(
+            [{'id': '1', 'runtime_properties': {'ip': '10.0.0.1'}},
+             {'id': '2', 'runtime_properties': {'ip': '10.0.0.2'}}],
+            sorted(response.json['items'], key=lambda item: item['id']))
+
+        for query_params in ({'_include': 'id,state.value'},
+                             {'_include': 'runtime_properties.'},
+                             {'state.value': 'started'}):
+            response = self.get('/node-instances', query_params=query_params)
+            self.assertEqual(400, response.status_code)
+
     def put_node_instance(self,
                           instance_id,
                           deployment_id,
@@ -13,11 +13,17 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+from unittest import TestCase
+
 from nose.plugins.attrib import attr
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Query
 
-from manager_rest import utils
+from manager_rest import utils, manager_exceptions
 from manager_rest.test import base_test
-from manager_rest.storage import models
+from manager_rest.storage import db, models
+from manager_rest.storage.models_base import JSONB
 
 
 @attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
@@ -188,3 +194,231 @@ class StorageManagerTests(base_test.BaseServerTestCase):
         self.assertFalse(hasattr(blueprint_restored, 'updated_at'))
         self.assertFalse(hasattr(blueprint_restored, 'plan'))
         self.assertFalse(hasattr(blueprint_restored, 'main_file_name'))
+
+    def test_put_many(self):
+        self.put_deployment(deployment_id='d1', blueprint_id='b1')
+        node = self.sm.list(models.Node)[0]
+        instances = []
+        for i in range(3):
+            instance = models.NodeInstance(id='instance_{0}'.format(i),
+                                           state='uninitialized',
+                                           runtime_properties={'i': i})
+            instance.set_node_keys(node)
+            instances.append(instance)
+        self.sm.put_many(instances)
+
+        for i in range(3):
+            instance = self.sm.get(models.NodeInstance,
+                                   'instance_{0}'.format(i))
+            self.assertEquals(node.id, instance.node_id)
+            self.assertEquals('d1', instance.deployment_id)
+            self.assertEquals(node.tenant, instance.tenant)
+            self.assertEquals(node.creator, instance.creator)
+            self.assertEquals({'i': i}, instance.runtime_properties)
+
+    def test_put_many_conflict(self):
+        self.put_deployment(deployment_id='d1', blueprint_id='b1')
+        node = self.sm.list(models.Node)[0]
+        existing_id = self.sm.list(models.NodeInstance)[0].id
+        instances_count = len(self.sm.list(models.NodeInstance))
+        instances = []
+        for instance_id in ('new_instance', existing_id):
+            instance = models.NodeInstance(id=instance_id,
+                                           state='uninitialized')
+            instance.set_node_keys(node)
+            instances.append(instance)
+
+        self.assertRaises(manager_exceptions.ConflictError,
+                          self.sm.put_many, instances)
+        # None of the instances were added
+        self.assertEquals(instances_count,
+                          len(self.sm.list(models.NodeInstance)))
+
+    def test_insert_many(self):
+        deployment = self._add_deployment(self._add_blueprint())
+        execution = self._add_execution(deployment, 'e1')
+        now = utils.get_formatted_timestamp()
+        self.sm.insert_many(models.Event, [
+            {
+                'id': 'event_{0}'.format(i),
+                'timestamp': now,
+                'reported_timestamp': now,
+                'message': 'message {0}'.format(i),
+                'event_type': 'workflow_started',
+                '_execution_fk': execution._storage_id,
+                '_tenant_id': execution._tenant_id,
+                '_creator_id': execution._creator_id,
+                'private_resource': False,
+            } for i in range(3)
+        ])
+
+        events = self.sm.list(models.Event, sort={'id': 'asc'})
+        self.assertEquals(['event_0', 'event_1', 'event_2'],
+                          [event.id for event in events])
+        for i, event in enumerate(events):
+            self.assertEquals('e1', event.execution_id)
+            self.assertEquals('message {0}'.format(i), event.message)
+            self.assertEquals(now, event.timestamp)
+            self.assertEquals(execution.tenant, event.tenant)
+
+    def test_delete_cascades_in_db(self):
+        deployment = self._add_deployment(self._add_blueprint())
+        execution = self._add_execution(deployment)
+        now = utils.get_formatted_timestamp()
+        self.sm.insert_many(models.Event, [
+            {
+                'id': 'event_{0}'.format(i),
+                'timestamp': now,
+                'reported_timestamp': now,
+                '_execution_fk': execution._storage_id,
+                '_tenant_id': execution._tenant_id,
+                '_creator_id': execution._creator_id,
+            } for i in range(3)
+        ])
+        deployment_id = deployment.id
+        db.session.expunge(execution)
+        db.session.expunge(deployment)
+
+        loaded = []
+
+        def on_load(instance, context):
+            loaded.append(instance.__class__.__name__)
+        for model in (models.Execution, models.Event):
+            event.listen(model, 'load', on_load)
+            self.addCleanup(event.remove, model, 'load', on_load)
+
+        deployment = self.sm.get(models.Deployment, deployment_id)
+        self.sm.delete(deployment)
+        # The deployment's children weren't loaded to be deleted
+        self.assertEquals([], loaded)
+        self.assertEquals(0, len(self.sm.list(models.Execution)))
+        self.assertEquals(0, len(self.sm.list(models.Event)))
+
+    def _put_node_instances(self, runtime_properties):
+        self.put_deployment(deployment_id='d1', blueprint_id='b1')
+        node = self.sm.list(models.Node)[0]
+        # Remove the instances of the deployment, to only list these ones
+        self.sm.delete_many(self.sm.list(models.NodeInstance).items)
+        instances = []
+        for i, properties in enumerate(runtime_properties):
+            instance = models.NodeInstance(id='instance_{0}'.format(i),
+                                           state='uninitialized',
+                                           runtime_properties=properties)
+            instance.set_node_keys(node)
+            instances.append(instance)
+        self.sm.put_many(instances)
+
+    def test_include_json_paths(self):
+        self._put_node_instances([
+            {'ip': '10.0.0.{0}'.format(i), 'agent': {'name': 'a{0}'.format(i),
+                                                     'key': 'k'}}
+            for i in range(2)
+        ])
+        instances = self.sm.list(
+            models.NodeInstance,
+            include=['id', 'runtime_properties.ip',
+                     'runtime_properties.agent.name',
+                     'runtime_properties.missing'],
+            sort={'id': 'asc'})
+        self.assertEquals(
+            [('instance_0', {'ip': '10.0.0.0', 'agent': {'name': 'a0'},
+                             'missing': None}),
+             ('instance_1', {'ip': '10.0.0.1', 'agent': {'name': 'a1'},
+                             'missing': None})],
+            [(instance.id, instance.runtime_properties)
+             for instance in instances])
+        self.assertFalse(hasattr(instances[0], 'state'))
+
+        instance = self.sm.get(models.NodeInstance, 'instance_1',
+                               include=['runtime_properties.agent.name'])
+        self.assertEquals({'agent': {'name': 'a1'}},
+                          instance.runtime_properties)
+        self.assertFalse(hasattr(instance, 'id'))
+
+    def test_filter_json_paths(self):
+        self._put_node_instances([
+            {'ip': '10.0.0.{0}'.format(i % 2), 'agent': {'index': i}}
+            for i in range(5)
+        ])
+
+        instances = self.sm.list(models.NodeInstance,
+                                 filters={'runtime_properties.ip': '10.0.0.1'},
+                                 sort={'id': 'asc'})
+        self.assertEquals(['instance_1', 'instance_3'],
+                          [instance.id for instance in instances])
+        self.assertEquals(2, instances.metadata['pagination']['total'])
+
+        instances = self.sm.list(
+            models.NodeInstance,
+            include=['id'],
+            filters={'runtime_properties.agent.index': [0, 2, 4],
+                     'state': 'uninitialized'},
+            pagination={'size': 2, 'offset': 1},
+            sort={'id': 'asc'})
+        self.assertEquals(['instance_2', 'instance_4'],
+                          [instance.id for instance in instances])
+        self.assertEquals({'total': 3, 'size': 2, 'offset': 1},
+                          instances.metadata['pagination'])
+        self.assertFalse(hasattr(instances[0], 'runtime_properties'))
+
+        instance = self.sm.get(
+            models.NodeInstance, None,
+            filters={'runtime_properties.agent.index': 3})
+        self.assertEquals('instance_3', instance.id)
+        self.assertRaises(
+            manager_exceptions.NotFoundError, self.sm.get,
+            models.NodeInstance, None,
+            filters={'runtime_properties.agent.index': 5})
+
+    def test_invalid_json_paths(self):
+        for field_name in ('id.ip', 'runtime_properties.', 'missing.ip',
+                           'node.id', 'deployment_id.ip'):
+            self.assertRaises(manager_exceptions.BadParametersError,
+                              self.sm.list, models.NodeInstance,
+                              include=[field_name])
+            self.assertRaises(manager_exceptions.BadParametersError,
+                              self.sm.list, models.NodeInstance,
+                              filters={field_name: 'value'})
+
+
+@attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
+class JSONBTest(TestCase):
+
+    def test_encode_decode(self):
+        value = {'ip': '10.0.0.1', 'ports': [80, 443], 'agent': None}
+        json_type = JSONB()
+        dialect = sqlite.dialect()
+        encoded = json_type.process_bind_param(value, dialect)
+        self.assertIsInstance(encoded, basestring)
+        self.assertEquals(value,
+                          json_type.process_result_value(encoded, dialect))
+        self.assertIsNone(json_type.process_bind_param(None, dialect))
+        self.assertIsNone(json_type.process_result_value(None, dialect))
+
+    def test_native_jsonb(self):
+        value = {'ip': '10.0.0.1'}
+        json_type = JSONB()
+        dialect = postgresql.dialect()
+        self.assertIsInstance(json_type.load_dialect_impl(dialect),
+                              postgresql.JSONB)
+        # The psycopg2 driver encodes and decodes the values itself
+        self.assertIs(value, json_type.process_bind_param(value, dialect))
+        self.assertIs(value, json_type.process_result_value(value, dialect))
+
+    def test_compare_values(self):
+        self.assertTrue(JSONB().compare_values({'a': 1}, {'a': 1}))
+        self.assertFalse(JSONB().compare_values({'a': 1}, {'a': 2}))
+        json_type = JSONB(comparator=lambda x, y: x is y)
+        value = {'a': 1}
+        self.assertTrue(json_type.compare_values(value, value))
+        self.assertFalse(json_type.compare_values(value, {'a': 1}))
+
+    def test_path_comparator(self):
+        column = models.NodeInstance.runtime_properties[('agent', 'name')]
+        self.assertIsInstance(column.type, postgresql.JSONB)
+        query = Query(column).filter(column == 'a0')
+        compiled = query.statement.compile(dialect=postgresql.dialect())
+        self.assertIn('node_instances.runtime_properties #> %(param_1)s',
+                      str(compiled))
+        self.assertItemsEqual([('agent', 'name'), 'a0'],
+                              compiled.params.values())
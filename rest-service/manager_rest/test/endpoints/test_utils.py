@@ -18,8 +18,10 @@ import os
 from mock import patch
 from nose.plugins.attrib import attr
 
+from manager_rest import celery_client, config
 from manager_rest.utils import read_json_file, write_dict_to_json_file
 from manager_rest.utils import plugin_installable_on_current_platform
+from manager_rest.utils import json_merge_patch
 from manager_rest.test import base_test
 from manager_rest.storage import models
 
@@ -90,6 +92,26 @@ class TestUtils(base_test.BaseServerTestCase):
                 self.assertTrue(
                     plugin_installable_on_current_platform(plugin))
 
+    @patch('manager_rest.celery_client._client', None)
+    def test_celery_client_shared(self):
+        with patch.object(config.instance, 'test_mode', False), \
+                patch.object(config.instance, 'amqp_ca_path', '/ca.pem'):
+            client = celery_client.get_client()
+            self.assertIs(client, celery_client.get_client())
+            # A forked process gets its own client
+            with patch('os.getpid', return_value=os.getpid() + 1):
+                self.assertIsNot(client, celery_client.get_client())
+
+    def test_json_merge_patch(self):
+        target = {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': [4]}
+        patched = json_merge_patch(
+            target, {'a': None, 'b': {'c': None, 'f': 5}, 'e': [6], 'g': 7})
+        self.assertEqual({'b': {'d': 3, 'f': 5}, 'e': [6], 'g': 7}, patched)
+        self.assertEqual({'a': 1, 'b': {'c': 2, 'd': 3}, 'e': [4]}, target)
+        self.assertEqual({'a': {'b': 1}},
+                         json_merge_patch({'a': 1}, {'a': {'b': 1}}))
+        self.assertEqual({'a': 1}, json_merge_patch(None, {'a': 1}))
+
 
 def generate_progress_func(total_size, assert_equal,
                            assert_almost_equal, buffer_size=8192):
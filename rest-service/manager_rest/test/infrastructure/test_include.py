@@ -22,7 +22,7 @@ from cloudify_rest_client.exceptions import NoSuchIncludeFieldError
 
 from manager_rest.test import base_test
 from manager_rest.storage import ListResult
-from manager_rest.storage.models import Blueprint
+from manager_rest.storage.models import Blueprint, Deployment, Secret
 
 
 @attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
@@ -176,3 +176,12 @@ class IncludeQueryParamTests(base_test.BaseServerTestCase):
         self.put_deployment(deployment_id='a', blueprint_id='a')
         response = self.client.deployments.get('a', _include=['created_by'])
         self.assertEqual(response, {'created_by': 'admin'})
+
+    def test_response_fields_cached(self):
+        for model in (Blueprint, Deployment, Secret):
+            self.assertIs(model.resource_fields, model.resource_fields)
+            self.assertIs(model.response_fields, model.response_fields)
+            self.assertRaises(TypeError,
+                              model.response_fields.pop, 'id')
+        self.assertIn('workflows', Deployment.response_fields)
+        self.assertNotIn('workflows', Blueprint.response_fields)
@@ -0,0 +1,94 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+
+from flask_restful import fields, marshal
+from nose.plugins.attrib import attr
+
+from manager_rest.rest.serializers import Serializer
+from manager_rest.storage import db, models
+from manager_rest.storage.models_base import SQLModelBase
+from manager_rest.test import base_test
+
+
+@attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
+class SerializerTest(base_test.BaseServerTestCase):
+
+    def setUp(self):
+        super(SerializerTest, self).setUp()
+        self.put_deployment(deployment_id='d1', blueprint_id='b1')
+
+    def _assert_marshalled(self, data, fields_to_include):
+        """Assert the serializer output is identical to `marshal`'s"""
+        def to_response(item):
+            if isinstance(item, dict):
+                return item
+            if isinstance(item, SQLModelBase):
+                return item.to_response()
+            return item._asdict()
+
+        if isinstance(data, list):
+            expected = marshal(map(to_response, data), fields_to_include)
+        else:
+            expected = marshal(to_response(data), fields_to_include)
+        serialized = Serializer(fields_to_include)(data)
+        self.assertEqual(json.dumps(expected), json.dumps(serialized))
+
+    def test_models(self):
+        for model in (models.Blueprint, models.Deployment, models.Node,
+                      models.NodeInstance, models.Execution):
+            self._assert_marshalled(self.sm.list(model).items,
+                                    model.response_fields)
+
+    def test_include(self):
+        node_instance = self.sm.list(models.NodeInstance)[0]
+        response_fields = models.NodeInstance.response_fields
+        for include in (['id'], ['id', 'state', 'version'],
+                        ['runtime_properties', 'tenant_name'], ['missing']):
+            fields_to_include = {k: v for k, v in response_fields.items()
+                                 if k in include}
+            self._assert_marshalled(node_instance, fields_to_include)
+        # Fields that aren't in the model's response are marshalled as None
+        self._assert_marshalled(node_instance, {'missing': fields.String})
+
+    def test_nested_fields(self):
+        deployment = self.sm.get(models.Deployment, 'd1')
+        self.assertIn('workflows', models.Deployment.response_fields)
+        self._assert_marshalled(
+            deployment,
+            {k: v for k, v in models.Deployment.response_fields.items()
+             if k in ('id', 'workflows')})
+
+    def test_partial_results(self):
+        rows = db.session.query(models.Node.id, models.Node.type).all()
+        self._assert_marshalled(rows, {'id': fields.String,
+                                       'type': fields.String,
+                                       'number_of_instances': fields.Integer})
+
+    def test_formatting(self):
+        fields_to_include = {
+            'string': fields.String,
+            'integer': fields.Integer,
+            'boolean': fields.Boolean(default=True),
+            'raw': fields.Raw,
+        }
+        data = {'string': 1, 'integer': '2', 'boolean': 0, 'raw': []}
+        self._assert_marshalled(data, fields_to_include)
+        self._assert_marshalled({}, fields_to_include)
+        # Fields reading the whole item are supported as well
+        fields_to_include['formatted'] = fields.FormattedString(
+            '{string}-{integer}')
+        self._assert_marshalled(data, fields_to_include)
@@ -15,7 +15,11 @@
 
 from nose.plugins.attrib import attr
 from base64 import urlsafe_b64encode
+from flask_security.utils import encrypt_password
 
+from manager_rest.security.authentication import authenticator
+from manager_rest.security.authentication_cache import authentication_cache
+from manager_rest.storage import user_datastore
 from manager_rest.test.base_test import LATEST_API_VERSION
 from manager_rest.utils import BASIC_AUTH_PREFIX, CLOUDIFY_AUTH_HEADER
 from manager_rest.constants import (ADMIN_ROLE,
@@ -109,3 +113,29 @@ class AuthenticationTests(SecurityTestBase):
             self.client._client.headers.pop(CLOUDIFY_TENANT_HEADER, None)
             token = self.client.tokens.get()
         self._assert_user_authorized(token=token.value)
+
+    def test_last_login_update_throttled(self):
+        authenticator._last_login_updates.clear()
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        last_login_at = user_datastore.get_user('alice').last_login_at
+        self.assertIsNotNone(last_login_at)
+
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        self.assertEqual(last_login_at,
+                         user_datastore.get_user('alice').last_login_at)
+
+    def test_cached_token_invalidated_on_password_change(self):
+        with self.use_secured_client(username='alice',
+                                     password='alice_password'):
+            token = self.client.tokens.get()
+        self._assert_user_authorized(token=token.value)
+        self.assertIsNotNone(
+            authentication_cache.get(('token', token.value)))
+
+        user = user_datastore.get_user('alice')
+        user.password = encrypt_password('new_password')
+        user_datastore.commit()
+        self.assertIsNone(authentication_cache.get(('token', token.value)))
+        self._assert_user_unauthorized(token=token.value)
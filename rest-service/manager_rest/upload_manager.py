@@ -15,6 +15,9 @@
 
 import os
 import json
+import base64
+import hashlib
+import itertools
 import uuid
 import yaml
 import urllib
@@ -49,6 +52,85 @@ from manager_rest.constants import (CONVENTION_APPLICATION_BLUEPRINT_FILE,
                                     SUPPORTED_ARCHIVE_TYPES,
                                     CURRENT_TENANT_CONFIG)
 
+# Body types parsed by werkzeug into `request.form` and `request.files`
+FORM_MIMETYPES = ('multipart/form-data', 'application/x-www-form-urlencoded')
+
+
+def _request_has_body():
+    """Whether the request has a body which isn't form data.
+
+    Unlike `request.data`, this doesn't read the whole body into memory.
+    """
+    return bool(request.content_length) and \
+        request.mimetype not in FORM_MIMETYPES
+
+
+def _check_upload_size(size):
+    max_size_mb = config.instance.max_upload_size_mb
+    if max_size_mb is not None and size > max_size_mb * 1024 * 1024:
+        raise manager_exceptions.PayloadTooLargeError(
+            'Uploaded data is larger than the maximum allowed size of '
+            '{0} MB'.format(max_size_mb))
+
+
+def _read_chunks(stream):
+    """Read a file-like object in chunks of `upload_chunk_size` bytes"""
+    chunk_size = config.instance.upload_chunk_size
+    return iter(lambda: stream.read(chunk_size), b'')
+
+
+def _read_request_body():
+    """Read the request's body in chunks of `upload_chunk_size` bytes.
+
+    The body is only taken from memory if something (e.g. `request.json`)
+    has already read it, in which case werkzeug keeps it cached.
+    """
+    chunks = _read_chunks(request.stream)
+    first_chunk = next(chunks, b'')
+    if not first_chunk and request.content_length:
+        return [request.get_data()]
+    return itertools.chain([first_chunk], chunks)
+
+
+def _save_chunks(chunks, target_path):
+    """Write chunks of data to a file, hashing them along the way.
+
+    :param chunks: Iterable of the data's chunks
+    :param target_path: Path of the file to write
+    :return: SHA-256 hash object of the written data
+    """
+    checksum = hashlib.sha256()
+    size = 0
+    with open(target_path, 'wb') as f:
+        for chunk in chunks:
+            size += len(chunk)
+            _check_upload_size(size)
+            checksum.update(chunk)
+            f.write(chunk)
+    return checksum
+
+
+def _verify_digest(headers, checksum):
+    """Compare data's checksum to the SHA-256 one in a `Digest` header.
+
+    The header (RFC 3230) is optional, and so are SHA-256 digests in it,
+    e.g. `Digest: SHA-256=X48E9qOokqqrvdts8nOJRJN3OWDUoyWxBf7kbu9DBPE=`.
+    """
+    for digest in headers.get('Digest', '').split(','):
+        algorithm, _, value = digest.strip().partition('=')
+        if algorithm.lower() != 'sha-256':
+            continue
+        try:
+            expected = base64.b64decode(value)
+        except TypeError:
+            raise manager_exceptions.BadParametersError(
+                'Malformed SHA-256 digest: {0}'.format(value))
+        if expected != checksum.digest():
+            raise manager_exceptions.BadParametersError(
+                'SHA-256 digest mismatch: expected {0}, received data '
+                'with {1}'.format(value,
+                                  base64.b64encode(checksum.digest())))
+
 
 class UploadedDataManager(object):
 
@@ -118,7 +200,7 @@ class UploadedDataManager(object):
 
     @staticmethod
     def _save_file_from_url(archive_target_path, data_url, data_type):
-        if any([request.data,
+        if any([_request_has_body(),
                 'Transfer-Encoding' in request.headers,
                 'blueprint_archive' in request.files]):
             raise manager_exceptions.BadParametersError(
@@ -126,8 +208,9 @@ class UploadedDataManager(object):
                 ", multi-form and chunked.".format(data_type))
         try:
             with contextlib.closing(urlopen(data_url)) as urlf:
-                with open(archive_target_path, 'w') as f:
-                    f.write(urlf.read())
+                checksum = _save_chunks(_read_chunks(urlf),
+                                        archive_target_path)
+                _verify_digest(urlf.info(), checksum)
         except URLError:
             raise manager_exceptions.ParamUrlNotFoundError(
                     "URL {0} not found - can't download {1} archive"
@@ -139,14 +222,16 @@ class UploadedDataManager(object):
 
     @staticmethod
     def _save_file_from_chunks(archive_target_path, data_type):
-        if any([request.data,
+        if any([_request_has_body(),
                 'blueprint_archive' in request.files]):
             raise manager_exceptions.BadParametersError(
                 "Can't pass both a {0} URL via request body , multi-form "
                 "and chunked.".format(data_type))
-        with open(archive_target_path, 'w') as f:
-            for buffered_chunked in chunked.decode(request.input_stream):
-                f.write(buffered_chunked)
+        checksum = _save_chunks(
+            chunked.decode(request.input_stream,
+                           config.instance.upload_chunk_size),
+            archive_target_path)
+        _verify_digest(request.headers, checksum)
 
     @staticmethod
     def _save_file_content(archive_target_path, data_type):
@@ -154,9 +239,8 @@ class UploadedDataManager(object):
             raise manager_exceptions.BadParametersError(
                 "Can't pass both a {0} URL via request body , multi-form"
                 .format(data_type))
-        uploaded_file_data = request.data
-        with open(archive_target_path, 'w') as f:
-            f.write(uploaded_file_data)
+        checksum = _save_chunks(_read_request_body(), archive_target_path)
+        _verify_digest(request.headers, checksum)
 
     def _save_files_multipart(self, archive_target_path):
         inputs = {}
@@ -193,8 +277,7 @@ class UploadedDataManager(object):
         if not target_path:
             return content.getvalue().decode("utf-8")
         else:
-            with open(target_path, 'wb') as f:
-                f.write(content.read())
+            _save_chunks(_read_chunks(content), target_path)
 
     def _save_file_locally_and_extract_inputs(self,
                                               archive_target_path,
@@ -210,6 +293,8 @@ class UploadedDataManager(object):
         :return: None
         """
         inputs = {}
+        if request.content_length:
+            _check_upload_size(request.content_length)
 
         # Handling importing blueprint through url
         if url_key in request.args:
@@ -220,7 +305,7 @@ class UploadedDataManager(object):
         elif 'Transfer-Encoding' in request.headers:
             self._save_file_from_chunks(archive_target_path, data_type)
         # handler receiving entire content through data
-        elif request.data:
+        elif _request_has_body():
             self._save_file_content(archive_target_path, data_type)
 
         # handle inputs from form-data (for both the blueprint and inputs
@@ -156,6 +156,56 @@ class classproperty(object):
         return self.get_func(owner_cls)
 
 
+class cached_classproperty(classproperty):
+    """A classproperty whose value is computed only once for every class
+
+    Subclasses get their own value (the property is evaluated again for
+    them), so the value should depend only on the class definition.
+    """
+    def __init__(self, get_func):
+        super(cached_classproperty, self).__init__(get_func)
+        self._values = {}
+
+    def __get__(self, _, owner_cls):
+        try:
+            return self._values[owner_cls]
+        except KeyError:
+            value = self._values[owner_cls] = self.get_func(owner_cls)
+            return value
+
+
+class FrozenDict(dict):
+    """A dict that can't be modified after being created
+
+    Used for values that are cached and shared, so that they aren't changed
+    by mistake. Use `copy()` to get a modifiable dict.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('{0} is immutable'.format(type(self).__name__))
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+
+def json_merge_patch(target, patch):
+    """Apply a JSON merge patch (RFC 7386) to `target`
+
+    Keys that are null in the patch are removed, dicts are merged
+    recursively, and any other value replaces the target's value.
+
+    :return: The patched value (`target` itself isn't modified)
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.iteritems():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = json_merge_patch(result.get(key), value)
+    return result
+
+
 def create_auth_header(username=None, password=None, token=None, tenant=None):
     """Create a valid authentication header either from username/password or
     a token if any were provided; return an empty dict otherwise
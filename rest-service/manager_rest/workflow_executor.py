@@ -95,9 +95,6 @@ def _execute_task(execution_id, execution_parameters, context):
     context['task_target'] = MGMTWORKER_QUEUE
     execution_parameters['__cloudify_context'] = context
     celery = celery_client.get_client()
-    try:
-        return celery.execute_task(task_queue=MGMTWORKER_QUEUE,
-                                   task_id=execution_id,
-                                   kwargs=execution_parameters)
-    finally:
-        celery.close()
+    return celery.execute_task(task_queue=MGMTWORKER_QUEUE,
+                               task_id=execution_id,
+                               kwargs=execution_parameters)
@@ -16,6 +16,7 @@
 from cloudify.utils import ManagerVersion
 
 METADATA_FILENAME = 'metadata.json'
+MANIFEST_FILENAME = 'manifest.json'
 M_VERSION = 'snapshot_version'
 M_SCHEMA_REVISION = 'schema_revision'
 M_STAGE_SCHEMA_REVISION = 'stage_schema_revision'
@@ -27,6 +28,9 @@ INTERNAL_KEY_FILENAME = 'cloudify_internal_key.pem'
 INTERNAL_P12_FILENAME = 'cloudify_internal.p12'
 BROKER_DEFAULT_VHOST = '/'
 DEFAULT_TENANT_NAME = 'default_tenant'
+# The local tasks of all the workflow graphs share the workflow context's
+# client handler, which isn't known to be safe to use from several threads
+DEFAULT_DEPLOYMENT_ENVS_CONCURRENCY = 1
 SECRET_STORE_AGENT_KEY_PREFIX = 'cfyagent_key__'
 STAGE_BASE_FOLDER = '/opt/cloudify-stage'
 STAGE_CONFIG_FOLDER = 'conf'
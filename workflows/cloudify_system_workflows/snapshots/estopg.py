@@ -18,8 +18,8 @@ import sys
 import json
 import logging
 import argparse
+import collections
 
-from manager_rest import manager_exceptions
 from manager_rest import flask_utils
 from manager_rest.constants import CURRENT_TENANT_CONFIG
 from manager_rest.storage import models, get_storage_manager
@@ -29,6 +29,10 @@ logging.basicConfig(stream=sys.stdout, level=logging.DEBUG, format=format_str)
 logger = logging.getLogger('estopg')
 
 COMPUTE_NODE_TYPE = 'cloudify.nodes.Compute'
+# Number of events or logs inserted at a time
+INSERT_BATCH_SIZE = 1000
+# Number of restored events or logs between progress reports
+PROGRESS_INTERVAL = 100 * INSERT_BATCH_SIZE
 
 
 class EsToPg(object):
@@ -148,74 +152,108 @@ class EsToPg(object):
 
     def _restore_events(self):
         """Restore events to postgres."""
-        for line in open(self._events_path, 'r'):
-            es_document = json.loads(line)
-            es_event = es_document['_source']
-            execution_id = es_event['context']['execution_id']
-            try:
-                execution = self._storage_manager.get(
-                    models.Execution,
-                    execution_id,
-                )
-            except manager_exceptions.NotFoundError:
-                logger.warning(
-                    'Event *not* added to database: %s. '
-                    'Execution not found: %s',
-                    es_document['_id'],
-                    execution_id,
-                )
-                continue
-
-            pg_event = {
-                'id': es_document['_id'],
-                'timestamp': es_event['@timestamp'],
-                'reported_timestamp': es_event['timestamp'],
-                'message': es_event['message']['text'],
-                'message_code': es_event['message_code'],
-                'event_type': es_event['event_type'],
-                'operation': es_event['context'].get('operation'),
-                'node_id': es_event['context'].get('node_id'),
-                'execution': execution,
-            }
-            event = models.Event(**pg_event)
-            self._storage_manager.put(event)
-            logger.debug('Event added to database: %s', pg_event['id'])
+        self._restore_execution_items(
+            models.Event, self._events_path, self._get_pg_event)
 
     def _restore_logs(self):
         """Restore logs to postgres."""
-        for line in open(self._logs_path, 'r'):
-            es_document = json.loads(line)
-            es_log = es_document['_source']
-            execution_id = es_log['context']['execution_id']
-            try:
-                execution = self._storage_manager.get(
-                    models.Execution,
-                    execution_id,
-                )
-            except manager_exceptions.NotFoundError:
-                logger.warning(
-                    'Log not inserted into database: %s. '
-                    'Execution not found: %s',
-                    es_document['_id'],
-                    execution_id,
-                )
-                continue
+        self._restore_execution_items(
+            models.Log, self._logs_path, self._get_pg_log)
+
+    def _restore_execution_items(self, model_class, dump_path, get_pg_item):
+        """Restore the events or logs of executions to postgres.
 
-            pg_log = {
-                'id': es_document['_id'],
-                'timestamp': es_log['@timestamp'],
-                'reported_timestamp': es_log['timestamp'],
-                'message': es_log['message']['text'],
-                'message_code': es_log['message_code'],
-                'logger': es_log['logger'],
-                'level': es_log['level'],
-                'operation': es_log['context'].get('operation'),
-                'node_id': es_log['context'].get('node_id'),
-                'execution': execution,
+        The executions are loaded once, and the items are inserted in
+        batches of `INSERT_BATCH_SIZE` rows with multi-row INSERTs.
+
+        :param model_class: `models.Event` or `models.Log`
+        :param dump_path: Path of the file with the items' ES documents
+        :param get_pg_item: Function returning the column values of an item,
+                            given its ES document's id and source
+        """
+        items_name = model_class.__tablename__
+        logger.info('Restoring %s..', items_name)
+        execution_keys = self._get_execution_keys()
+        dump_size = os.path.getsize(dump_path) or 1
+        read_size = 0
+        restored_count = 0
+        missing_executions = collections.Counter()
+        batch = []
+        with open(dump_path, 'r') as dump_file:
+            for line in dump_file:
+                read_size += len(line)
+                es_document = json.loads(line)
+                es_item = es_document['_source']
+                execution_id = es_item['context']['execution_id']
+                if execution_id not in execution_keys:
+                    missing_executions[execution_id] += 1
+                    continue
+                pg_item = get_pg_item(es_document['_id'], es_item)
+                pg_item.update(execution_keys[execution_id])
+                batch.append(pg_item)
+                if len(batch) < INSERT_BATCH_SIZE:
+                    continue
+                self._storage_manager.insert_many(model_class, batch)
+                restored_count += len(batch)
+                batch = []
+                if restored_count % PROGRESS_INTERVAL == 0:
+                    logger.info('Restored %d %s (%d%% of the dump)',
+                                restored_count, items_name,
+                                read_size * 100 / dump_size)
+        self._storage_manager.insert_many(model_class, batch)
+        restored_count += len(batch)
+
+        for execution_id, count in missing_executions.items():
+            logger.warning('%d %s *not* added to database. '
+                           'Execution not found: %s',
+                           count, items_name, execution_id)
+        logger.info('Restored %d %s', restored_count, items_name)
+
+    def _get_execution_keys(self):
+        """Map the ID of every execution to the keys of its events and logs
+        """
+        executions = self._storage_manager.query(models.Execution) \
+            .with_entities(models.Execution.id,
+                           models.Execution._storage_id,
+                           models.Execution._tenant_id,
+                           models.Execution._creator_id,
+                           models.Execution.private_resource)
+        return {
+            execution.id: {
+                '_execution_fk': execution._storage_id,
+                '_tenant_id': execution._tenant_id,
+                '_creator_id': execution._creator_id,
+                'private_resource': execution.private_resource,
             }
-            log = models.Log(**pg_log)
-            self._storage_manager.put(log)
-            logger.debug('Log added to database: %s', pg_log['id'])
+            for execution in executions
+        }
+
+    @staticmethod
+    def _get_pg_event(event_id, es_event):
+        return {
+            'id': event_id,
+            'timestamp': es_event['@timestamp'],
+            'reported_timestamp': es_event['timestamp'],
+            'message': es_event['message']['text'],
+            'message_code': es_event['message_code'],
+            'event_type': es_event['event_type'],
+            'operation': es_event['context'].get('operation'),
+            'node_id': es_event['context'].get('node_id'),
+        }
+
+    @staticmethod
+    def _get_pg_log(log_id, es_log):
+        return {
+            'id': log_id,
+            'timestamp': es_log['@timestamp'],
+            'reported_timestamp': es_log['timestamp'],
+            'message': es_log['message']['text'],
+            'message_code': es_log['message_code'],
+            'logger': es_log['logger'],
+            'level': es_log['level'],
+            'operation': es_log['context'].get('operation'),
+            'node_id': es_log['context'].get('node_id'),
+        }
 
     def _get_node(self, node_id, deployment_id):
         nodes = self._storage_manager.list(
@@ -19,11 +19,14 @@ import shutil
 import zipfile
 import platform
 import tempfile
+import functools
 import subprocess
+from multiprocessing.pool import ThreadPool
 
 from wagon import wagon
 
 from cloudify.workflows import ctx
+from cloudify.state import current_workflow_ctx
 from cloudify.utils import ManagerVersion, get_local_rest_certificate
 from cloudify.manager import get_rest_client
 from cloudify.exceptions import NonRecoverableError
@@ -41,6 +44,7 @@ from .es_snapshot import ElasticSearch
 from .credentials import restore as restore_credentials
 from .constants import (
     ARCHIVE_CERT_DIR,
+    DEFAULT_DEPLOYMENT_ENVS_CONCURRENCY,
     INTERNAL_CERT_FILENAME,
     INTERNAL_KEY_FILENAME,
     INTERNAL_P12_FILENAME,
@@ -76,6 +80,9 @@ class SnapshotRestore(object):
         self._no_reboot = no_reboot
         self._premium_enabled = premium_enabled
         self._user_is_bootstrap_admin = user_is_bootstrap_admin
+        self._deployment_envs_concurrency = config.get(
+            'deployment_envs_concurrency',
+            DEFAULT_DEPLOYMENT_ENVS_CONCURRENCY)
 
         self._tempdir = None
         self._snapshot_version = None
@@ -117,41 +124,101 @@ class SnapshotRestore(object):
             shutil.rmtree(self._tempdir)
 
     def _restore_deployment_envs(self):
-        deps = utils.get_dep_contexts(self._snapshot_version)
-        for tenant, deployments in deps:
-            ctx.logger.info(
-                'Restoring deployment environments for {tenant}'.format(
-                    tenant=tenant,
-                )
-            )
+        """Create the environments of all the tenants' deployments.
+
+        Environments are independent, so up to `deployment_envs_concurrency`
+        (one by default) of them are created at the same time. A failure to
+        create one of them doesn't stop the others from being created, and
+        all failures are reported once every environment was handled.
+        """
+        deployment_envs = []
+        for tenant, deployments in utils.get_dep_contexts(
+                self._snapshot_version):
             tenant_client = get_rest_client(tenant=tenant)
             for deployment_id, dep_ctx in deployments.iteritems():
-                ctx.logger.info('Restoring deployment {dep_id}'.format(
-                    dep_id=deployment_id,
-                ))
-                with dep_ctx:
-                    dep = tenant_client.deployments.get(deployment_id)
-                    blueprint = tenant_client.blueprints.get(
-                        dep_ctx.blueprint.id,
-                    )
-                    tasks_graph = self._get_tasks_graph(
-                        dep_ctx,
-                        blueprint,
-                        dep,
-                    )
-                    tasks_graph.execute()
-                    ctx.logger.info(
-                        'Successfully created deployment environment '
-                        'for deployment {deployment}'.format(
-                            deployment=deployment_id,
-                        )
-                    )
-            ctx.logger.info(
-                'Finished restoring deployment environments for '
-                '{tenant}'.format(
+                deployment_envs.append(
+                    (tenant, tenant_client, deployment_id, dep_ctx))
+        ctx.logger.info(
+            'Restoring {count} deployment environments, {concurrency} at a '
+            'time'.format(count=len(deployment_envs),
+                          concurrency=self._deployment_envs_concurrency))
+
+        # The workflow context is thread local, so it's passed to the worker
+        # threads, which make it their current context
+        restore_env = functools.partial(self._restore_deployment_env,
+                                        ctx._get_current_object())
+        pool = ThreadPool(self._deployment_envs_concurrency)
+        try:
+            errors = pool.map(restore_env, deployment_envs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+        failed = [(tenant, deployment_id, error)
+                  for (tenant, _, deployment_id, _), error
+                  in zip(deployment_envs, errors) if error]
+        ctx.logger.info(
+            'Finished restoring deployment environments: {succeeded} '
+            'succeeded, {failed} failed'.format(
+                succeeded=len(deployment_envs) - len(failed),
+                failed=len(failed)))
+        if failed:
+            raise NonRecoverableError(
+                'Failed restoring deployment environments:\n{0}'.format(
+                    '\n'.join(
+                        '{0}/{1}: {2}'.format(tenant, deployment_id, error)
+                        for tenant, deployment_id, error in failed)))
+
+    def _restore_deployment_env(self, workflow_ctx, deployment_env):
+        """Create the environment of a deployment.
+
+        This runs in a worker thread, with `workflow_ctx` as its current
+        workflow context.
+
+        :param workflow_ctx: Context of the workflow
+        :param deployment_env: The deployment's tenant, the REST client of
+                               the tenant, the deployment's ID and context
+        :return: The error the creation failed with, or None
+        """
+        with current_workflow_ctx.push(workflow_ctx):
+            return self._create_deployment_env(*deployment_env)
+
+    def _create_deployment_env(self, tenant, tenant_client, deployment_id,
+                               dep_ctx):
+        ctx.logger.info('Restoring deployment {tenant}/{dep_id}'.format(
+            tenant=tenant,
+            dep_id=deployment_id,
+        ))
+        try:
+            with dep_ctx:
+                dep = tenant_client.deployments.get(deployment_id)
+                blueprint = tenant_client.blueprints.get(
+                    dep_ctx.blueprint.id,
+                )
+                tasks_graph = self._get_tasks_graph(
+                    dep_ctx,
+                    blueprint,
+                    dep,
+                )
+                tasks_graph.execute()
+        except Exception as e:
+            ctx.logger.error(
+                'Failed creating deployment environment for deployment '
+                '{tenant}/{deployment}: {error}'.format(
                     tenant=tenant,
+                    deployment=deployment_id,
+                    error=e,
                 )
             )
+            return str(e) or repr(e)
+        ctx.logger.info(
+            'Successfully created deployment environment '
+            'for deployment {tenant}/{deployment}'.format(
+                tenant=tenant,
+                deployment=deployment_id,
+            )
+        )
+        return None
 
     def _restore_amqp_vhosts_and_users(self):
         script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
@@ -14,12 +14,20 @@
 #    * limitations under the License.
 
 import contextlib
+import collections
+import functools
+import hashlib
+import multiprocessing
 import os
 import json
 import shlex
 import shutil
 import subprocess
+import tempfile
+import time
 import zipfile
+import zlib
+from multiprocessing.pool import ThreadPool
 
 from cloudify import constants, manager
 from cloudify.workflows import ctx
@@ -292,6 +300,12 @@ def make_zip64_archive(zip_filename, directory):
     In any case, this function is heavily inspired in stdlib's
     `shutil._make_zipfile`.
 
+    Files are deflated in parallel by a pool of threads (zlib releases the
+    GIL while compressing) to temporary files, which are then appended to
+    the archive in order. Files which are already compressed (wagons,
+    blueprint archives...) are stored as they are. A manifest with the
+    SHA-256 checksum of every file is added to the archive as well.
+
     :param zip_filename: Path to the zip file to be created
     :type zip_filename: str
     :path directory: Path to directory where all files to compress are located
@@ -304,21 +318,173 @@ def make_zip64_archive(zip_filename, directory):
         compression=zipfile.ZIP_DEFLATED,
         allowZip64=True,
     )
+    path = os.path.normpath(directory)
+    ctx.logger.debug('Creating zip archive of: {0}'.format(path))
+    # Compressed files are written next to the archive rather than in the
+    # snapshot's data directory, so that they aren't archived themselves
+    compressed_dir = tempfile.mkdtemp(
+        prefix='compressed-', dir=os.path.dirname(zip_filename))
+    workers = multiprocessing.cpu_count()
+    pool = ThreadPool(workers)
+    compress = functools.partial(_compress_archive_entry, compressed_dir)
+    # Only a few files are compressed ahead of the one being written, so
+    # that the compressed copies don't fill up the disk when writing the
+    # archive is slower than compressing
+    window = 2 * workers
+    pending = collections.deque()
+    manifest = {}
+
+    def write_next(zip_file):
+        entry = pending.popleft().get()
+        _write_archive_entry(zip_file, entry)
+        if entry.sha256 is not None:
+            manifest[entry.arcname] = entry.sha256
+
+    try:
+        with zip_context_manager as zip_file:
+            for paths in _walk_archive_entries(path):
+                pending.append(pool.apply_async(compress, (paths, )))
+                if len(pending) >= window:
+                    write_next(zip_file)
+            while pending:
+                write_next(zip_file)
+            zip_file.writestr(snapshot_constants.MANIFEST_FILENAME,
+                              json.dumps(manifest, indent=2, sort_keys=True))
+    finally:
+        # Wait for the workers to be done with the files still queued
+        # before removing them
+        pool.close()
+        pool.join()
+        shutil.rmtree(compressed_dir)
+
+
+ArchiveEntry = collections.namedtuple('ArchiveEntry', [
+    'path', 'arcname', 'compress_type', 'compressed_path',
+    'file_size', 'compress_size', 'crc', 'sha256'])
+
+# Extensions of files which don't get any smaller when deflated
+COMPRESSED_EXTENSIONS = ('.zip', '.gz', '.tgz', '.bz2', '.xz', '.wgn',
+                         '.whl', '.jar', '.png', '.jpg', '.jpeg', '.gif')
+
+
+def _walk_archive_entries(base_dir):
+    """Yield the paths of the directories and files to archive, in order"""
+    for dirpath, dirnames, filenames in os.walk(base_dir):
+        for dirname in sorted(dirnames):
+            path = os.path.normpath(os.path.join(dirpath, dirname))
+            yield path, os.path.relpath(path, base_dir)
+        for filename in filenames:
+            path = os.path.normpath(os.path.join(dirpath, filename))
+            # Not sure why this check is needed,
+            # but it's in the original stdlib's implementation
+            if os.path.isfile(path):
+                yield path, os.path.relpath(path, base_dir)
+
+
+def _compress_archive_entry(compressed_dir, paths, chunk_size=2**20):
+    """Read a file once, computing its checksums and deflating it if needed.
+
+    :param compressed_dir: Directory in which deflated data is written
+    :param paths: Path of the file (or directory) to archive, and its name
+                  in the archive
+    :type paths: tuple(str, str)
+    :return: The archive entry of the file
+    :rtype: ArchiveEntry
+
+    """
+    path, arcname = paths
+    if os.path.isdir(path):
+        return ArchiveEntry(path, arcname, zipfile.ZIP_STORED, None,
+                            0, 0, 0, None)
+    if path.lower().endswith(COMPRESSED_EXTENSIONS):
+        compressor = None
+        compress_type = zipfile.ZIP_STORED
+        compressed_path = None
+    else:
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compress_type = zipfile.ZIP_DEFLATED
+        fd, compressed_path = tempfile.mkstemp(dir=compressed_dir)
+        os.close(fd)
+
+    crc = 0
+    sha256 = hashlib.sha256()
+    file_size = compress_size = 0
+    with open(path, 'rb') as source, _open_or_null(compressed_path) as out:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            file_size += len(chunk)
+            crc = zlib.crc32(chunk, crc) & 0xffffffff
+            sha256.update(chunk)
+            if compressor:
+                chunk = compressor.compress(chunk)
+                compress_size += len(chunk)
+                out.write(chunk)
+        if compressor:
+            chunk = compressor.flush()
+            compress_size += len(chunk)
+            out.write(chunk)
+        else:
+            compress_size = file_size
+    return ArchiveEntry(path, arcname, compress_type, compressed_path,
+                        file_size, compress_size, crc, sha256.hexdigest())
+
 
-    with zip_context_manager as zip_file:
-        path = os.path.normpath(directory)
-        ctx.logger.debug('Creating zip archive of: {0}'.format(path))
-        base_dir = path
-        for dirpath, dirnames, filenames in os.walk(directory):
-            for dirname in sorted(dirnames):
-                path = os.path.normpath(os.path.join(dirpath, dirname))
-                zip_file.write(path, os.path.relpath(path, base_dir))
-            for filename in filenames:
-                path = os.path.normpath(os.path.join(dirpath, filename))
-                # Not sure why this check is needed,
-                # but it's in the original stdlib's implementation
-                if os.path.isfile(path):
-                    zip_file.write(path, os.path.relpath(path, base_dir))
+@contextlib.contextmanager
+def _open_or_null(path):
+    if path is None:
+        yield None
+    else:
+        with open(path, 'wb') as f:
+            yield f
+
+
+def _write_archive_entry(zip_file, entry, chunk_size=2**20):
+    """Append an already compressed entry to a zip archive.
+
+    This is what `ZipFile.write` does, except that the data's checksum and
+    sizes are already known, and it's copied as is (from the original file
+    if stored, or from the compressed one if deflated).
+
+    """
+    if entry.sha256 is None:
+        # Directories have no data
+        zip_file.write(entry.path, entry.arcname)
+        return
+
+    st = os.stat(entry.path)
+    zinfo = zipfile.ZipInfo(entry.arcname,
+                            time.localtime(st.st_mtime)[0:6])
+    zinfo.external_attr = (st[0] & 0xFFFF) << 16L  # Unix attributes
+    zinfo.compress_type = entry.compress_type
+    zinfo.file_size = entry.file_size
+    zinfo.compress_size = entry.compress_size
+    zinfo.CRC = entry.crc
+    zinfo.flag_bits = 0x00
+    zinfo.header_offset = zip_file.fp.tell()
+    zip64 = entry.file_size > zipfile.ZIP64_LIMIT or \
+        entry.compress_size > zipfile.ZIP64_LIMIT
+
+    _start_archive_entry(zip_file, zinfo)
+    zip_file.fp.write(zinfo.FileHeader(zip64))
+    data_path = entry.compressed_path or entry.path
+    with open(data_path, 'rb') as data:
+        shutil.copyfileobj(data, zip_file.fp, chunk_size)
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
+    if entry.compressed_path:
+        os.remove(entry.compressed_path)
+
+
+def _start_archive_entry(zip_file, zinfo):
+    """Check that an entry can be added to the archive, and mark it modified.
+
+    `ZipFile` has no public API to write already compressed data, so this
+    relies on its internals, as found in Python 2.7's `ZipFile.write`.
+    Check this again when moving to another Python version.
+
+    """
+    zip_file._writecheck(zinfo)
+    zip_file._didModify = True
 
 
 @contextlib.contextmanager
@@ -0,0 +1,95 @@
+"""Snapshot restore test cases."""
+
+import threading
+import unittest
+
+import mock
+
+from cloudify.exceptions import NonRecoverableError
+from cloudify.state import current_workflow_ctx
+from cloudify.workflows import ctx
+
+from cloudify_system_workflows.snapshots.snapshot_restore import (
+    SnapshotRestore,
+)
+
+
+class RestoreDeploymentEnvsTest(unittest.TestCase):
+
+    """Ensure deployment environments are created by worker threads."""
+
+    def setUp(self):
+        """Mock the deployments and the tasks graphs of their environments."""
+        self.workflow_ctx = mock.MagicMock()
+        self.dep_contexts = {
+            'dep_{0}'.format(index): mock.MagicMock()
+            for index in range(3)
+        }
+        self.executed = []
+        self.lock = threading.Lock()
+
+        patchers = [
+            mock.patch(
+                'cloudify_system_workflows.snapshots.snapshot_restore.'
+                'get_rest_client'),
+            mock.patch(
+                'cloudify_system_workflows.snapshots.utils.get_dep_contexts',
+                return_value=[('tenant', self.dep_contexts)]),
+            mock.patch.object(
+                SnapshotRestore, '_get_tasks_graph',
+                side_effect=self._get_tasks_graph),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.snapshot_restore = SnapshotRestore(
+            config={'deployment_envs_concurrency': 2},
+            snapshot_id='snapshot',
+            recreate_deployments_envs=True,
+            force=False,
+            timeout=0,
+            premium_enabled=False,
+            user_is_bootstrap_admin=True,
+            restore_certificates=False,
+            no_reboot=False,
+        )
+
+    def _get_tasks_graph(self, dep_ctx, blueprint, deployment):
+        """Get a tasks graph that records where and how it was executed."""
+        def execute():
+            # Fails like task execution does without a workflow context
+            workflow_ctx = ctx._get_current_object()
+            with self.lock:
+                self.executed.append(
+                    (dep_ctx, workflow_ctx, threading.current_thread()))
+            if dep_ctx is self.dep_contexts['dep_1']:
+                raise RuntimeError('failed executing tasks')
+
+        tasks_graph = mock.Mock()
+        tasks_graph.execute.side_effect = execute
+        return tasks_graph
+
+    def test_restore_deployment_envs(self):
+        with current_workflow_ctx.push(self.workflow_ctx):
+            with self.assertRaises(NonRecoverableError) as cm:
+                self.snapshot_restore._restore_deployment_envs()
+
+        # All environments were created, even after one of them failed,
+        # by worker threads that have the workflow context
+        self.assertItemsEqual(
+            [dep_ctx for dep_ctx, _, _ in self.executed],
+            self.dep_contexts.values(),
+        )
+        for _, workflow_ctx, thread in self.executed:
+            self.assertIs(workflow_ctx, self.workflow_ctx)
+            self.assertIsNot(thread, threading.current_thread())
+
+        self.workflow_ctx.logger.info.assert_any_call(
+            'Finished restoring deployment environments: '
+            '2 succeeded, 1 failed')
+        self.assertEqual(
+            str(cm.exception),
+            'Failed restoring deployment environments:\n'
+            'tenant/dep_1: failed executing tasks',
+        )
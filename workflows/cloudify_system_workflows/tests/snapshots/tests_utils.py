@@ -1,13 +1,18 @@
 """Snapshot utilities test cases."""
 
 import os
+import json
+import hashlib
 import shutil
 import subprocess
 import unittest
 import tempfile
+import zipfile
 
+import mock
 from nose.tools import nottest
 
+from cloudify_system_workflows.snapshots.constants import MANIFEST_FILENAME
 from cloudify_system_workflows.snapshots.utils import make_zip64_archive
 
 
@@ -58,7 +63,8 @@ class MakeZip64Test(unittest.TestCase):
         ])
 
     @nottest
-    def test_huge_file(self):
+    @mock.patch('cloudify_system_workflows.snapshots.utils.ctx')
+    def test_huge_file(self, _):
         """Size should not be be a problem with zip64 enabled.
 
         Note: This test case is disabled by default because it takes very long
@@ -77,3 +83,46 @@ class MakeZip64Test(unittest.TestCase):
             os.path.getsize(zip_filename),
             2.2 * 2**30,  # 2.2GB
         )
+
+
+class MakeZip64ContentsTest(unittest.TestCase):
+
+    """Ensure archived files are compressed as needed and listed."""
+
+    def setUp(self):
+        base_dir = tempfile.mkdtemp(prefix='make_zip_test_')
+        self.addCleanup(shutil.rmtree, base_dir)
+        self.data_dir = os.path.join(base_dir, 'data')
+        self.zip_filename = os.path.join(base_dir, 'snapshot.zip')
+        os.makedirs(os.path.join(self.data_dir, 'plugins', 'empty'))
+        self.contents = {
+            'dump.sql': 'INSERT INTO nodes VALUES (1);\n' * 1000,
+            'empty.txt': '',
+            os.path.join('plugins', 'plugin.wgn'): os.urandom(10000),
+        }
+        for name, content in self.contents.items():
+            with open(os.path.join(self.data_dir, name), 'wb') as f:
+                f.write(content)
+
+    @mock.patch('cloudify_system_workflows.snapshots.utils.ctx')
+    def test_contents(self, _):
+        make_zip64_archive(self.zip_filename, self.data_dir)
+        with zipfile.ZipFile(self.zip_filename) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            infos = {info.filename: info for info in zip_file.infolist()}
+            for name, content in self.contents.items():
+                self.assertEqual(content, zip_file.read(name))
+            manifest = json.loads(zip_file.read(MANIFEST_FILENAME))
+
+        self.assertIn('plugins/empty/', infos)
+        self.assertEqual(zipfile.ZIP_DEFLATED,
+                         infos['dump.sql'].compress_type)
+        self.assertLess(infos['dump.sql'].compress_size,
+                        infos['dump.sql'].file_size)
+        # Wagons are already compressed
+        self.assertEqual(zipfile.ZIP_STORED,
+                         infos['plugins/plugin.wgn'].compress_type)
+        self.assertEqual(
+            {name: hashlib.sha256(content).hexdigest()
+             for name, content in self.contents.items()},
+            manifest)